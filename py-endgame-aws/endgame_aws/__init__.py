@@ -1,6 +1,7 @@
 from .config import Config
 from .io import (
     FlattenedBoxScore,
+    download_key,
     list_all_keys,
     read_all_odds,
     read_box_scores,
@@ -10,4 +11,4 @@ from .io import (
     save_data_to_s3,
     save_to_s3,
 )
-from .stores import get_pbp_store
+from .stores import get_pbp_checkpoints, get_pbp_store
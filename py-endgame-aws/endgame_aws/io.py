@@ -4,6 +4,7 @@ import pickle
 from csv import DictReader, DictWriter
 from dataclasses import dataclass
 from io import StringIO
+from pathlib import Path
 from typing import Any, AsyncIterator, Type, TypeVar
 
 from aiobotocore.session import get_session
@@ -130,15 +131,38 @@ class S3NotFoundException(Exception):
 
 
 async def read_from_s3(bucket: str, key: str, client) -> bytes:
+    response = await _get_object(bucket, key, client)
+    async with response["Body"] as stream:
+        return await stream.read()
+
+
+# Big enough to not spend the download on the event loop,
+# small enough that a day's never all in memory at once
+_STREAM_CHUNK_SIZE = 1 << 16
+
+
+async def stream_from_s3(bucket: str, key: str, client) -> AsyncIterator[bytes]:
+    """
+    An object's bytes, a chunk at a time as they're downloaded
+    """
+    response = await _get_object(bucket, key, client)
+    async with response["Body"] as stream:
+        while chunk := await stream.read(_STREAM_CHUNK_SIZE):
+            yield chunk
+
+
+async def _get_object(bucket: str, key: str, client):
     try:
-        response = await client.get_object(Bucket=bucket, Key=key)
+        return await client.get_object(Bucket=bucket, Key=key)
     except ClientError as ex:
         if ex.response["Error"]["Code"] == "NoSuchKey":
             raise S3NotFoundException from ex
         else:
             raise
-    async with response["Body"] as stream:
-        return await stream.read()
+
+
+async def delete_from_s3(bucket: str, key: str, client) -> None:
+    await client.delete_object(Bucket=bucket, Key=key)
 
 
 async def list_keys(bucket: str, prefix: str, client) -> AsyncIterator[str]:
@@ -159,6 +183,21 @@ async def list_all_keys(bucket: str, prefix: str) -> AsyncIterator[str]:
             yield key
 
 
+async def download_key(bucket: str, key: str, path: Path) -> bool:
+    """
+    Copy one object to `path`. False if there's no such object.
+    """
+    session = get_session()
+    async with session.create_client("s3") as client:
+        try:
+            data = await read_from_s3(bucket, key, client)
+        except S3NotFoundException:
+            return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return True
+
+
 async def read_all_odds(bucket: str, prefix: str) -> AsyncIterator[dict]:
     session = get_session()
     async with session.create_client("s3") as client:
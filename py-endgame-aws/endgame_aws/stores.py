@@ -1,96 +1,213 @@
 import datetime
 import json
+import zlib
 from contextlib import asynccontextmanager
-from typing import (
-    Any,
-    AsyncContextManager,
-    AsyncIterator,
-    Callable,
-    Mapping,
-    Sequence,
-    TypeVar,
-)
+from typing import Any, AsyncIterator, Dict, Mapping
 
 from aiobotocore.session import get_session
 from endgame.ncaabb import NcaabbGender
 
 from .config import Config
-from .io import list_keys, read_from_s3, save_data_to_s3
-
-
-class _DatedStore[_StoreType]:
-    def __init__(
-        self,
-        client,
-        bucket: str,
-        prefix: str,
-        serializer: Callable[[_StoreType], bytes],
-        deserializer: Callable[[bytes], _StoreType],
-        extension: str,
-    ) -> None:
+from .io import (
+    S3NotFoundException,
+    delete_from_s3,
+    list_keys,
+    read_from_s3,
+    save_data_to_s3,
+    stream_from_s3,
+)
+
+# One game's play by play: its "game_id" and its "plays"
+Pbp = Mapping[str, Any]
+
+# Tells zlib to read and write gzip's header and trailer, so the files
+# open with any gzip tool
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+_EXTENSION = ".ndjson.gz"
+# How days were saved before: one uncompressed JSON list each
+_LEGACY_EXTENSION = ".json"
+
+
+class PbpWriter:
+    """
+    Compresses a day's play by play a game at a time, as it comes in,
+    into newline-delimited JSON. Only the compressed day stays in memory.
+    """
+
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(wbits=_GZIP_WBITS)
+        self._chunks: list[bytes] = []
+        self.game_ids: set[str] = set()
+
+    def write(self, pbp: Pbp) -> None:
+        line = json.dumps(pbp, separators=(",", ":")).encode() + b"\n"
+        self._chunks.append(self._compressor.compress(line))
+        self.game_ids.add(pbp["game_id"])
+
+    def finish(self) -> bytes:
+        self._chunks.append(self._compressor.flush())
+        return b"".join(self._chunks)
+
+
+async def iter_pbp_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Pbp]:
+    """
+    Each game in a gzipped, newline-delimited day,
+    decoded as its compressed chunks arrive
+    """
+    decompressor = zlib.decompressobj(wbits=_GZIP_WBITS)
+    pending = b""
+    async for chunk in chunks:
+        pending += decompressor.decompress(chunk)
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line:
+                yield json.loads(line)
+    pending += decompressor.flush()
+    if pending.strip():
+        yield json.loads(pending)
+
+
+class _PbpStore:
+    """
+    Each day's play by play for a league, as a gzipped file with a game
+    per line, so days can be written and read a game at a time.
+    Days saved as plain JSON lists, from before, can still be read.
+    """
+
+    def __init__(self, client, bucket: str, prefix: str) -> None:
         self._client = client
         self._bucket = bucket
         self._prefix = prefix
-        self._serializer = serializer
-        self._deserializer = deserializer
-        self._extension = extension
 
-    async def save(
-        self, value: _StoreType, date: datetime.date, league: NcaabbGender
-    ) -> None:
+    @asynccontextmanager
+    async def writer(
+        self, date: datetime.date, league: NcaabbGender
+    ) -> AsyncIterator[PbpWriter]:
+        """
+        Write a day's games one at a time. The day's saved when the
+        block finishes, and not at all if it raises.
+        """
+        writer = PbpWriter()
+        yield writer
         await save_data_to_s3(
-            self._bucket,
-            self._build_key(date, league),
-            self._serializer(value),
+            self._bucket, self._build_key(date, league), writer.finish()
         )
 
-    async def load(self, date: datetime.date, league: NcaabbGender) -> _StoreType:
-        data = await read_from_s3(
-            self._bucket,
-            self._build_key(date, league),
-            self._client,
-        )
-        return self._deserializer(data)
+    async def load(
+        self, date: datetime.date, league: NcaabbGender
+    ) -> AsyncIterator[Pbp]:
+        """
+        A day's games, one at a time
+        """
+        try:
+            async for pbp in self._load_key(self._build_key(date, league)):
+                yield pbp
+        except S3NotFoundException:
+            legacy_key = self._build_key(date, league, _LEGACY_EXTENSION)
+            async for pbp in self._load_key(legacy_key):
+                yield pbp
 
-    async def load_all(self, league: NcaabbGender) -> AsyncIterator[_StoreType]:
-        prefix = self._build_prefix(league)
-        async for key in list_keys(self._bucket, prefix, self._client):
-            data = await read_from_s3(self._bucket, key, self._client)
-            yield self._deserializer(data)
+    async def load_all(self, league: NcaabbGender) -> AsyncIterator[list[Pbp]]:
+        """
+        Every day's games, a day at a time
+        """
+        async for key in self._list_day_keys(league):
+            yield [pbp async for pbp in self._load_key(key)]
+
+    async def iter_games(self, league: NcaabbGender) -> AsyncIterator[Pbp]:
+        """
+        Every day's games, one at a time
+        """
+        async for key in self._list_day_keys(league):
+            async for pbp in self._load_key(key):
+                yield pbp
+
+    async def list_days(self, league: NcaabbGender) -> AsyncIterator[datetime.date]:
+        """
+        Every day that's been saved, in order
+        """
+        async for key in self._list_day_keys(league):
+            name = key.removeprefix(f"{self._build_prefix(league)}/")
+            yield datetime.date.fromisoformat(name.split(".")[0])
+
+    async def _list_day_keys(self, league: NcaabbGender) -> AsyncIterator[str]:
+        # A day that was saved both ways was redone, so the new one wins
+        days: Dict[str, str] = {}
+        async for key in list_keys(
+            self._bucket, self._build_prefix(league), self._client
+        ):
+            for extension in (_EXTENSION, _LEGACY_EXTENSION):
+                if key.endswith(extension):
+                    day = key.removesuffix(extension)
+                    if extension == _EXTENSION or day not in days:
+                        days[day] = key
+                    break
+        for day in sorted(days):
+            yield days[day]
+
+    async def _load_key(self, key: str) -> AsyncIterator[Pbp]:
+        if key.endswith(_LEGACY_EXTENSION):
+            for pbp in json.loads(await read_from_s3(self._bucket, key, self._client)):
+                yield pbp
+            return
+        async for pbp in iter_pbp_lines(
+            stream_from_s3(self._bucket, key, self._client)
+        ):
+            yield pbp
 
     def _build_prefix(self, league: NcaabbGender) -> str:
         return f"{self._prefix}/{league.name}"
 
-    def _build_key(self, date: datetime.date, league: NcaabbGender) -> str:
-        return f"{self._build_prefix(league)}/{date.isoformat()}.{self._extension}"
+    def _build_key(
+        self, date: datetime.date, league: NcaabbGender, extension: str = _EXTENSION
+    ) -> str:
+        return f"{self._build_prefix(league)}/{date.isoformat()}{extension}"
 
 
-_StoreType = TypeVar("_StoreType")
+class _GameCheckpoints:
+    """
+    Each game's play by play, saved as soon as it's fetched, so a job
+    that's retried or resumed only has to fetch the games it's missing.
+    Cleared once the whole day is in the pbp store.
+    """
+
+    def __init__(self, client, bucket: str, prefix: str) -> None:
+        self._client = client
+        self._bucket = bucket
+        self._prefix = prefix
+
+    async def save(self, pbp: Pbp, date: datetime.date, league: NcaabbGender) -> None:
+        key = f"{self._build_prefix(date, league)}{pbp['game_id']}.json"
+        await save_data_to_s3(self._bucket, key, json.dumps(pbp).encode())
+
+    async def load(
+        self, date: datetime.date, league: NcaabbGender
+    ) -> AsyncIterator[Pbp]:
+        prefix = self._build_prefix(date, league)
+        async for key in list_keys(self._bucket, prefix, self._client):
+            yield json.loads(await read_from_s3(self._bucket, key, self._client))
+
+    async def clear(self, date: datetime.date, league: NcaabbGender) -> None:
+        prefix = self._build_prefix(date, league)
+        keys = [k async for k in list_keys(self._bucket, prefix, self._client)]
+        for key in keys:
+            await delete_from_s3(self._bucket, key, self._client)
+
+    def _build_prefix(self, date: datetime.date, league: NcaabbGender) -> str:
+        return f"{self._prefix}/{league.name}/{date.isoformat()}/"
 
 
 @asynccontextmanager
-async def _get_store(
-    prefix: str,
-    serializer: Callable[[_StoreType], bytes],
-    deserializer: Callable[[bytes], _StoreType],
-    extension: str,
-) -> AsyncIterator[_DatedStore[_StoreType]]:
+async def get_pbp_store() -> AsyncIterator[_PbpStore]:
     session = get_session()
     async with session.create_client("s3") as client:
-        yield _DatedStore[_StoreType](
-            client,
-            Config.init_from_file().bucket,
-            prefix,
-            serializer,
-            deserializer,
-            extension,
-        )
+        yield _PbpStore(client, Config.init_from_file().bucket, "plays/ncaabb")
 
 
-def get_pbp_store() -> AsyncContextManager[_DatedStore[Sequence[Mapping[str, Any]]]]:
-    return _get_store(
-        "plays/ncaabb",
-        lambda d: json.dumps(d).encode(),
-        lambda b: json.loads(b.decode()),
-        "json",
-    )
+@asynccontextmanager
+async def get_pbp_checkpoints() -> AsyncIterator[_GameCheckpoints]:
+    session = get_session()
+    async with session.create_client("s3") as client:
+        yield _GameCheckpoints(
+            client, Config.init_from_file().bucket, "checkpoints/plays/ncaabb"
+        )
@@ -1,6 +1,33 @@
+import gzip
+import json
+from typing import AsyncIterator
+
 from endgame.ncaabb import NcaabbGender
 
-from .stores import get_pbp_store
+from .stores import PbpWriter, get_pbp_store, iter_pbp_lines
+
+
+async def _chunked(data: bytes, size: int) -> AsyncIterator[bytes]:
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+async def test_pbp_lines_round_trip() -> None:
+    pbps = [
+        dict(game_id=str(i), plays=[dict(id=j, text="Made\nJumper") for j in range(i)])
+        for i in range(20)
+    ]
+    writer = PbpWriter()
+    for pbp in pbps:
+        writer.write(pbp)
+    data = writer.finish()
+
+    # Plain gzip, a game per line
+    lines = gzip.decompress(data).splitlines()
+    assert [json.loads(line) for line in lines] == pbps
+    assert writer.game_ids == {str(i) for i in range(20)}
+    # However the download gets chunked
+    assert [p async for p in iter_pbp_lines(_chunked(data, 7))] == pbps
 
 
 async def test_pbp_store_list() -> None:
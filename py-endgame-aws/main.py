@@ -1,31 +1,43 @@
+import asyncio
 import json
 import re
+import tempfile
 from dataclasses import dataclass
 from datetime import date, datetime
-from typing import AsyncIterator, Awaitable, Callable
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Iterator
 from zoneinfo import ZoneInfo
 
+from endgame.async_tools import stream_in_parallel
 from endgame.espn_odds import Odds as EspnOdds
 from endgame.ncaabb import NcaabbGender, get_plays_for_day
-from endgame.ncaabb.box_score.all import get_season_box_scores
-from endgame.ncaabb.matchup import apply_in_parallel, get_possessions, logger
+from endgame.ncaabb.box_score.all import BoxScore, get_season_box_scores
+from endgame.ncaabb.matchup import (
+    get_possessions,
+    logger,
+    possessions_from_box_score,
+)
 from endgame.ncaabb.ncaabb import (
     REGULAR_SEASON_START,
     Season,
     get_ncaabb_season,
     get_ncaabb_spreads,
 )
+from endgame.ncaabb.pbp_table import EventTableStore, season_for_day
 from endgame.ncaabb.possession_side import PossessionSide
 from endgame.ncaafb import get_current_odds as get_ncaafb_current_odds
 from endgame.ncaafb import get_season as get_ncaafb_season
 from endgame.nfl.games import get_current_odds as get_nfl_current_odds
 from endgame.nfl.games import get_season as get_nfl_season
 from endgame.types import group_games_into_weeks, iter_weeks
+from endgame.web import closes_session
 from fire import Fire
 
 from endgame_aws import (
     Config,
     FlattenedBoxScore,
+    download_key,
+    get_pbp_checkpoints,
     get_pbp_store,
     list_all_keys,
     read_box_scores,
@@ -77,7 +89,34 @@ async def _load_box_scores(
         return []
 
 
-async def box_scores(gender_name: str, year: int):
+def _iter_matchup_args(
+    season: Season, gender: NcaabbGender, pulled_game_ids: set[str]
+) -> Iterator[tuple[NcaabbGender, str]]:
+    # Logged a week at a time, as the stream gets to each week.
+    # The next week's games start as soon as there's room,
+    # rather than waiting on the slowest game of this one.
+    for week in iter_weeks(season):
+        game_ids = [g.game_id for g in week.games if g.game_id not in pulled_game_ids]
+        if not game_ids:
+            logger.info("No new matchups for %d %d", season.year, week.number)
+            continue
+        logger.info("Getting matchups for %d %d", season.year, week.number)
+        for game_id in game_ids:
+            yield gender, game_id
+
+
+@closes_session
+async def box_scores(
+    gender_name: str, year: int, possessions_from_box_scores: bool = True
+):
+    """
+    Update a season's games, possessions and box scores.
+
+    With `possessions_from_box_scores`, possessions are worked out from the
+    box scores, and matchup pages only get fetched for games the box scores
+    couldn't cover (ex: ones without a box score, or without the teams'
+    totals rows), rather than for every game.
+    """
     gender = NcaabbGender[gender_name]
     season_so_far = await _load_season(_CONFIG.bucket, year, gender)
     season = await get_ncaabb_season(year, gender, season_so_far)
@@ -90,46 +129,38 @@ async def box_scores(gender_name: str, year: int):
 
     rows_so_far = await _load_possessions(_CONFIG.bucket, year, gender)
     rows: list[dict] = [r.to_dict() for r in rows_so_far]
-    pulled_game_ids = {side.game_id for side in rows_so_far}
-    # A week at a time, so the work is batched (and logged) in chunks
-    # rather than firing off a whole season's games at once.
-    for week in iter_weeks(season):
-        args = [
-            (gender, game.game_id)
-            for game in week.games
-            if game.game_id not in pulled_game_ids
-        ]
-        if not args:
-            logger.info("No new matchups for %d %d", season.year, week.number)
-            continue
-        logger.info("Getting matchups for %d %d", season.year, week.number)
-        games = apply_in_parallel(get_possessions, args)
-        async for sides in games:
-            if sides is None:
-                continue
-            rows.extend(side.to_dict() for side in sides)
-    await save_csv_to_s3(rows, _CONFIG.bucket, _build_possession_key(year, gender))
+    possession_game_ids = {side.game_id for side in rows_so_far}
 
     box_score_rows_so_far = await _load_box_scores(_CONFIG.bucket, year, gender)
     box_score_rows: list[dict] = [r.to_dict() for r in box_score_rows_so_far]
-    pulled_game_ids = {side.game_id for side in box_score_rows_so_far}
-    async for box_score in get_season_box_scores(season, gender, pulled_game_ids):
-        box_score_rows.extend(
-            FlattenedBoxScore.from_player(
-                player,
-                team_id=box_score.home.team_id,
-                game_id=box_score.game_id,
-            ).to_dict()
-            for player in box_score.home.players
-        )
-        box_score_rows.extend(
-            FlattenedBoxScore.from_player(
-                player,
-                team_id=box_score.away.team_id,
-                game_id=box_score.game_id,
-            ).to_dict()
-            for player in box_score.away.players
-        )
+    box_score_game_ids = {side.game_id for side in box_score_rows_so_far}
+
+    skip_game_ids = box_score_game_ids
+    if possessions_from_box_scores:
+        skip_game_ids = box_score_game_ids & possession_game_ids
+    async for box_score in get_season_box_scores(season, gender, skip_game_ids):
+        if box_score.game_id not in box_score_game_ids:
+            box_score_rows.extend(_flatten_box_score(box_score))
+        # Without the teams' totals rows, the players don't add up to
+        # everything (ex: team rebounds), so the matchup page is better
+        has_totals = box_score.home.totals and box_score.away.totals
+        if (
+            possessions_from_box_scores
+            and has_totals
+            and box_score.game_id not in possession_game_ids
+        ):
+            sides = possessions_from_box_score(box_score)
+            rows.extend(side.to_dict() for side in sides)
+            possession_game_ids.add(box_score.game_id)
+
+    args = _iter_matchup_args(season, gender, possession_game_ids)
+    async for completed in stream_in_parallel(get_possessions, args):
+        sides = completed.get()
+        if sides is None:
+            continue
+        rows.extend(side.to_dict() for side in sides)
+    await save_csv_to_s3(rows, _CONFIG.bucket, _build_possession_key(year, gender))
+
     if not box_score_rows:
         # Early seasons (ex: NCAAWBB 2011) don't have box scores
         return
@@ -138,6 +169,14 @@ async def box_scores(gender_name: str, year: int):
     )
 
 
+def _flatten_box_score(box_score: BoxScore) -> Iterator[dict]:
+    for team in (box_score.home, box_score.away):
+        for player in team.players:
+            yield FlattenedBoxScore.from_player(
+                player, team_id=team.team_id, game_id=box_score.game_id
+            ).to_dict()
+
+
 # Leagues whose games are a single "get the season, save it" pull.
 # ncaabb isn't here: its `box_scores` command also pulls possessions/box
 # scores, so it stays a separate, bigger pipeline.
@@ -147,6 +186,7 @@ _GAMES_LEAGUES: dict[str, Callable[[int], Awaitable[Season]]] = {
 }
 
 
+@closes_session
 async def games(league: str, year: int) -> None:
     season = await _GAMES_LEAGUES[league](year)
     await save_to_s3([season], _CONFIG.bucket, f"seasons/{year}/{league}.pkl")
@@ -155,6 +195,7 @@ async def games(league: str, year: int) -> None:
 _NCAABB_SEASON_KEY_RE = re.compile(r"^seasons/(\d+)/(mens|womens)\.pkl$")
 
 
+@closes_session
 async def regroup_ncaabb_weeks(dry_run: bool = True) -> None:
     """
     Rebuild the week grouping on already-saved ncaabb seasons.
@@ -229,6 +270,7 @@ _ODDS_LEAGUES: dict[str, _OddsLeague] = {
 }
 
 
+@closes_session
 async def odds(league: str, day: str | None = None, time: str | None = None) -> None:
     now = datetime.now(tz=ZoneInfo("America/Chicago"))
     parsed_date = _parse_date(day)
@@ -241,13 +283,62 @@ async def odds(league: str, day: str | None = None, time: str | None = None) ->
     )
 
 
+@closes_session
 async def plays(league: str, day: str | None = None) -> None:
+    """
+    Save a day's play by play. Each game is checkpointed as it comes in,
+    so if this fails partway, running it again picks up where it left off.
+    """
     parsed_date = _parse_date(day)
-    pbps = get_plays_for_day(parsed_date, NcaabbGender[league])
-    all_plays = [plays async for plays in pbps]
-    async with get_pbp_store() as store:
-        await store.save(all_plays, parsed_date, NcaabbGender[league])
-    print(f"Saved pbp for {len(all_plays)} games for {league} on {parsed_date}.")
+    gender = NcaabbGender[league]
+    async with get_pbp_checkpoints() as checkpoints, get_pbp_store() as store:
+        # Streamed into the day's file as they come in, rather than held onto
+        async with store.writer(parsed_date, gender) as writer:
+            async for pbp in checkpoints.load(parsed_date, gender):
+                writer.write(pbp)
+            if writer.game_ids:
+                logger.info("Resuming with %d games' plays", len(writer.game_ids))
+            async for pbp in get_plays_for_day(parsed_date, gender, writer.game_ids):
+                await checkpoints.save(pbp, parsed_date, gender)
+                writer.write(pbp)
+        await checkpoints.clear(parsed_date, gender)
+    n_games = len(writer.game_ids)
+    print(f"Saved pbp for {n_games} games for {league} on {parsed_date}.")
+
+
+@closes_session
+async def pbp_table(league: str, year: int) -> None:
+    """
+    Bring a season's play by play event table up to date with the pbp
+    store, appending the days it doesn't have yet. Run it after `plays`,
+    one season at a time: appends to the same season can't overlap.
+    """
+    gender = NcaabbGender[league]
+    prefix = f"pbp_table/{gender.name}/{year}/"
+    with tempfile.TemporaryDirectory() as tmp:
+        tables = EventTableStore(Path(tmp))
+        season_dir = tables.season_dir(gender, year)
+        # New days always go in new parts, so the index is all that's
+        # needed to append. The parts already up there stay put.
+        index = season_dir / "index.json"
+        await download_key(_CONFIG.bucket, prefix + index.name, index)
+        have = tables.days(gender, year)
+        new_parts: list[Path] = []
+        async with get_pbp_store() as store:
+            async for day in store.list_days(gender):
+                if season_for_day(day) != year or day in have:
+                    continue
+                pbps = [pbp async for pbp in store.load(day, gender)]
+                part = await asyncio.to_thread(tables.append, gender, day, pbps)
+                if part is not None:
+                    new_parts.append(part)
+        # The index last, so it never lists a part that isn't up yet
+        for path in [*new_parts, index]:
+            if path.is_file():
+                await save_data_to_s3(
+                    _CONFIG.bucket, prefix + path.name, path.read_bytes()
+                )
+    print(f"Added {len(new_parts)} parts to the {league} {year} pbp table.")
 
 
 if __name__ == "__main__":
@@ -256,6 +347,7 @@ if __name__ == "__main__":
             "box_scores": box_scores,
             "games": games,
             "odds": odds,
+            "pbp_table": pbp_table,
             "plays": plays,
             "regroup_ncaabb_weeks": regroup_ncaabb_weeks,
         }
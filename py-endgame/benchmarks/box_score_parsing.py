@@ -0,0 +1,116 @@
+"""
+Box score pages parsed per second, from the HTML tables vs. from the
+`__espnfitt__` JSON the page embeds, and whether the two agree.
+
+    poetry run python benchmarks/box_score_parsing.py --cassette=~/.endgame/cassettes
+
+Uses every box score page in --cassette (recorded with
+ENDGAME_HTTP_MODE=record, ex: while running `endgame update ncaambb`)
+if it's given, otherwise synthetic pages padded out to about the size
+of ESPN's.
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from fire import Fire
+
+from endgame.cassette import Cassette
+from endgame.ncaabb.box_score.all import (
+    _parse_box_score_html,
+    _parse_box_score_json,
+)
+
+_COLUMNS = "MIN FG 3PT FT OREB DREB REB AST STL BLK TO PF PTS".split()
+_STATS = "30 5-10 1-3 2-2 1 3 4 2 1 0 2 3 13".split()
+
+
+def _synthetic_page(game_id: int, n_players: int, padding_kb: int) -> bytes:
+    teams: List[Dict[str, Any]] = []
+    # Each team's players' links, in the order they're listed
+    team_links: List[List[str]] = []
+    html: List[str] = []
+    for team_id, side in ((game_id * 2, "away"), (game_id * 2 + 1, "home")):
+        links = [
+            f"https://www.espn.com/mens-college-basketball/player/_/id/"
+            f"{team_id * 100 + i}/player-{i}"
+            for i in range(n_players)
+        ]
+        team_links.append(links)
+        athletes = [dict(athlt=dict(lnk=link), stats=_STATS) for link in links]
+        teams.append(
+            dict(
+                tm=dict(id=str(team_id), hmAw=side),
+                stats=[dict(lbls=_COLUMNS, athlts=athletes)],
+            )
+        )
+        html.append(
+            f'<div class="Gamestrip__Team--{side}">'
+            f'<a href="/mens-college-basketball/team/_/id/{team_id}/t">T</a></div>'
+        )
+    for links in team_links:
+        names = "".join(f'<tr><td><a href="{link}">P</a></td></tr>' for link in links)
+        header = "".join(f'<td class="Table__customHeader">{c}</td>' for c in _COLUMNS)
+        row = "<tr>" + "".join(f"<td>{v}</td>" for v in _STATS) + "</tr>"
+        html.append(
+            '<div class="Boxscore ResponsiveTable"><table>'
+            f'<tr><td class="Table__customHeader">starters</td></tr>{names}</table>'
+            f"<table><tr>{header}</tr>{row * n_players}</table></div>"
+        )
+    # The rest of a real page: navigation, ads, other games...
+    padding = '<div class="Nav"><a href="/x">Link</a><span>Text</span></div>'
+    html.append(padding * (padding_kb * 1024 // len(padding)))
+    state = dict(page=dict(content=dict(gamepackage=dict(bxscr=teams))))
+    html.append(f"<script>window['__espnfitt__']={json.dumps(state)};</script>")
+    return f"<html><body>{''.join(html)}</body></html>".encode()
+
+
+def _recorded_pages(root: Path) -> List[bytes]:
+    cassette = Cassette(root)
+    recordings = (cassette.play(key) for key in cassette.keys())
+    return [
+        r.body
+        for r in recordings
+        if r is not None and r.status == 200 and "/boxscore" in r.request
+    ]
+
+
+def _pages_per_s(pages: List[bytes], parse: Callable[[bytes], object]) -> float:
+    start = time.perf_counter()
+    for page in pages:
+        parse(page)
+    return len(pages) / (time.perf_counter() - start)
+
+
+def main(
+    n_pages: int = 50,
+    n_players: int = 12,
+    padding_kb: int = 300,
+    cassette: Optional[str] = None,
+) -> None:
+    if cassette is None:
+        pages = [_synthetic_page(i, n_players, padding_kb) for i in range(n_pages)]
+    else:
+        pages = _recorded_pages(Path(cassette).expanduser())
+    print(f"{len(pages)} pages, {sum(len(p) for p in pages) / 1e6:.1f}MB")
+
+    html_rate = _pages_per_s(pages, lambda p: _parse_box_score_html(p, "", ""))
+    json_rate = _pages_per_s(pages, lambda p: _parse_box_score_json(p, ""))
+    print(f"html: {html_rate:8.1f} pages/s")
+    print(f"json: {json_rate:8.1f} pages/s ({json_rate / html_rate:.1f}x)")
+
+    fallbacks = 0
+    mismatches = 0
+    for page in pages:
+        from_json = _parse_box_score_json(page, "")
+        if from_json is None:
+            fallbacks += 1
+        elif from_json != _parse_box_score_html(page, "", ""):
+            mismatches += 1
+    print(f"{fallbacks} pages left to the HTML, {mismatches} where the two disagree")
+
+
+if __name__ == "__main__":
+    Fire(main)
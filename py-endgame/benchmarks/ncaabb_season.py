@@ -0,0 +1,135 @@
+"""
+Wall-clock time, and requests sent, to fetch one NCAABB season with
+`get_ncaabb_season`, replayed from a cassette: one day per request
+(one at a time, then concurrently), then a week per request.
+
+    poetry run python benchmarks/ncaabb_season.py --latency_s=0.1
+
+Without --cassette, it records synthetic ones first: every scoreboard
+is an empty one from a local server, with a made-up calendar. Pass
+--cassette (recorded with ENDGAME_HTTP_MODE=record) to replay real
+responses instead; it only covers the runs with the
+ENDGAME_NCAABB_DAYS_PER_REQUEST it was recorded with.
+
+The per-host rate limit is lifted, since this measures how much of the
+latency overlaps, not how politely ESPN gets asked.
+"""
+
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fire import Fire
+
+from endgame.ncaabb import ncaabb
+from endgame.ncaabb.gender import NcaabbGender
+from endgame.ncaabb.ncaabb import NcaabbGroup
+from endgame.web import retry_stats, run
+
+
+class _Run(NamedTuple):
+    name: str
+    days_per_request: int
+    max_parallel: int
+
+
+# Roughly when each group plays, as (month, day) spans. Groups missing
+# here get no calendar, so every one of their days gets asked about.
+_SYNTHETIC_CALENDAR = {
+    NcaabbGroup.d1.value: ((11, 13), (3, 13)),
+    NcaabbGroup.ncaa.value: ((3, 15), (4, 4)),
+    NcaabbGroup.nit.value: ((3, 15), (3, 31)),
+}
+
+
+def _synthetic_calendar(year: int, group: int) -> List[str]:
+    if group not in _SYNTHETIC_CALENDAR:
+        return []
+    (start_month, start_day), (end_month, end_day) = _SYNTHETIC_CALENDAR[group]
+    day = date(year if start_month > 6 else year + 1, start_month, start_day)
+    days = []
+    while day <= date(year + 1, end_month, end_day):
+        days.append(f"{day.isoformat()}T08:00Z")
+        day += timedelta(days=1)
+    return days
+
+
+async def _record_synthetic(
+    year: int, days_per_request: Iterable[int], root: Path
+) -> None:
+    async def handler(request: web.Request) -> web.Response:
+        calendar = _synthetic_calendar(year, int(request.query["groups"]))
+        league = dict(calendarType="day", calendarIsWhitelist=True, calendar=calendar)
+        return web.json_response(dict(events=[], leagues=[league]))
+
+    app = web.Application()
+    app.router.add_get("/{gender}/scoreboard", handler)
+    # One server for everything, since its URL is part of what's recorded
+    async with TestServer(app) as server:
+        url = str(server.make_url("/")) + "{}/scoreboard"
+        # setattr, since type checkers hold module constants to their values
+        setattr(ncaabb, "NCAABB_SCOREBOARD", url)
+        for days in days_per_request:
+            os.environ["ENDGAME_NCAABB_DAYS_PER_REQUEST"] = str(days)
+            # A fresh cache, so the last pass's season isn't reused
+            os.environ["ENDGAME_CACHE_DIR"] = str(root / f"cache_record_{days}")
+            await ncaabb.get_ncaabb_season(year, NcaabbGender.mens)
+
+
+async def _fetch_season(year: int) -> int:
+    season = await ncaabb.get_ncaabb_season(year, NcaabbGender.mens)
+    assert not season.trouble_params, "Some days weren't in the cassette"
+    return sum(s.requests for s in retry_stats())
+
+
+def _time_season(year: int, root: Path, name: str) -> Tuple[float, int]:
+    """
+    How long fetching the season took, and how many requests it sent
+    """
+    # A fresh cache each time, so every request goes to the cassette
+    os.environ["ENDGAME_CACHE_DIR"] = str(root / f"cache_{name}")
+    start = time.perf_counter()
+    requests = run(_fetch_season(year))
+    return time.perf_counter() - start, requests
+
+
+def main(
+    year: int = 2015,
+    latency_s: float = 0.1,
+    cassette: Optional[str] = None,
+) -> None:
+    runs = [
+        _Run("a day, one at a time", 1, 1),
+        _Run("a day, concurrently", 1, ncaabb._MAX_PARALLEL_RANGES),
+        _Run("a week, concurrently", 7, ncaabb._MAX_PARALLEL_RANGES),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        os.environ["ENDGAME_MAX_REQUESTS_PER_S"] = "100000"
+        if cassette is None:
+            os.environ["ENDGAME_HTTP_MODE"] = "record"
+            os.environ["ENDGAME_CASSETTE_DIR"] = str(root / "cassette")
+            run(_record_synthetic(year, {r.days_per_request for r in runs}, root))
+
+        os.environ["ENDGAME_HTTP_MODE"] = "replay"
+        os.environ["ENDGAME_REPLAY_LATENCY_S"] = str(latency_s)
+        os.environ["ENDGAME_CASSETTE_DIR"] = cassette or str(root / "cassette")
+        parallel_ranges = ncaabb._MAX_PARALLEL_RANGES
+        results = []
+        for i, (name, days_per_request, max_parallel) in enumerate(runs):
+            os.environ["ENDGAME_NCAABB_DAYS_PER_REQUEST"] = str(days_per_request)
+            setattr(ncaabb, "_MAX_PARALLEL_RANGES", max_parallel)
+            results.append((name, *_time_season(year, root, str(i))))
+        setattr(ncaabb, "_MAX_PARALLEL_RANGES", parallel_ranges)
+
+    for name, elapsed, requests in results:
+        print(f"{name:24} {elapsed:8.2f}s {requests:6d} requests")
+
+
+if __name__ == "__main__":
+    Fire(main)
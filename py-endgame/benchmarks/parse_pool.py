@@ -0,0 +1,61 @@
+"""
+Box score pages parsed per second through the `Scheduler`, in threads
+vs. a pool of worker processes, on synthetic pages.
+
+    poetry run python -m benchmarks.parse_pool --processes=1,2,4
+
+Threads are held to one core by the GIL, so the pool should scale with
+--processes until it runs out of cores, less what shipping pages to the
+workers costs (which --chunk_size spreads out). With one core it can't win:
+1.6 pages/s in threads vs. 1.6-1.7 in 1-4 processes. That's why
+`ENDGAME_PARSE_PROCESSES` is off by default; turn it on only where this
+shows a speedup.
+"""
+
+import asyncio
+import os
+import time
+from typing import Iterable, List, Union
+
+from fire import Fire
+
+from benchmarks.box_score_parsing import _synthetic_page
+from endgame.ncaabb.box_score.all import _parse_box_score_html
+from endgame.scheduler import Scheduler
+
+
+async def _parse_all(scheduler: Scheduler, pages: List[bytes]) -> None:
+    await asyncio.gather(
+        *(scheduler.parse(_parse_box_score_html, page, "", "") for page in pages)
+    )
+
+
+def _pages_per_s(scheduler: Scheduler, pages: List[bytes]) -> float:
+    # Once to start the workers, then for real
+    asyncio.run(_parse_all(scheduler, pages[:1]))
+    start = time.perf_counter()
+    asyncio.run(_parse_all(scheduler, pages))
+    return len(pages) / (time.perf_counter() - start)
+
+
+def main(
+    n_pages: int = 40,
+    padding_kb: int = 300,
+    processes: Union[int, Iterable[int]] = (1, 2, 4),
+    chunk_size: int = 4,
+) -> None:
+    if isinstance(processes, int):
+        processes = [processes]
+    pages = [_synthetic_page(i, 12, padding_kb) for i in range(n_pages)]
+    print(f"{len(pages)} pages, {os.cpu_count()} cores")
+
+    threads = _pages_per_s(Scheduler(1, os.cpu_count() or 1), pages)
+    print(f"{'threads':12} {threads:8.1f} pages/s")
+    for n in processes:
+        scheduler = Scheduler(1, 1, parse_processes=n, parse_chunk_size=chunk_size)
+        rate = _pages_per_s(scheduler, pages)
+        print(f"{n:2d} processes {rate:8.1f} pages/s ({rate / threads:.1f}x)")
+
+
+if __name__ == "__main__":
+    Fire(main)
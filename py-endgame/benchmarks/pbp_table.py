@@ -0,0 +1,69 @@
+"""
+Seconds to load a season of play by play from its event table vs.
+decoding every game's JSON (like reading each day from the pbp store),
+on synthetic games.
+
+    poetry run python -m benchmarks.pbp_table --n_games=6000
+
+Also reports how long building the table took, and its size on disk.
+"""
+
+import json
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List
+
+from fire import Fire
+
+from benchmarks.plays_parsing import _synthetic_page
+from endgame.ncaabb.espnfitt import find_gamepackage_part
+from endgame.ncaabb.gender import NcaabbGender
+from endgame.ncaabb.pbp_table import EventTableStore
+
+_GAMES_PER_DAY = 50
+
+
+def _synthetic_days(n_games: int, n_plays: int) -> List[List[dict]]:
+    # The plays out of a page, so they look like the real thing
+    pbp = find_gamepackage_part(_synthetic_page(0, n_plays, 0), "pbp")
+    assert pbp is not None
+    plays = pbp["plays"]
+    games = [dict(game_id=str(i), plays=plays) for i in range(n_games)]
+    return [
+        games[start : start + _GAMES_PER_DAY]
+        for start in range(0, n_games, _GAMES_PER_DAY)
+    ]
+
+
+def main(n_games: int = 1000, n_plays: int = 450) -> None:
+    days = _synthetic_days(n_games, n_plays)
+    as_json = [json.dumps(day).encode() for day in days]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EventTableStore(Path(tmp))
+        start = time.perf_counter()
+        for i, day in enumerate(days):
+            store.append(NcaabbGender.mens, date(2025, 11, 4) + timedelta(i), day)
+        built_s = time.perf_counter() - start
+        season_dir = store.season_dir(NcaabbGender.mens, 2025)
+        table_mb = sum(p.stat().st_size for p in season_dir.iterdir()) / 1e6
+
+        start = time.perf_counter()
+        table = store.load(NcaabbGender.mens, 2025)
+        table_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for data in as_json:
+        json.loads(data)
+    json_s = time.perf_counter() - start
+
+    json_mb = sum(len(d) for d in as_json) / 1e6
+    print(f"{n_games} games, {len(table)} plays")
+    print(f"built in {built_s:.2f}s")
+    print(f"json:  {json_s:6.2f}s to load, {json_mb:8.1f}MB")
+    print(f"table: {table_s:6.2f}s to load, {table_mb:8.1f}MB")
+
+
+if __name__ == "__main__":
+    Fire(main)
@@ -0,0 +1,103 @@
+"""
+Play-by-play pages parsed per second, with BeautifulSoup and a full
+decode of the page's `__espnfitt__` state (how it used to be done) vs.
+a byte scan for the state, then decoding just the plays out of it,
+and whether they agree.
+
+    poetry run python benchmarks/plays_parsing.py --cassette=~/.endgame/cassettes
+
+Uses every play-by-play page in --cassette (recorded with
+ENDGAME_HTTP_MODE=record) if it's given, otherwise synthetic pages
+padded out to about the size of ESPN's.
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from bs4 import BeautifulSoup
+from fire import Fire
+
+from endgame.cassette import Cassette
+from endgame.ncaabb.plays import _parse_plays
+
+
+def _parse_with_soup(raw: bytes) -> list[dict]:
+    soup = BeautifulSoup(raw, "html.parser")
+    scripts = soup.select("script")
+    fit_script = next(script for script in scripts if "espnfitt" in script.text)
+    prefix = "window['__espnfitt__']="
+    data = json.loads(fit_script.text.split(prefix)[-1][:-1])
+    return data["page"]["content"]["gamepackage"]["pbp"]["plays"]
+
+
+def _synthetic_page(game_id: int, n_plays: int, padding_kb: int) -> bytes:
+    plays = [
+        dict(
+            id=f"{game_id}{i}",
+            text=f"Player {i % 10} made Jumper.",
+            awayScore=i,
+            homeScore=i + 1,
+            period=dict(number=1 + i * 2 // n_plays, displayValue="1st Half"),
+            clock=dict(displayValue=f"{19 - i % 20}:{i % 60:02d}"),
+            scoringPlay=i % 3 == 0,
+            team=dict(id=str(game_id % 300)),
+            coordinate=dict(x=i % 50, y=i % 25),
+        )
+        for i in range(n_plays)
+    ]
+    # The rest of the state: the box score, odds, news, standings...
+    other = [dict(id=i, headline="Headline " * 5, links=["/x"] * 5) for i in range(300)]
+    gamepackage = dict(pbp=dict(plays=plays, hasFullPbp=True), news=other)
+    state = dict(
+        app=dict(other=other), page=dict(content=dict(gamepackage=gamepackage))
+    )
+    padding = '<div class="Nav"><a href="/x">Link</a><span>Text</span></div>'
+    return (
+        "<html><body>"
+        f"{padding * (padding_kb * 1024 // len(padding))}"
+        f"<script>window['__espnfitt__']={json.dumps(state)};</script>"
+        "</body></html>"
+    ).encode()
+
+
+def _recorded_pages(root: Path) -> List[bytes]:
+    cassette = Cassette(root)
+    recordings = (cassette.play(key) for key in cassette.keys())
+    return [
+        r.body
+        for r in recordings
+        if r is not None and r.status == 200 and "/playbyplay" in r.request
+    ]
+
+
+def _pages_per_s(pages: List[bytes], parse: Callable[[bytes], object]) -> float:
+    start = time.perf_counter()
+    for page in pages:
+        parse(page)
+    return len(pages) / (time.perf_counter() - start)
+
+
+def main(
+    n_pages: int = 30,
+    n_plays: int = 450,
+    padding_kb: int = 200,
+    cassette: Optional[str] = None,
+) -> None:
+    if cassette is None:
+        pages = [_synthetic_page(i, n_plays, padding_kb) for i in range(n_pages)]
+    else:
+        pages = _recorded_pages(Path(cassette).expanduser())
+    print(f"{len(pages)} pages, {sum(len(p) for p in pages) / 1e6:.1f}MB")
+
+    soup_rate = _pages_per_s(pages, _parse_with_soup)
+    print(f"soup: {soup_rate:8.1f} pages/s")
+    rate = _pages_per_s(pages, _parse_plays)
+    print(f"scan: {rate:8.1f} pages/s ({rate / soup_rate:.1f}x)")
+    mismatches = sum(_parse_plays(p) != _parse_with_soup(p) for p in pages)
+    print(f"{mismatches} pages where they disagree")
+
+
+if __name__ == "__main__":
+    Fire(main)
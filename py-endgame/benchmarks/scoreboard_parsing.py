@@ -0,0 +1,168 @@
+"""
+How fast scoreboard responses parse (events per second), and how much
+memory parsing one takes at its peak, decoding all of it with `json`
+and walking the dicts, with dateutil for dates (how `espn_games` used
+to do it) vs. `espn_games.parse_scoreboard`, which only decodes the
+fields it needs.
+
+    poetry run python benchmarks/scoreboard_parsing.py --n_scoreboards=200
+
+Parses every scoreboard in --cassette (recorded with
+ENDGAME_HTTP_MODE=record) if it's given, otherwise synthetic ones
+shaped like ESPN's.
+"""
+
+import json
+import random
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from dateutil import parser
+from fire import Fire
+
+from endgame import espn_games
+from endgame.cassette import Cassette
+from endgame.types import Game
+
+
+def _synthetic_event(i: int) -> dict:
+    competitors = [
+        dict(
+            id=str(i * 2 + side),
+            homeAway=home_away,
+            score=str(random.randint(40, 100)),
+            team=dict(
+                id=str(i * 2 + side),
+                displayName=f"Team {i * 2 + side}",
+                logo="https://a.espncdn.com/i/teamlogos/ncaa/500/1.png",
+                links=[dict(href="https://www.espn.com/", text="Clubhouse")] * 4,
+            ),
+            linescores=[dict(value=random.randint(10, 50)) for _ in range(2)],
+            statistics=[dict(name="rebounds", displayValue="30")] * 10,
+        )
+        for side, home_away in enumerate(("home", "away"))
+    ]
+    competition = dict(
+        id=str(i),
+        competitors=competitors,
+        neutralSite=False,
+        venue=dict(fullName="Arena", address=dict(city="Town", state="ST")),
+        odds=[dict(details="A -3.5", overUnder=140.5)],
+        notes=[],
+        broadcasts=[dict(market="national", names=["ESPN"])],
+    )
+    return dict(
+        id=str(i),
+        date=f"2015-11-{13 + i % 15}T23:00Z",
+        name=f"Team {i * 2 + 1} at Team {i * 2}",
+        status=dict(type=dict(completed=True, description="Final")),
+        competitions=[competition],
+    )
+
+
+def _synthetic_scoreboards(n_scoreboards: int, n_events: int) -> List[bytes]:
+    return [
+        json.dumps(
+            dict(
+                events=[_synthetic_event(s * n_events + i) for i in range(n_events)],
+                leagues=[dict(calendarType="day", calendar=["2015-11-13T08:00Z"])],
+            )
+        ).encode()
+        for s in range(n_scoreboards)
+    ]
+
+
+def _recorded_scoreboards(root: Path) -> List[bytes]:
+    cassette = Cassette(root)
+    recordings = (cassette.play(key) for key in cassette.keys())
+    return [
+        r.body
+        for r in recordings
+        if r is not None and r.status == 200 and "/scoreboard?" in r.request
+    ]
+
+
+def _parse_slowly(data: bytes) -> int:
+    """
+    Games out of a scoreboard, the old way. Returns how many events it had.
+    """
+    tree = json.loads(data)
+    games = []
+    for event in tree["events"]:
+        competition = event["competitions"][0]
+        home, away = sorted(
+            competition["competitors"], key=lambda c: c["homeAway"] != "home"
+        )
+        game = Game(
+            home=home["team"]["displayName"],
+            home_score=int(home["score"]),
+            away=away["team"]["displayName"],
+            away_score=int(away["score"]),
+            neutral_site=competition["neutralSite"],
+            completed=event["status"]["type"]["completed"],
+            date=parser.parse(event["date"]),
+            game_id=event["id"],
+        )
+        games.append(game)
+    espn_games.parse_calendar_days(tree)
+    return len(tree["events"])
+
+
+def _parse_quickly(data: bytes) -> int:
+    return espn_games.parse_scoreboard(data).n_events
+
+
+def _events_per_s(
+    scoreboards: List[bytes], repeats: int, parse: Callable[[bytes], int]
+) -> float:
+    n_events = 0
+    best_s = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        n_events = sum(parse(s) for s in scoreboards)
+        best_s = min(best_s, time.perf_counter() - start)
+    return n_events / best_s
+
+
+def _peak_mb(scoreboards: List[bytes], parse: Callable[[bytes], int]) -> float:
+    peak = 0
+    for scoreboard in scoreboards:
+        tracemalloc.start()
+        parse(scoreboard)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return peak / 1e6
+
+
+def main(
+    n_scoreboards: int = 100,
+    n_events: int = 100,
+    repeats: int = 5,
+    cassette: Optional[str] = None,
+) -> None:
+    if cassette is None:
+        scoreboards = _synthetic_scoreboards(n_scoreboards, n_events)
+    else:
+        scoreboards = _recorded_scoreboards(Path(cassette))
+    total_mb = sum(len(s) for s in scoreboards) / 1e6
+    print(f"{len(scoreboards)} scoreboards, {total_mb:.1f}MB")
+
+    slow = (
+        _events_per_s(scoreboards, repeats, _parse_slowly),
+        _peak_mb(scoreboards, _parse_slowly),
+    )
+    fast = (
+        _events_per_s(scoreboards, repeats, _parse_quickly),
+        _peak_mb(scoreboards, _parse_quickly),
+    )
+
+    print(f"{'':20}{'events/s':>12}{'peak MB':>10}")
+    print(f"{'json + dateutil':20}{slow[0]:12,.0f}{slow[1]:10.2f}")
+    print(f"{'typed + iso':20}{fast[0]:12,.0f}{fast[1]:10.2f}")
+    print(f"speedup: {fast[0] / slow[0]:.2f}x")
+
+
+if __name__ == "__main__":
+    Fire(main)
@@ -0,0 +1,145 @@
+"""
+Lookup latency and disk footprint of the web cache layouts,
+on a synthetic cache.
+
+The old layout is one uncompressed file per response, all in one directory,
+named after the URL. The new one is `endgame.web_cache.WebCache`: hashed
+names, fanned out two directories deep, gzipped, and looked up through
+a SQLite index.
+
+    poetry run python benchmarks/web_cache.py --n_entries=200000
+
+Builds both caches in a temporary directory (pass --root to put it
+somewhere else), so make sure there's room: roughly
+n_entries * entry_size bytes for the old layout.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import aiofiles
+from fire import Fire
+
+from endgame.web_cache import WebCache, cache_key, normalize_request
+
+_SCOREBOARD = "https://site.api.espn.com/apis/site/v2/sports/basketball/mens-college-basketball/scoreboard"
+
+
+def _parameters(i: int) -> dict:
+    return dict(lang="en", region="us", limit=300, dates=f"{20000101 + i}", groups=50)
+
+
+def _fake_response(i: int, entry_size: int) -> bytes:
+    """Scoreboard-ish JSON, so it compresses about like the real thing"""
+    event = {
+        "id": str(400000000 + i),
+        "date": "2020-01-01T00:00Z",
+        "competitions": [{"neutralSite": False, "competitors": []}],
+        "status": {"type": {"completed": True}},
+    }
+    events = []
+    while len(json.dumps(events)) < entry_size:
+        events.append({**event, "id": str(random.randrange(10**9))})
+    return json.dumps({"events": events}).encode()
+
+
+def _legacy_path(root: Path, i: int) -> Path:
+    param_string = "&".join(f"{k}={v}" for k, v in _parameters(i).items())
+    return root / re.sub("[:/\\.]", "", _SCOREBOARD + param_string)
+
+
+async def _legacy_read(root: Path, i: int) -> Optional[bytes]:
+    # What `web.get` used to do
+    path = _legacy_path(root, i)
+    if not path.is_file():
+        return None
+    async with aiofiles.open(path, "rb") as file:
+        return await file.read()
+
+
+def _disk_usage(root: Path) -> int:
+    return sum(
+        os.stat(os.path.join(directory, name)).st_blocks * 512
+        for directory, _, names in os.walk(root)
+        for name in names
+    )
+
+
+async def _time_lookups(
+    lookup: Callable[[int], Awaitable[Optional[bytes]]], indexes: list[int]
+) -> list[float]:
+    durations = []
+    for i in indexes:
+        start = time.perf_counter()
+        await lookup(i)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _summarize(name: str, durations: list[float]) -> str:
+    micros = sorted(d * 1e6 for d in durations)
+    p99 = micros[int(len(micros) * 0.99)]
+    return f"{name:24} median {statistics.median(micros):8.1f}us  p99 {p99:8.1f}us"
+
+
+async def _main(root: Path, n_entries: int, entry_size: int, n_lookups: int):
+    legacy_root = root / "web"
+    legacy_root.mkdir()
+    cache = WebCache(root / "web_v2")
+
+    print(f"Writing {n_entries} entries of ~{entry_size} bytes to each layout...")
+    payloads = [_fake_response(i, entry_size) for i in range(100)]
+    for i in range(n_entries):
+        payload = payloads[i % len(payloads)]
+        _legacy_path(legacy_root, i).write_bytes(payload)
+        await cache.write(
+            cache_key(_SCOREBOARD, _parameters(i)),
+            payload,
+            normalize_request(_SCOREBOARD, _parameters(i)),
+        )
+    cache.flush()
+
+    hits = random.sample(range(n_entries), min(n_lookups, n_entries))
+    misses = list(range(n_entries, n_entries + n_lookups))
+    lookups = {
+        "old, hit": (lambda i: _legacy_read(legacy_root, i), hits),
+        "old, miss": (lambda i: _legacy_read(legacy_root, i), misses),
+        "new, hit": (
+            lambda i: cache.read(cache_key(_SCOREBOARD, _parameters(i))),
+            hits,
+        ),
+        "new, miss": (
+            lambda i: cache.read(cache_key(_SCOREBOARD, _parameters(i))),
+            misses,
+        ),
+    }
+    for name, (lookup, indexes) in lookups.items():
+        print(_summarize(name, await _time_lookups(lookup, indexes)))
+
+    legacy_bytes = _disk_usage(legacy_root)
+    new_bytes = _disk_usage(cache_root := root / "web_v2")
+    print(f"{'old, on disk':24} {legacy_bytes / 1e6:10.1f}MB")
+    print(f"{'new, on disk':24} {new_bytes / 1e6:10.1f}MB")
+    print(f"{'new, directories':24} {sum(1 for _ in cache_root.glob('*/*')):10d}")
+
+
+def main(
+    n_entries: int = 200_000,
+    entry_size: int = 50_000,
+    n_lookups: int = 10_000,
+    root: Optional[str] = None,
+) -> None:
+    with tempfile.TemporaryDirectory(dir=root) as directory:
+        asyncio.run(_main(Path(directory), n_entries, entry_size, n_lookups))
+
+
+if __name__ == "__main__":
+    Fire(main)
@@ -0,0 +1,75 @@
+"""
+Requests/second through `endgame.web`, against a local aiohttp server.
+
+Compares a new `aiohttp.ClientSession` per request (how `_get_web` used to
+work) with the shared, pooled session.
+
+    poetry run python benchmarks/web_session.py --n_requests=2000
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fire import Fire
+
+from endgame.web import close_session, get_session
+
+# Roughly the size of a busy scoreboard response
+_BODY = b"x" * 200_000
+
+
+async def _fresh_session_get(url: str) -> bytes:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url, raise_for_status=True) as response:
+            return await response.read()
+
+
+async def _shared_session_get(url: str) -> bytes:
+    async with get_session().get(url, raise_for_status=True) as response:
+        return await response.read()
+
+
+async def _time_requests(
+    fetch: Callable[[str], Awaitable[bytes]],
+    url: str,
+    n_requests: int,
+    max_parallel: int,
+) -> float:
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def _one() -> None:
+        async with semaphore:
+            await fetch(url)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one() for _ in range(n_requests)))
+    return n_requests / (time.perf_counter() - start)
+
+
+async def _main(n_requests: int, max_parallel: int) -> None:
+    async def handler(_: web.Request) -> web.Response:
+        return web.Response(body=_BODY)
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    async with TestServer(app) as server:
+        url = str(server.make_url("/"))
+        before = await _time_requests(_fresh_session_get, url, n_requests, max_parallel)
+        after = await _time_requests(_shared_session_get, url, n_requests, max_parallel)
+        await close_session()
+
+    print(f"session per request: {before:8.1f} requests/s")
+    print(f"shared session:      {after:8.1f} requests/s")
+    print(f"speedup:             {after / before:8.2f}x")
+
+
+def main(n_requests: int = 2000, max_parallel: int = 10) -> None:
+    asyncio.run(_main(n_requests, max_parallel))
+
+
+if __name__ == "__main__":
+    Fire(main)
@@ -1,9 +1,25 @@
 import asyncio
 from collections.abc import Coroutine
-from typing import AsyncIterator, Callable, Iterable, TypeVar
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import (
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    ContextManager,
+    Dict,
+    Generic,
+    Iterable,
+    Optional,
+    Set,
+    TypeVar,
+    cast,
+)
 
 from typing_extensions import TypeVarTuple
 
+from .scheduler import fair_share_group
+
 _ArgTypes = TypeVarTuple("_ArgTypes")
 _ReturnType = TypeVar("_ReturnType")
 
@@ -12,15 +28,21 @@ async def apply_in_parallel(
     function: Callable[[*_ArgTypes], Coroutine[None, None, _ReturnType]],
     args: Iterable[tuple[*_ArgTypes]],
     max_parallel: int = 10,
+    group_by: Optional[Callable[[tuple[*_ArgTypes]], str]] = None,
 ) -> AsyncIterator[_ReturnType]:
     """
-    Run a list of tasks in parallel
+    Run a list of tasks in parallel.
+
+    `max_parallel` only caps this call's tasks. What they do underneath
+    (requests, parsing) is capped for the whole process by the `Scheduler`,
+    and shared fairly between the groups `group_by` puts each call in.
     """
     semaphore = asyncio.Semaphore(max_parallel)
 
-    async def _limited_task(arg_set):
+    async def _limited_task(arg_set: tuple[*_ArgTypes]) -> _ReturnType:
         async with semaphore:
-            return await function(*arg_set)
+            with _group(group_by, arg_set):
+                return await function(*arg_set)
 
     tasks: list[asyncio.Task[_ReturnType]] = [
         asyncio.create_task(_limited_task(arg_set)) for arg_set in args
@@ -28,3 +50,103 @@ async def apply_in_parallel(
     results = await asyncio.gather(*tasks)
     for task in results:
         yield task
+
+
+def _group(
+    group_by: Optional[Callable[[tuple[*_ArgTypes]], str]],
+    arg_set: tuple[*_ArgTypes],
+) -> ContextManager[None]:
+    if group_by is None:
+        return nullcontext()
+    return fair_share_group(group_by(arg_set))
+
+
+@dataclass(frozen=True)
+class Completed(Generic[_ReturnType]):
+    """
+    How one call from `stream_in_parallel` went:
+    what it returned, or what it raised
+    """
+
+    args: tuple
+    # Where `args` was in the input
+    index: int
+    value: Optional[_ReturnType] = None
+    error: Optional[Exception] = None
+
+    def get(self) -> _ReturnType:
+        """
+        What the call returned, or raise what it raised
+        """
+        if self.error is not None:
+            raise self.error
+        # Only None here if that's what the call returned
+        return cast(_ReturnType, self.value)
+
+
+async def stream_in_parallel(
+    function: Callable[[*_ArgTypes], Coroutine[None, None, _ReturnType]],
+    args: Iterable[tuple[*_ArgTypes]],
+    max_parallel: int = 10,
+    ordered: bool = False,
+    timeout_s: Optional[float] = None,
+    group_by: Optional[Callable[[tuple[*_ArgTypes]], str]] = None,
+) -> AsyncGenerator[Completed[_ReturnType], None]:
+    """
+    Call `function` on each set of `args`, at most `max_parallel` at a time,
+    yielding each result as soon as it's done (or in input order,
+    if `ordered`). `args` is read lazily, so it can be a generator.
+
+    Exceptions (including a call taking longer than `timeout_s`)
+    come back in the `Completed` rather than being raised, so one
+    failure doesn't lose everything else.
+
+    In order, a slow call holds up everything after it, and its
+    `max_parallel` counts what's waiting to be yielded too,
+    so memory stays bounded.
+
+    `group_by` works like it does for `apply_in_parallel`.
+    """
+
+    async def _call(index: int, arg_set: tuple[*_ArgTypes]) -> Completed[_ReturnType]:
+        try:
+            with _group(group_by, arg_set):
+                value = await asyncio.wait_for(function(*arg_set), timeout_s)
+        except Exception as error:
+            return Completed(arg_set, index, error=error)
+        return Completed(arg_set, index, value=value)
+
+    arg_iterator = enumerate(args)
+    pending: Set[asyncio.Task[Completed[_ReturnType]]] = set()
+    # Done, but waiting on something earlier (only when `ordered`)
+    finished: Dict[int, Completed[_ReturnType]] = {}
+    next_index = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) + len(finished) < max_parallel:
+                try:
+                    index, arg_set = next(arg_iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(asyncio.create_task(_call(index, arg_set)))
+            if not pending:
+                return
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                completed = task.result()
+                if not ordered:
+                    yield completed
+                    continue
+                finished[completed.index] = completed
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+    finally:
+        # The caller stopped early (or something went wrong), so don't
+        # leave anything running behind its back
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from .async_tools import stream_in_parallel
+
+
+async def _sleep_then_return(sleep_s: float, value: int) -> int:
+    await asyncio.sleep(sleep_s)
+    return value
+
+
+async def test_stream_yields_in_completion_order() -> None:
+    args = [(0.03, 1), (0.01, 2), (0.02, 3)]
+
+    values = [c.get() async for c in stream_in_parallel(_sleep_then_return, args)]
+
+    assert values == [2, 3, 1]
+
+
+async def test_stream_yields_in_input_order() -> None:
+    args = [(0.03, 1), (0.01, 2), (0.02, 3)]
+
+    values = [
+        c.get()
+        async for c in stream_in_parallel(_sleep_then_return, args, ordered=True)
+    ]
+
+    assert values == [1, 2, 3]
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+async def test_stream_bounds_whats_in_flight(ordered: bool) -> None:
+    in_flight = 0
+    most_in_flight = 0
+
+    async def _track(value: int) -> int:
+        nonlocal in_flight, most_in_flight
+        in_flight += 1
+        most_in_flight = max(most_in_flight, in_flight)
+        await asyncio.sleep(0.01 * (value % 3))
+        in_flight -= 1
+        return value
+
+    values = [
+        c.get()
+        async for c in stream_in_parallel(
+            _track, ((i,) for i in range(20)), max_parallel=3, ordered=ordered
+        )
+    ]
+
+    assert sorted(values) == list(range(20))
+    assert most_in_flight == 3
+
+
+async def test_stream_returns_errors() -> None:
+    async def _fail_on_two(value: int) -> int:
+        if value == 2:
+            raise ValueError("two")
+        return value
+
+    completed = {
+        c.args: c async for c in stream_in_parallel(_fail_on_two, [(1,), (2,), (3,)])
+    }
+
+    assert completed[(1,)].get() == 1
+    assert isinstance(completed[(2,)].error, ValueError)
+    with pytest.raises(ValueError):
+        completed[(2,)].get()
+
+
+async def test_stream_times_out_slow_calls() -> None:
+    args = [(1, 1), (0, 2)]
+
+    completed = [
+        c async for c in stream_in_parallel(_sleep_then_return, args, timeout_s=0.01)
+    ]
+
+    assert [c.index for c in completed] == [1, 0]
+    assert isinstance(completed[1].error, asyncio.TimeoutError)
+
+
+async def test_stopping_early_cancels_the_rest() -> None:
+    started = 0
+
+    async def _slow(value: int) -> int:
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0 if value == 0 else 10)
+        return value
+
+    stream = stream_in_parallel(_slow, [(i,) for i in range(10)], max_parallel=3)
+    async for completed in stream:
+        assert completed.get() == 0
+        break
+    await stream.aclose()
+    await asyncio.sleep(0)
+
+    # Nothing else got started after the caller stopped
+    assert started == 3
+    assert all(t.done() for t in asyncio.all_tasks() if t is not asyncio.current_task())
@@ -0,0 +1,178 @@
+"""
+Recorded HTTP responses, and a local server that plays them back,
+so scrapers can run (and be benchmarked) without the network
+"""
+
+import asyncio
+import json
+import random
+from enum import Enum
+from pathlib import Path
+from typing import Dict, Iterator, NamedTuple, Optional
+
+from aiohttp import web
+
+from .config import CONFIG
+
+
+class HttpMode(Enum):
+    """
+    Where `web.get` gets responses from (see `CONFIG.http_mode`)
+    """
+
+    # The network
+    live = "live"
+    # The network, saving every response to the cassette as it goes
+    record = "record"
+    # The cassette, served by a local `ReplayServer`. Never the network.
+    replay = "replay"
+
+
+class Recording(NamedTuple):
+    # The normalized request, see `web_cache.normalize_request`
+    request: str
+    status: int
+    body: bytes
+
+
+class MissingRecordingError(Exception):
+    """
+    Replaying a request that was never recorded
+    """
+
+
+class Cassette:
+    """
+    Recorded responses, stored by the same key as the web cache.
+    Each is a `.body` file with the raw response,
+    and a `.json` file saying what it was a response to.
+    """
+
+    def __init__(self, root: Path):
+        self._root = root
+
+    @classmethod
+    def default(cls) -> "Cassette":
+        return cls(Path(CONFIG.cassette_dir))
+
+    def record(self, key: str, recording: Recording) -> None:
+        body_path = self._path(key, "body")
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        body_path.write_bytes(recording.body)
+        # Written last, since it's what says a recording is there
+        self._path(key, "json").write_text(
+            json.dumps(dict(request=recording.request, status=recording.status))
+        )
+
+    def play(self, key: str) -> Optional[Recording]:
+        try:
+            metadata = json.loads(self._path(key, "json").read_text())
+        except FileNotFoundError:
+            return None
+        return Recording(
+            metadata["request"],
+            metadata["status"],
+            self._path(key, "body").read_bytes(),
+        )
+
+    def keys(self) -> Iterator[str]:
+        for path in self._root.glob("*/*.json"):
+            yield path.stem
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key, "json").is_file()
+
+    def _path(self, key: str, extension: str) -> Path:
+        return self._root / key[:2] / f"{key}.{extension}"
+
+
+class ReplayServer:
+    """
+    Serves a cassette over HTTP on localhost, at `/<key>`.
+
+    Every response is delayed by about `latency_s` (+/- 50%), and
+    `error_rate` of them are a 503 instead, to look more like the real thing.
+    """
+
+    def __init__(self, cassette: Cassette, latency_s: float, error_rate: float):
+        self._cassette = cassette
+        self._latency_s = latency_s
+        self._error_rate = error_rate
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/{key}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port, *_ = self._runner.addresses[0]
+        self.base_url = f"http://{host}:{port}"
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if self._latency_s:
+            await asyncio.sleep(self._latency_s * (0.5 + random.random()))
+        if random.random() < self._error_rate:
+            return web.Response(status=503)
+        recording = await asyncio.to_thread(
+            self._cassette.play, request.match_info["key"]
+        )
+        if recording is None:
+            return web.Response(status=404, text="Not recorded")
+        return web.Response(status=recording.status, body=recording.body)
+
+
+class _ReplayServerManager:
+    """
+    Holds the replay server, started the first time it's needed
+    on each event loop (like the shared HTTP session)
+    """
+
+    def __init__(self) -> None:
+        self._starts: Dict[asyncio.AbstractEventLoop, asyncio.Task[ReplayServer]] = {}
+
+    async def get(self) -> ReplayServer:
+        loop = asyncio.get_running_loop()
+        if loop not in self._starts:
+            # Dropped, not closed: their loops are gone
+            self._starts.clear()
+            self._starts[loop] = asyncio.ensure_future(self._start())
+        # Everyone asking while it starts up waits for the same start
+        return await asyncio.shield(self._starts[loop])
+
+    async def _start(self) -> ReplayServer:
+        server = ReplayServer(
+            Cassette.default(), CONFIG.replay_latency_s, CONFIG.replay_error_rate
+        )
+        await server.start()
+        return server
+
+    async def close(self) -> None:
+        starts = list(self._starts.values())
+        self._starts.clear()
+        for start in starts:
+            await (await start).close()
+
+
+_REPLAY_SERVERS = _ReplayServerManager()
+
+
+async def replay_url(key: str) -> str:
+    """
+    Where the replay server serves the recording for `key`
+    """
+    if key not in Cassette.default():
+        raise MissingRecordingError(key)
+    server = await _REPLAY_SERVERS.get()
+    return f"{server.base_url}/{key}"
+
+
+async def close_replay_server() -> None:
+    await _REPLAY_SERVERS.close()
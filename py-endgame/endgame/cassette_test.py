@@ -0,0 +1,109 @@
+import time
+from pathlib import Path
+from typing import AsyncIterator
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from .cassette import (
+    Cassette,
+    MissingRecordingError,
+    Recording,
+    ReplayServer,
+)
+from .conftest import Serve
+from .web import get, throttle_stats
+from .web_cache import cache_key, normalize_request
+
+
+@pytest.fixture(autouse=True)
+def _dirs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ENDGAME_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("ENDGAME_CASSETTE_DIR", str(tmp_path / "cassette"))
+
+
+@pytest.fixture
+async def live_server(serve: Serve) -> TestServer:
+    async def handler(request: web.Request) -> web.Response:
+        if "missing" in request.query:
+            raise web.HTTPNotFound()
+        return web.Response(body=request.query["echo"].encode())
+
+    app = web.Application()
+    app.router.add_get("/echo", handler)
+    return await serve(app)
+
+
+async def test_record_then_replay(
+    live_server: TestServer, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    url = str(live_server.make_url("/echo"))
+    monkeypatch.setenv("ENDGAME_HTTP_MODE", "record")
+    await get(url, dict(echo="hello"))
+    with pytest.raises(aiohttp.ClientResponseError):
+        await get(url, dict(missing=1))
+    await live_server.close()
+    assert len(list(Cassette.default().keys())) == 2
+
+    monkeypatch.setenv("ENDGAME_HTTP_MODE", "replay")
+    # A fresh cache, so everything has to come from the cassette
+    monkeypatch.setenv("ENDGAME_CACHE_DIR", str(tmp_path / "other_cache"))
+
+    assert (await get(url, dict(echo="hello"))).data == b"hello"
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        await get(url, dict(missing=1))
+    assert error.value.status == 404
+    with pytest.raises(MissingRecordingError):
+        await get(url, dict(echo="never recorded"))
+
+
+async def test_replay_isnt_throttled(
+    serve: Serve, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # `serve` serves nothing here, but closes the replay server afterwards
+    url = "https://example.com/echo"
+    request = normalize_request(url, None)
+    Cassette.default().record(cache_key(url, None), Recording(request, 200, b"hi"))
+    monkeypatch.setenv("ENDGAME_HTTP_MODE", "replay")
+
+    assert (await get(url)).data == b"hi"
+    # Nothing's sent to example.com, so there's nothing to throttle for it
+    assert "example.com" not in {s.host for s in throttle_stats()}
+
+
+@pytest.fixture
+async def replay_session() -> AsyncIterator[aiohttp.ClientSession]:
+    async with aiohttp.ClientSession() as session:
+        yield session
+
+
+async def test_replay_server_injects_latency(
+    tmp_path: Path, replay_session: aiohttp.ClientSession
+) -> None:
+    cassette = Cassette(tmp_path)
+    cassette.record("abcdef", Recording("request", 200, b"content"))
+    server = ReplayServer(cassette, latency_s=0.1, error_rate=0)
+    await server.start()
+
+    start = time.monotonic()
+    async with replay_session.get(f"{server.base_url}/abcdef") as response:
+        assert await response.read() == b"content"
+
+    # At least half the latency, with the jitter
+    assert time.monotonic() - start >= 0.05
+    await server.close()
+
+
+async def test_replay_server_injects_errors(
+    tmp_path: Path, replay_session: aiohttp.ClientSession
+) -> None:
+    cassette = Cassette(tmp_path)
+    cassette.record("abcdef", Recording("request", 200, b"content"))
+    server = ReplayServer(cassette, latency_s=0, error_rate=1)
+    await server.start()
+
+    async with replay_session.get(f"{server.base_url}/abcdef") as response:
+        assert response.status == 503
+    await server.close()
@@ -1,7 +1,9 @@
-import asyncio
+from datetime import datetime, timezone
+from pathlib import Path
 
 from fire import Fire
 
+from .config import CONFIG
 from .ncaabb import (
     NcaabbGender,
     save_box_scores,
@@ -9,39 +11,95 @@ from .ncaabb import (
 from .ncaabb import (
     update as update_ncaabb,
 )
+from .ncaabb.ncaabb import count_planned_requests
 from .ncaafb import update as update_ncaafb
 from .nfl import save_coaches, save_spreads, update
+from .web import run
+from .web_cache import WebCache, migrate_legacy_cache
 
 
 class Main:
     def save_nfl_coaches(self):
-        asyncio.run(save_coaches())
+        run(save_coaches())
 
     def save_nfl_spreads(self):
-        asyncio.run(save_spreads())
+        run(save_spreads())
 
     def update(self, league: str):
         if league == "nfl":
-            asyncio.run(update())
+            run(update())
             return
         elif league == "ncaafb":
-            asyncio.run(update_ncaafb())
+            run(update_ncaafb())
             return
         elif league == "ncaawbb":
-            asyncio.run(update_ncaabb(NcaabbGender.womens))
+            run(update_ncaabb(NcaabbGender.womens))
             # A little inefficient, since this re-reads the games
             # Oh well, this is easy
-            # asyncio.run(save_possessions(NcaabbGender.womens))
-            asyncio.run(save_box_scores(NcaabbGender.womens))
+            # run(save_possessions(NcaabbGender.womens))
+            run(save_box_scores(NcaabbGender.womens))
             return
         elif league == "ncaambb":
-            asyncio.run(update_ncaabb(NcaabbGender.mens))
-            # asyncio.run(save_possessions(NcaabbGender.mens))
-            asyncio.run(save_box_scores(NcaabbGender.mens))
+            run(update_ncaabb(NcaabbGender.mens))
+            # run(save_possessions(NcaabbGender.mens))
+            run(save_box_scores(NcaabbGender.mens))
             return
         # TODO: bake this in w/ a type instead of string matching
         raise NotImplementedError(f"Update not implemented for {league}")
 
+    def plan_ncaabb_requests(self, gender: str):
+        """
+        Scoreboard requests each NCAABB season takes ("mens" or "womens"),
+        going by ESPN's calendar vs. asking about every day
+        """
+        counts = run(count_planned_requests(NcaabbGender(gender)))
+        print("season\tplanned\tnaive")
+        for year, (planned, naive) in sorted(counts.items()):
+            print(f"{year}\t{planned}\t{naive}")
+
+    def migrate_web_cache(self, dry_run: bool = True):
+        """
+        Move the old flat web cache into the sharded, compressed one.
+
+        Defaults to a dry run -- pass --dry_run=False to actually move things.
+        """
+        legacy_root = Path(CONFIG.cache_dir, "web")
+        result = run(migrate_legacy_cache(legacy_root, WebCache.default(), dry_run))
+        print(
+            f"{result.migrated} migrated, {result.already_there} already there, "
+            f"{len(result.unrecognized)} left in {legacy_root}"
+            f"{' (dry run)' if dry_run else ''}"
+        )
+
+    def web_cache_stats(self):
+        """
+        Summarize what's in the web cache
+        """
+        stats = WebCache.default().stats()
+        print(f"{stats.final_entries} cached ({stats.final_bytes / 1e6:.1f}MB)")
+        print(f"{stats.provisional_entries} fetched but not cached")
+        print(f"{stats.missing_entries} known to be missing or empty")
+        print(f"Fetched between {stats.oldest} and {stats.newest}")
+
+    def missing_web_pages(self):
+        """
+        List the requests the web cache knows not to bother fetching,
+        and when it'll try them again
+        """
+        for entry in WebCache.default().missing_entries():
+            expires_at = datetime.fromtimestamp(entry.expires_at, tz=timezone.utc)
+            print(f"{entry.reason}\t{expires_at:%Y-%m-%d}\t{entry.request}")
+
+    def evict_web_cache(self, before: str):
+        """
+        Drop everything in the web cache fetched before some ISO date/time
+        (UTC if there's no timezone)
+        """
+        fetched_before = datetime.fromisoformat(before)
+        if fetched_before.tzinfo is None:
+            fetched_before = fetched_before.replace(tzinfo=timezone.utc)
+        print(f"Evicted {WebCache.default().evict(fetched_before)} responses")
+
 
 def main():
     Fire(Main)
@@ -1,15 +1,17 @@
 import os
 from pathlib import Path
+from typing import Any, Callable
 
 
-def config_value(name: str, default: str):
+def config_value(name: str, default: str, parse: Callable[[str], Any] = str):
     """
     Get a config value.
-    Currently only supports string type values.
+    Values come from the environment as strings, so pass `parse`
+    (ex: `int`, `float`) for anything that isn't a string.
     """
 
     def get(_):
-        return os.getenv(name, default)
+        return parse(os.getenv(name, default))
 
     return property(fget=get)
 
@@ -18,6 +20,41 @@ class _Config:
     cache_dir = config_value(
         "ENDGAME_CACHE_DIR", str(Path.home() / ".endgame" / "cache")
     )
+    # The most requests per second to send to any one host
+    max_requests_per_s = config_value("ENDGAME_MAX_REQUESTS_PER_S", "20", float)
+    # The most requests in flight, and parsers running, across the process
+    max_concurrent_requests = config_value("ENDGAME_MAX_CONCURRENT_REQUESTS", "50", int)
+    max_concurrent_parses = config_value(
+        "ENDGAME_MAX_CONCURRENT_PARSES", str(os.cpu_count() or 4), int
+    )
+    # Days of NCAABB scoreboard asked for in one request (split up
+    # automatically when a window has more games than a response holds)
+    ncaabb_days_per_request = config_value("ENDGAME_NCAABB_DAYS_PER_REQUEST", "7", int)
+    # Worker processes to parse pages in, and how many parses to send one at
+    # a time. 0 parses in threads instead: some places processes can't be
+    # started (ex: AWS Lambda), threads are fine when mostly fetching, and
+    # the pool only pays off with cores to spare (see benchmarks/parse_pool.py).
+    parse_processes = config_value("ENDGAME_PARSE_PROCESSES", "0", int)
+    parse_chunk_size = config_value("ENDGAME_PARSE_CHUNK_SIZE", "4", int)
+    # How long the web cache remembers that a page 404'd, or that a parser
+    # found nothing in it, before asking for it again
+    not_found_ttl_days = config_value("ENDGAME_NOT_FOUND_TTL_DAYS", "30", float)
+    empty_page_ttl_days = config_value("ENDGAME_EMPTY_PAGE_TTL_DAYS", "365", float)
+    # How long to wait on a host before giving up on an attempt
+    connect_timeout_s = config_value("ENDGAME_CONNECT_TIMEOUT_S", "10", float)
+    read_timeout_s = config_value("ENDGAME_READ_TIMEOUT_S", "30", float)
+    # Retries allowed per run: this many, plus this fraction of requests
+    retry_budget_min_retries = config_value("ENDGAME_RETRY_BUDGET_MIN", "50", int)
+    retry_budget_ratio = config_value("ENDGAME_RETRY_BUDGET_RATIO", "0.2", float)
+    # "live", "record" or "replay" (see `cassette.HttpMode`)
+    http_mode = config_value("ENDGAME_HTTP_MODE", "live")
+    # Where "record" mode saves responses, and "replay" mode serves them from
+    cassette_dir = config_value(
+        "ENDGAME_CASSETTE_DIR", str(Path.home() / ".endgame" / "cassettes")
+    )
+    # How slow and flaky the replay server pretends to be
+    replay_latency_s = config_value("ENDGAME_REPLAY_LATENCY_S", "0", float)
+    replay_error_rate = config_value("ENDGAME_REPLAY_ERROR_RATE", "0", float)
 
 
 CONFIG = _Config()
@@ -0,0 +1,32 @@
+from typing import AsyncIterator, Awaitable, Callable, List
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from .cassette import close_replay_server
+from .web import close_session
+
+# Starts serving an app on a local port
+Serve = Callable[[web.Application], Awaitable[TestServer]]
+
+
+@pytest.fixture
+async def serve() -> AsyncIterator[Serve]:
+    """
+    Serve apps for the length of a test, then close them,
+    along with the sessions that talked to them
+    """
+    servers: List[TestServer] = []
+
+    async def _serve(app: web.Application) -> TestServer:
+        server = TestServer(app)
+        await server.start_server()
+        servers.append(server)
+        return server
+
+    yield _serve
+    for server in servers:
+        await server.close()
+    await close_session()
+    await close_replay_server()
@@ -1,6 +1,8 @@
 from datetime import datetime, timezone
 from typing import Tuple
 
+from dateutil import parser
+
 
 def get_end_year(season_end: Tuple[int, int]) -> int:
     """
@@ -14,3 +16,19 @@ def get_end_year(season_end: Tuple[int, int]) -> int:
     """
     now = datetime.now(timezone.utc)
     return now.year - 1 if (now.month, now.day) < season_end else now.year
+
+
+def parse_iso_datetime(text: str) -> datetime:
+    """
+    Parse a timestamp like ESPN's "2015-11-13T23:00Z".
+
+    `datetime.fromisoformat` is far faster than dateutil, but before
+    Python 3.11 it doesn't take a "Z", so swap that for the offset first.
+    Anything it still can't handle goes to dateutil.
+    """
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return parser.parse(text)
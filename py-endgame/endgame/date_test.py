@@ -0,0 +1,23 @@
+import pytest
+from dateutil import parser
+
+from .date import parse_iso_datetime
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "2015-11-13T23:00Z",
+        "2015-11-13T23:00:30Z",
+        "2015-11-13T23:00:30.250Z",
+        "2015-11-13T18:00-05:00",
+        "2015-11-13",
+        # Not ISO, so it takes the slow way
+        "Nov 13 2015 11:00PM",
+    ],
+)
+def test_parse_iso_datetime_matches_dateutil(text: str) -> None:
+    parsed = parse_iso_datetime(text)
+
+    assert parsed == parser.parse(text)
+    assert parsed.utcoffset() == parser.parse(text).utcoffset()
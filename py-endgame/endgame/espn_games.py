@@ -2,15 +2,18 @@
 Parsing games from the ESPN API
 """
 
-import json
 from csv import DictWriter
-from typing import Dict, List, NamedTuple, Optional
-
-from dateutil import parser
+from datetime import date, timedelta
+from logging import getLogger
+from typing import Any, Dict, List, NamedTuple, Optional, Set, TypedDict, Union
 
+from .date import parse_iso_datetime
+from .fast_json import Raw, Struct, decode
 from .types import Game, Season
 from .web import RequestParameters, get
 
+logger = getLogger(__name__)
+
 
 def save_seasons(seasons: List[Season], location: str):
     """
@@ -40,44 +43,177 @@ def _get_first_game(seasons: List[Season]) -> Game:
     raise ValueError("No games to save")
 
 
+class Odds(TypedDict):
+    competition_id: str
+    odds: dict
+
+
+class Scoreboard(NamedTuple):
+    """
+    Everything wanted from one scoreboard response,
+    so it's only fetched and parsed once
+    """
+
+    # Completed games
+    games: List[Game]
+    # Every event in the response, finished or not. If this reaches the
+    # request's `limit`, there may be more the response left out.
+    n_events: int
+    # For competitions that have any
+    odds: List[Odds]
+    # See `parse_calendar_days`
+    calendar_days: Optional[Set[date]]
+    # There are games, and they're all over, so this won't change
+    finished: bool
+
+
+class _Team(Struct):
+    displayName: str
+
+
+class _Competitor(Struct):
+    # Only what odds need is required. An event that isn't a game yet
+    # (ex: a matchup still to be decided) can still have odds.
+    team: Optional[_Team] = None
+    score: Optional[Union[str, int]] = None
+    homeAway: str = ""
+
+
+class _Competition(Struct):
+    id: str
+    competitors: List[_Competitor] = []
+    neutralSite: Optional[bool] = None
+    # Kept as plain JSON, since it's passed along as it is
+    odds: Any = None
+
+
+class _StatusType(Struct):
+    completed: bool
+
+
+class _Status(Struct):
+    type: _StatusType
+
+
+class _Event(Struct):
+    """
+    Just what a `Game` needs out of a scoreboard event
+    """
+
+    # Some events come back empty, so nothing's required
+    id: str = ""
+    date: str = ""
+    status: Optional[_Status] = None
+    competitions: List[_Competition] = []
+
+
+class _ScoreboardResponse(Struct):
+    # Decoded one at a time, so one odd event doesn't take the rest with it
+    events: List[Raw] = []
+    # Only looked at for the calendar, and small, so kept as plain JSON
+    leagues: List[Dict[str, Any]] = []
+
+
+async def get_scoreboard(url: str, parameters: RequestParameters) -> Scoreboard:
+    """
+    Get games, odds and the like for a set of parameters (probably a week
+    or something) from the ESPN API
+    """
+    content = await get(url, parameters)
+    scoreboard = parse_scoreboard(content.data)
+    if scoreboard.finished:
+        await content.save_if_necessary()
+    return scoreboard
+
+
+def parse_scoreboard(data: bytes) -> Scoreboard:
+    """
+    Parse a scoreboard response, decoding only the fields it needs
+    """
+    response = decode(data, _ScoreboardResponse)
+    games: List[Game] = []
+    odds: List[Odds] = []
+    for raw_event in response.events:
+        try:
+            event = decode(raw_event, _Event)
+        except ValueError as error:
+            logger.warning("Skipping a scoreboard event: %s", error)
+            continue
+        for competition in event.competitions[:1]:
+            if competition.odds:
+                odds.append(Odds(competition_id=competition.id, odds=competition.odds))
+        game = parse_game(event)
+        if game is not None:
+            games.append(game)
+    return Scoreboard(
+        games=[g for g in games if g.completed],
+        n_events=len(response.events),
+        odds=odds,
+        calendar_days=parse_calendar_days(dict(leagues=response.leagues)),
+        # Don't cache games if there are none here.
+        # I ran into an issue with this when getting a postseason week
+        # that would eventually have games, but the matchups weren't scheduled yet.
+        finished=bool(games) and all(g.completed for g in games),
+    )
+
+
 async def get_games(url: str, parameters: RequestParameters) -> List[Game]:
     """
     Get games for a set of parameters (probably a week or something)
     from the ESPN API
     """
-    content = await get(url, parameters)
-    tree = json.loads(content.data)
-
-    attempted_games: List[Optional[Game]] = [parse_game(e) for e in tree["events"]]
-    games = [g for g in attempted_games if g is not None]
+    return (await get_scoreboard(url, parameters)).games
 
-    # Don't cache games if there are none here.
-    # I ran into an issue with this when getting a postseason week
-    # that would eventually have games, but the matchups weren't scheduled yet.
-    if all(g.completed for g in games) and games:
-        await content.save_if_necessary()
 
-    return [g for g in games if g.completed]
+def parse_calendar_days(tree: Dict) -> Optional[Set[date]]:
+    """
+    The days a scoreboard response's calendar says have games,
+    or None if it doesn't have a calendar of days to go by
+    """
+    leagues = tree.get("leagues") or []
+    if len(leagues) != 1 or leagues[0].get("calendarType") != "day":
+        return None
+    league = leagues[0]
+    # An empty calendar is as likely to mean ESPN doesn't know as that
+    # there's nothing on, so don't take it as no games at all
+    calendar = league.get("calendar") or []
+    if not calendar or not all(isinstance(d, str) for d in calendar):
+        return None
+    # Days come as midnight Eastern in UTC, ex: "2015-11-13T08:00Z"
+    listed = {date.fromisoformat(d[:10]) for d in calendar}
+    if league.get("calendarIsWhitelist", True):
+        return listed
+    # Otherwise it lists the days *without* games in the calendar's span
+    if "calendarStartDate" not in league or "calendarEndDate" not in league:
+        return None
+    start = date.fromisoformat(league["calendarStartDate"][:10])
+    end = date.fromisoformat(league["calendarEndDate"][:10])
+    all_days = {start + timedelta(days=n) for n in range((end - start).days + 1)}
+    return all_days - listed
 
 
-def parse_game(event: Dict) -> Optional[Game]:
+def parse_game(event: _Event) -> Optional[Game]:
     """
-    Parse data for a game out of the ESPN JSON response
+    Parse data for a game out of an event in the ESPN JSON response
     """
-    if not event:
+    if event.status is None or not event.competitions:
         return None
     # I'm not sure what causes this, but some games are empty
     # Ex: Butler vs. Providence on
     # https://www.espn.com/mens-college-basketball/scoreboard/_/date/20140121/seasontype/2/group/50
     # The game happened, but there's no play-by-play?
     # We're not using it here, just seems sus
-    assert len(event["competitions"]) == 1
-    competition = event["competitions"][0]
-    competitiors = [_parse_competitor(c) for c in competition["competitors"]]
+    assert len(event.competitions) == 1
+    competition = event.competitions[0]
+    parsed = [_parse_competitor(c) for c in competition.competitors]
+    competitiors = [c for c in parsed if c is not None]
+    if competition.neutralSite is None or len(competitiors) != len(parsed):
+        # Not a game (yet), though it could still have odds
+        return None
     assert len(competitiors) == 2
-    completed = event["status"]["type"]["completed"]
+    completed = event.status.type.completed
 
-    neutral_site = competition["neutralSite"]
+    neutral_site = competition.neutralSite
     if neutral_site:
         # Doesn't matter
         home_index, away_index = 0, 1
@@ -99,8 +235,8 @@ def parse_game(event: Dict) -> Optional[Game]:
         away_score=competitiors[away_index].score,
         neutral_site=neutral_site,
         completed=completed,
-        date=parser.parse(event["date"]),
-        game_id=event["id"],
+        date=parse_iso_datetime(event.date),
+        game_id=event.id,
     )
 
 
@@ -110,9 +246,11 @@ class _Competitior(NamedTuple):
     is_home: bool
 
 
-def _parse_competitor(competitor: Dict) -> _Competitior:
+def _parse_competitor(competitor: _Competitor) -> Optional[_Competitior]:
+    if competitor.team is None or competitor.score is None:
+        return None
     return _Competitior(
-        name=competitor["team"]["displayName"],
-        score=int(competitor["score"]),
-        is_home=competitor["homeAway"] == "home",
+        name=competitor.team.displayName,
+        score=int(competitor.score),
+        is_home=competitor.homeAway == "home",
     )
@@ -0,0 +1,79 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from . import espn_games
+from .espn_games import get_scoreboard
+from .espn_odds import get_odds
+
+
+def _event(game_id: str, completed: bool, odds: list) -> dict:
+    competitors = [
+        dict(team=dict(displayName=name), score=score, homeAway=home_away)
+        for name, score, home_away in (("A", "70", "home"), ("B", "60", "away"))
+    ]
+    competition = dict(
+        id=f"c{game_id}", competitors=competitors, neutralSite=False, odds=odds
+    )
+    return dict(
+        id=game_id,
+        date="2015-11-13T23:00Z",
+        status=dict(type=dict(completed=completed)),
+        competitions=[competition],
+    )
+
+
+_TREE = dict(
+    events=[
+        _event("1", True, []),
+        _event("2", False, [dict(spread=-3.5)]),
+        {},
+    ],
+    leagues=[dict(calendarType="day", calendar=["2015-11-13T08:00Z"])],
+)
+
+
+def _patch_get():
+    content = MagicMock(data=json.dumps(_TREE).encode())
+    content.save_if_necessary = AsyncMock()
+    return patch.object(espn_games, "get", AsyncMock(return_value=content))
+
+
+async def test_scoreboard_has_games_and_odds_from_one_fetch() -> None:
+    with _patch_get() as mock_get:
+        scoreboard = await get_scoreboard("https://example.com", None)
+
+    mock_get.assert_awaited_once()
+    # Only finished games, but every event counts toward the limit
+    assert [g.game_id for g in scoreboard.games] == ["1"]
+    assert scoreboard.n_events == 3
+    assert scoreboard.odds == [dict(competition_id="c2", odds=[dict(spread=-3.5)])]
+    assert scoreboard.calendar_days is not None
+    # There's a game still going, so it's not cached yet
+    assert not scoreboard.finished
+    mock_get.return_value.save_if_necessary.assert_not_awaited()
+
+
+async def test_get_odds_comes_from_the_scoreboard() -> None:
+    with _patch_get():
+        odds = [o async for o in get_odds("https://example.com", None)]
+
+    assert [o["competition_id"] for o in odds] == ["c2"]
+
+
+async def test_an_event_that_is_not_a_game_still_has_odds() -> None:
+    not_a_game = _event("3", False, [dict(spread=1.5)])
+    competition = not_a_game["competitions"][0]
+    del competition["neutralSite"]
+    for competitor in competition["competitors"]:
+        del competitor["score"]
+    bad_type = _event("4", True, [dict(spread=2.5)])
+    bad_type["competitions"] = "nope"
+    tree = dict(_TREE, events=[*_TREE["events"], not_a_game, bad_type])
+    content = MagicMock(data=json.dumps(tree).encode())
+    content.save_if_necessary = AsyncMock()
+    with patch.object(espn_games, "get", AsyncMock(return_value=content)):
+        scoreboard = await get_scoreboard("https://example.com", None)
+
+    assert [g.game_id for g in scoreboard.games] == ["1"]
+    assert scoreboard.n_events == 5
+    assert [o["competition_id"] for o in scoreboard.odds] == ["c2", "c3"]
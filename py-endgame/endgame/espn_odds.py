@@ -1,23 +1,10 @@
-import json
-from typing import AsyncIterator, TypedDict
+from typing import AsyncIterator
 
-from .web import RequestParameters, get
-
-
-class Odds(TypedDict):
-    competition_id: str
-    odds: dict
+from .espn_games import Odds, get_scoreboard
+from .web import RequestParameters
 
 
 async def get_odds(url: str, parameters: RequestParameters) -> AsyncIterator[Odds]:
-    content = await get(url, parameters)
-    tree = json.loads(content.data)
-    events = tree["events"]
-    for event in events:
-        assert len(event["competitions"]) == 1
-        competition = event["competitions"][0]
-        odds = competition.get("odds")
-        if not odds:
-            continue
-        competition_id = competition["id"]
-        yield Odds(competition_id=competition_id, odds=odds)
+    scoreboard = await get_scoreboard(url, parameters)
+    for odds in scoreboard.odds:
+        yield odds
@@ -1,5 +1,7 @@
+from ..espn_odds import get_odds
 from .box_score import BoxScore, PlayerBoxScore, TeamBoxScore, save_box_scores
 from .gender import NcaabbGender
 from .matchup import get_possessions, save_possessions
-from .ncaabb import get_ncaabb_season, get_odds, update
+from .ncaabb import get_ncaabb_season, update
+from .pbp_table import EventTable, EventTableStore
 from .plays import get_plays_for_day
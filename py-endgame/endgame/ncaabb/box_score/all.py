@@ -1,15 +1,26 @@
 from dataclasses import dataclass
 from logging import getLogger
-from typing import AsyncIterator, Iterable, Iterator, List, Optional
+from typing import (
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from aiohttp import ClientResponseError
 from bs4 import BeautifulSoup, Tag
 from dataclasses_json import DataClassJsonMixin
 
-from ...async_tools import apply_in_parallel
+from ...async_tools import stream_in_parallel
 from ...cacheable import DiskCache
+from ...scheduler import get_scheduler
 from ...types import Season, iter_weeks
-from ...web import get
+from ...web import EmptyPage, KnownEmptyError, get
+from ..espnfitt import find_gamepackage
 from ..gender import NcaabbGender
 from ..ncaabb import get_seasons
 from .player import PlayerBoxScore, RawPlayer, parse_player
@@ -32,6 +43,9 @@ class TeamBoxScore(DataClassJsonMixin):
     players: List[PlayerBoxScore]
     is_home: bool
     team_id: str
+    # The team's totals row, when the page has one. It includes team
+    # rebounds and turnovers that no player gets credited with.
+    totals: Optional[PlayerBoxScore] = None
 
 
 @dataclass
@@ -97,34 +111,39 @@ async def save_box_scores(gender: NcaabbGender, location: Optional[str] = None):
 async def get_season_box_scores(
     season: Season, gender: NcaabbGender, skip_game_ids: set[str] | None = None
 ) -> AsyncIterator[BoxScore]:
-    game_id_filter = skip_game_ids or set()
-    # A week at a time, so the work is batched (and logged) in chunks
-    # rather than firing off a whole season's games at once.
+    args = _iter_game_args(season, gender, skip_game_ids or set())
+    async for completed in stream_in_parallel(get_box_score, args):
+        game = completed.get()
+        if game is not None:
+            yield game
+
+
+def _iter_game_args(
+    season: Season, gender: NcaabbGender, game_id_filter: set[str]
+) -> Iterator[Tuple[NcaabbGender, str]]:
+    # Logged a week at a time, as the stream gets to each week.
+    # The next week's games start as soon as there's room,
+    # rather than waiting on the slowest game of this one.
     for week in iter_weeks(season):
-        args = [
-            (gender, game.game_id)
-            for game in week.games
-            if game.game_id not in game_id_filter
-        ]
-        if args:
+        game_ids = [g.game_id for g in week.games if g.game_id not in game_id_filter]
+        if game_ids:
             logger.info("Getting box scores for %d %d", season.year, week.number)
-            games = apply_in_parallel(get_box_score, args)
-            async for game in games:
-                if game is not None:
-                    yield game
         else:
             logger.info(
                 "Skipping box scores for %d %d, already pulled",
                 season.year,
                 week.number,
             )
+        for game_id in game_ids:
+            yield gender, game_id
 
 
 async def get_box_score(gender: NcaabbGender, game_id: str) -> Optional[BoxScore]:
     """
     Get the box score for a game.
-    Returns None only (so far) when we run into a known format
-    that means, "this game doesn't have a box score"
+    Returns None when we run into a known format that means, "this game
+    doesn't have a box score" (which is remembered, so the page isn't
+    fetched again), or the page doesn't parse (which isn't).
     get failures will kill this.
     """
     url = _URL_FORMAT.format(gender=gender.name, game_id=game_id)
@@ -133,7 +152,96 @@ async def get_box_score(gender: NcaabbGender, game_id: str) -> Optional[BoxScore
     except ClientResponseError as error:
         logger.warning("Skipping %s because of error %s", url, str(error))
         return None
-    soup = BeautifulSoup(content.data, features="html.parser")
+    except KnownEmptyError:
+        return None
+    box_score = await get_scheduler().parse(
+        _parse_box_score, content.data, game_id, url
+    )
+    if isinstance(box_score, EmptyPage):
+        await content.mark_empty()
+        return None
+    if box_score is not None:
+        await content.save_if_necessary()
+    return box_score
+
+
+def _parse_box_score(
+    data: bytes, game_id: str, url: str
+) -> Union[BoxScore, EmptyPage, None]:
+    return _parse_box_score_json(data, game_id) or _parse_box_score_html(
+        data, game_id, url
+    )
+
+
+def _parse_box_score_json(data: bytes, game_id: str) -> Optional[BoxScore]:
+    """
+    Build the box score straight from the page's embedded JSON, which is
+    much cheaper than parsing the HTML. None if it isn't there, or isn't
+    shaped the way this expects, so the HTML gets a look instead.
+    """
+    package = find_gamepackage(data)
+    if package is None:
+        return None
+    teams = {}
+    try:
+        for team in package["bxscr"]:
+            team_id = str(team["tm"]["id"])
+            home_away = team["tm"]["hmAw"]
+            players = list(_read_json_players(team["stats"]))
+            if not players:
+                return None
+            teams[home_away] = _parse_team_box_score(
+                players, home_away == "home", team_id
+            )
+            teams[home_away].totals = _read_json_totals(team["stats"])
+    except (KeyError, TypeError, ValueError, _ParseError):
+        return None
+    if len(package["bxscr"]) != 2 or set(teams) != {"home", "away"}:
+        return None
+    return BoxScore(game_id=game_id, home=teams["home"], away=teams["away"])
+
+
+def _read_json_players(groups: List[dict]) -> Iterator[RawPlayer]:
+    # Starters, then the bench
+    for group in groups:
+        columns = group["lbls"]
+        for athlete in group.get("athlts") or []:
+            stat_values = athlete.get("stats")
+            if athlete.get("dnp") or not stat_values:
+                continue
+            if len(stat_values) != len(columns):
+                raise _ParseError
+            link = athlete["athlt"].get("lnk")
+            if not link:
+                # The HTML makes up an ID from what's in the name cell,
+                # so leave these to it
+                raise _ParseError
+            *_, player_id, short_name = link.split("/")
+            yield RawPlayer(player_id, short_name, dict(zip(columns, stat_values)))
+
+
+def _read_json_totals(groups: List[dict]) -> Optional[PlayerBoxScore]:
+    for group in groups:
+        totals = group.get("ttls")
+        if not totals or len(totals) != len(group["lbls"]):
+            continue
+        try:
+            return parse_player(
+                RawPlayer("TEAM", "TEAM", dict(zip(group["lbls"], totals)))
+            )
+        except (KeyError, ValueError):
+            return None
+    return None
+
+
+def _parse_box_score_html(
+    data: bytes, game_id: str, url: str
+) -> Union[BoxScore, EmptyPage, None]:
+    """
+    `EmptyPage` when a team's table is there, but has nobody in it
+    (ex: a forfeit, or "No Box Score Available")
+    """
+    soup = BeautifulSoup(data, features="html.parser")
 
     tables = soup.select("div.Boxscore.ResponsiveTable")
     if len(tables) != 2:
@@ -152,20 +260,18 @@ async def get_box_score(gender: NcaabbGender, game_id: str) -> Optional[BoxScore
     try:
         away_id = _get_team_id(away_header)
         home_id = _get_team_id(home_header)
-        if raw_away := list(_read_table(away_table, away_id)):
-            away_box_score = _parse_team_box_score(raw_away, False, away_id)
-        else:
-            return None
-        if raw_home := list(_read_table(home_table, home_id)):
-            home_box_score = _parse_team_box_score(raw_home, True, home_id)
-        else:
-            return None
+        away_rows = _read_table(away_table, away_id)
+        home_rows = _read_table(home_table, home_id)
+        if not away_rows.players or not home_rows.players:
+            return EmptyPage.EMPTY
+        away_box_score = _parse_team_box_score(away_rows.players, False, away_id)
+        away_box_score.totals = _find_totals(away_rows.team_rows, away_box_score)
+        home_box_score = _parse_team_box_score(home_rows.players, True, home_id)
+        home_box_score.totals = _find_totals(home_rows.team_rows, home_box_score)
     except Exception as err:
         logger.warning("Struggling with %s", url)
         raise err
 
-    await content.save_if_necessary()
-
     return BoxScore(game_id=game_id, home=home_box_score, away=away_box_score)
 
 
@@ -203,7 +309,15 @@ def _get_team_id(team_name_tag: Tag) -> str:
     return team_link.split("/")[-2]
 
 
-def _read_table(box_score_table: Tag, team_id: str) -> Iterator[RawPlayer]:
+class _TableRows(NamedTuple):
+    players: List[RawPlayer]
+    # The rows from the "TEAM" one down: its totals, any stats only the
+    # team gets credited with, percentages...
+    team_rows: List[RawPlayer]
+
+
+def _read_table(box_score_table: Tag, team_id: str) -> _TableRows:
+    rows = _TableRows([], [])
     names_table, stats_table = box_score_table.select("table")
     header = stats_table.select_one("tr:has(td.Table__customHeader)")
     if header is None:
@@ -213,18 +327,43 @@ def _read_table(box_score_table: Tag, team_id: str) -> Iterator[RawPlayer]:
     if not player_names:
         # Blank for a forfeit, like
         # https://www.espn.com/womens-college-basketball/boxscore/_/gameId/401498641
-        return
+        return rows
     if player_names[0].text.strip() == "No":
-        return
+        return rows
     player_stats = stats_table.select("tr:has(td:not(.Table__customHeader))")
     assert len(player_names) == len(player_stats)
     for player_name, player_stat in zip(player_names, player_stats):
         stat_values = [td.text for td in player_stat.find_all("td")]
+        is_team = player_name.text.strip().upper() == "TEAM" or (
+            stat_values[0] == "TEAM"
+        )
+        if rows.team_rows or is_team:
+            if len(stat_values) == len(columns):
+                stats = dict(zip(columns, stat_values))
+                rows.team_rows.append(RawPlayer("TEAM", "TEAM", stats))
+            continue
         if _is_did_not_play_row(stat_values):
             continue
-        if stat_values[0] == "TEAM":
+        rows.players.append(_parse_player(player_name, columns, stat_values, team_id))
+    return rows
+
+
+def _find_totals(
+    team_rows: List[RawPlayer], team: TeamBoxScore
+) -> Optional[PlayerBoxScore]:
+    """
+    The team's totals row: the one that adds up to its players' points.
+    A row of just the team's own stats (ex: team rebounds) won't.
+    """
+    points = sum(p.points or 0 for p in team.players)
+    for row in team_rows:
+        try:
+            totals = parse_player(row)
+        except (KeyError, ValueError):
             continue
-        yield _parse_player(player_name, columns, stat_values, team_id)
+        if totals.points == points:
+            return totals
+    return None
 
 
 def _parse_player(
@@ -0,0 +1,209 @@
+import json
+from pathlib import Path
+from typing import List, Optional
+
+from ...web import EmptyPage
+from .all import (
+    BoxScore,
+    _parse_box_score,
+    _parse_box_score_html,
+    _parse_box_score_json,
+)
+
+_COLUMNS = ["MIN", "FG", "3PT", "FT", "OREB", "DREB", "REB"]
+_COLUMNS += ["AST", "STL", "BLK", "TO", "PF", "PTS"]
+
+
+def _stats(seed: int) -> List[str]:
+    return [str(seed + 20), f"{seed}-{seed + 5}", "1-3", "2-2", "1", "3", "4"] + [
+        "2",
+        "1",
+        "0",
+        "2",
+        "3",
+        str(seed * 2 + 5),
+    ]
+
+
+def _player(player_id: str, name: str, stats: Optional[List[str]]) -> dict:
+    link = (
+        f"https://www.espn.com/mens-college-basketball/player/_/id/{player_id}/{name}"
+    )
+    return dict(athlt=dict(id=player_id, shrtNm=name, lnk=link), stats=stats or [])
+
+
+_TEAMS = [
+    # (team ID, home or away, players), away first like the page
+    ("12", "away", [_player("1", "a-one", _stats(3)), _player("2", "a-two", None)]),
+    ("2", "home", [_player("3", "h-one", _stats(4)), _player("4", "h-two", _stats(5))]),
+]
+
+
+def _name_cell(player: dict) -> str:
+    name = player["athlt"]["shrtNm"]
+    if "lnk" not in player["athlt"]:
+        return f"<td>{name}</td>"
+    return f'<td><a href="{player["athlt"]["lnk"]}">{name}</a></td>'
+
+
+def _totals(players: List[dict]) -> List[str]:
+    """
+    A team's totals, with 2 offensive rebounds and a turnover
+    that only the team gets credited with
+    """
+    lines = [p["stats"] for p in players if p["stats"]]
+    totals = []
+    for i, column in enumerate(_COLUMNS):
+        values = [line[i] for line in lines]
+        if "-" in values[0]:
+            made, attempted = zip(*(map(int, v.split("-")) for v in values))
+            totals.append(f"{sum(made)}-{sum(attempted)}")
+        else:
+            extra = dict(OREB=2, REB=2, TO=1).get(column, 0)
+            totals.append(str(sum(map(int, values)) + extra))
+    return totals
+
+
+def _stats_row(values: List[str]) -> str:
+    return "<tr>" + "".join(f"<td>{v}</td>" for v in values) + "</tr>"
+
+
+def _html_table(players: List[dict], with_totals: bool = False) -> str:
+    names = "".join(f"<tr>{_name_cell(p)}</tr>" for p in players)
+    stats = "".join(
+        _stats_row(p["stats"])
+        if p["stats"]
+        else "<tr><td></td><td>Did not play</td></tr>"
+        for p in players
+    )
+    if with_totals:
+        # What only the team gets credited with, then the totals and percentages
+        names += "<tr><td>TEAM</td></tr>" + "<tr><td></td></tr>" * 2
+        team_only = ["", "0-0", "0-0", "0-0", "2", "0", "2", "0", "0", "0", "1"]
+        stats += _stats_row(team_only + ["0", "0"])
+        stats += _stats_row(_totals(players))
+        stats += _stats_row([""] + ["40.0%"] * 3 + [""] * 9)
+    header = "".join(f'<td class="Table__customHeader">{c}</td>' for c in _COLUMNS)
+    return (
+        '<div class="Boxscore ResponsiveTable">'
+        '<table><tr><td class="Table__customHeader">starters</td></tr>'
+        f"{names}</table><table><tr>{header}</tr>{stats}</table></div>"
+    )
+
+
+def _page(with_json: bool = True, teams=_TEAMS, with_totals: bool = False) -> bytes:
+    strip = "".join(
+        f'<div class="Gamestrip__Team--{side}">'
+        f'<a href="/mens-college-basketball/team/_/id/{team_id}/name">Team</a></div>'
+        for team_id, side, _ in teams
+    )
+    tables = "".join(_html_table(players, with_totals) for _, _, players in teams)
+    state = dict(
+        page=dict(
+            content=dict(
+                gamepackage=dict(
+                    bxscr=[
+                        dict(
+                            tm=dict(id=team_id, hmAw=side),
+                            stats=[dict(type="starters", lbls=_COLUMNS, athlts=p)]
+                            + (
+                                [dict(lbls=_COLUMNS, ttls=_totals(p))]
+                                if with_totals
+                                else []
+                            ),
+                        )
+                        for team_id, side, p in teams
+                    ]
+                )
+            )
+        )
+    )
+    script = f"<script>window['__espnfitt__']={json.dumps(state)};</script>"
+    if not with_json:
+        script = ""
+    return f"<html><body>{strip}{tables}{script}</body></html>".encode()
+
+
+def test_json_and_html_agree() -> None:
+    page = _page()
+
+    from_json = _parse_box_score_json(page, "1")
+    from_html = _parse_box_score_html(page, "1", "url")
+
+    assert from_json is not None
+    assert from_json == from_html
+    # The player who didn't play is left out
+    assert [p.player_id for p in from_json.away.players] == ["1"]
+    assert from_json.home.team_id == "2"
+    assert from_json.home.players[1].points == 15
+
+
+def test_json_and_html_agree_on_a_full_page() -> None:
+    # Starters and bench, a DNP, and the team and totals rows
+    page = (Path(__file__).parent / "testdata" / "box_score.html").read_bytes()
+
+    from_json = _parse_box_score_json(page, "1")
+    from_html = _parse_box_score_html(page, "1", "url")
+
+    assert from_json is not None
+    assert from_json == from_html
+    assert (from_json.away.team_id, from_json.home.team_id) == ("12", "24")
+    for team in (from_json.away, from_json.home):
+        assert len(team.players) == 9
+        assert team.totals is not None
+        assert team.totals.points == sum(p.points or 0 for p in team.players)
+    assert from_json.home.totals is not None
+    # More than the players', with the team's own rebounds
+    assert from_json.home.totals.offensive_rebounds == 20
+    assert from_json.home.players[0].short_name == "spencer-jones"
+
+
+def test_falls_back_to_html_without_json() -> None:
+    page = _page(with_json=False)
+
+    assert _parse_box_score_json(page, "1") is None
+    assert _parse_box_score(page, "1", "url") == _parse_box_score_html(page, "1", "url")
+
+
+def test_falls_back_to_html_for_players_without_links() -> None:
+    no_link = dict(athlt=dict(id="9", shrtNm="Walk On"), stats=_stats(1))
+    teams = [_TEAMS[0], (*_TEAMS[1][:2], _TEAMS[1][2] + [no_link])]
+
+    page = _page(teams=teams)
+
+    assert _parse_box_score_json(page, "1") is None
+    box_score = _parse_box_score(page, "1", "url")
+    assert isinstance(box_score, BoxScore)
+    assert box_score.home.players[-1].player_id == "2-Walk On"
+
+
+def test_json_and_html_agree_on_team_totals() -> None:
+    page = _page(with_totals=True)
+
+    from_json = _parse_box_score_json(page, "1")
+    from_html = _parse_box_score_html(page, "1", "url")
+
+    assert from_json is not None
+    assert from_json == from_html
+    totals = from_json.home.totals
+    assert totals is not None
+    # The team's own offensive rebounds and turnover are in there
+    assert (totals.offensive_rebounds, totals.turnovers) == (4, 5)
+    assert totals.field_goal_attempts == 19
+    without_totals = _parse_box_score_html(_page(), "1", "url")
+    assert isinstance(without_totals, BoxScore)
+    assert without_totals.home.totals is None
+
+
+def test_no_players_isnt_a_box_score() -> None:
+    # Like a forfeit
+    teams = [(team_id, side, []) for team_id, side, _ in _TEAMS]
+
+    assert _parse_box_score_json(_page(teams=teams), "1") is None
+    # Empty for good, so it's fine to remember
+    assert _parse_box_score(_page(teams=teams), "1", "url") is EmptyPage.EMPTY
+
+
+def test_unrecognized_page_isnt_empty() -> None:
+    # Could be a layout change, so it's worth fetching again
+    assert _parse_box_score(b"<html>New layout</html>", "1", "url") is None
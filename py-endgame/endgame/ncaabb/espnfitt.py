@@ -0,0 +1,84 @@
+"""
+The JSON state ESPN's game pages embed as `window['__espnfitt__']`,
+found with a plain scan of the page rather than an HTML parser
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+from ..fast_json import Raw, Struct, decode, loads
+
+_PREFIX = b"window['__espnfitt__']="
+_SCRIPT_END = b"</script>"
+
+
+class _Content(Struct):
+    # Each part's left undecoded until it's asked for
+    gamepackage: Dict[str, Raw]
+
+
+class _Page(Struct):
+    content: _Content
+
+
+class _State(Struct):
+    page: _Page
+
+
+def find_espnfitt(page: bytes) -> Optional[Dict[str, Any]]:
+    """
+    The page's embedded state, or None if it doesn't have any (that decodes)
+    """
+    bounds = _find_script(page)
+    if bounds is None:
+        return None
+    start, end = bounds
+    try:
+        state = loads(page[start:end].rstrip().rstrip(b";"))
+    except ValueError:
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def _find_script(page: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Where the embedded state starts and ends in the page
+    """
+    start = page.find(_PREFIX)
+    if start == -1:
+        return None
+    start += len(_PREFIX)
+    # It's a script of its own, and "</script>" can't show up inside it
+    end = page.find(_SCRIPT_END, start)
+    if end == -1:
+        return None
+    return start, end
+
+
+def find_gamepackage(page: bytes) -> Optional[Dict[str, Any]]:
+    """
+    The part of the embedded state about the game itself
+    (box score, play by play, team stats...)
+    """
+    state = find_espnfitt(page)
+    if state is None:
+        return None
+    try:
+        return state["page"]["content"]["gamepackage"]
+    except (KeyError, TypeError):
+        return None
+
+
+def find_gamepackage_part(page: bytes, key: str) -> Optional[Any]:
+    """
+    `find_gamepackage(page)[key]`, without building the rest of the state
+    """
+    bounds = _find_script(page)
+    if bounds is None:
+        return None
+    start, end = bounds
+    try:
+        state = decode(page[start:end].rstrip().rstrip(b";"), _State)
+    except ValueError:
+        return None
+    part = state.page.content.gamepackage.get(key)
+    return None if part is None else loads(part)
@@ -0,0 +1,42 @@
+import json
+from typing import Any
+
+from .espnfitt import find_gamepackage, find_gamepackage_part
+
+_PLAYS = [dict(id="1", text='Jump ball "won"', period=dict(number=1))]
+
+
+def _page(state: Any) -> bytes:
+    return (
+        "<html><script>var x = 1;</script>"
+        f"<script>window['__espnfitt__']={json.dumps(state)};</script>"
+        "<div>After</div></html>"
+    ).encode()
+
+
+def _state(**gamepackage: Any) -> dict:
+    return dict(app=dict(x=1), page=dict(content=dict(gamepackage=gamepackage)))
+
+
+def test_finds_gamepackage() -> None:
+    page = _page(_state(pbp=dict(plays=_PLAYS)))
+
+    assert find_gamepackage(page) == dict(pbp=dict(plays=_PLAYS))
+    assert find_gamepackage(b"<html></html>") is None
+
+
+def test_finds_the_part() -> None:
+    page = _page(_state(pbp=dict(plays=_PLAYS, hasFullPbp=True), other=[1, 2]))
+
+    assert find_gamepackage_part(page, "pbp") == dict(plays=_PLAYS, hasFullPbp=True)
+    assert find_gamepackage_part(page, "missing") is None
+    assert find_gamepackage_part(_page(dict(page=[])), "pbp") is None
+    assert find_gamepackage_part(b"<html></html>", "pbp") is None
+
+
+def test_finds_the_part_when_the_key_is_ambiguous() -> None:
+    # "pbp" shows up somewhere else first, and only the state knows which is which
+    state = _state(pbp=dict(plays=_PLAYS))
+    state["app"]["pbp"] = "not this one"
+
+    assert find_gamepackage_part(_page(state), "pbp") == dict(plays=_PLAYS)
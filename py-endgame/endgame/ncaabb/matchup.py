@@ -1,13 +1,18 @@
 from csv import DictWriter
+from dataclasses import fields
 from logging import getLogger
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 import aiohttp
 from bs4 import BeautifulSoup, Tag
 
-from ..async_tools import apply_in_parallel
-from ..types import iter_weeks
-from ..web import get
+from ..async_tools import stream_in_parallel
+from ..retry import CircuitOpenError
+from ..scheduler import get_scheduler
+from ..types import Season, iter_weeks
+from ..web import EmptyPage, KnownEmptyError, get
+from .box_score.all import BoxScore, TeamBoxScore
+from .espnfitt import find_gamepackage
 from .gender import NcaabbGender
 from .ncaabb import get_seasons
 from .possession_side import PossessionSide
@@ -31,23 +36,28 @@ async def save_possessions(gender: NcaabbGender, location: Optional[str] = None)
 
     # TODO: read the .csv and skip all the game ids we already have values for?
 
-    rows = []
-    for season in seasons:
-        # A week at a time, so the work is batched (and logged) in chunks
-        # rather than firing off a whole season's games at once.
-        for week in iter_weeks(season):
-            logger.info("Getting matchups for %d %d", season.year, week.number)
-            args = [(gender, game.game_id) for game in week.games]
-            games = apply_in_parallel(get_possessions, args)
-            async for sides in games:
-                if sides is None:
-                    continue
-                for side in sides:
-                    rows.append(side.to_dict())
     with open(location, "w") as file:
-        writer = DictWriter(file, fieldnames=list(rows[0].keys()))
+        writer = DictWriter(file, fieldnames=[f.name for f in fields(PossessionSide)])
         writer.writeheader()
-        writer.writerows(rows)
+        for season in seasons:
+            args = _iter_game_args(season, gender)
+            async for completed in stream_in_parallel(get_possessions, args):
+                sides = completed.get()
+                if sides is None:
+                    continue
+                writer.writerows(side.to_dict() for side in sides)
+
+
+def _iter_game_args(
+    season: Season, gender: NcaabbGender
+) -> Iterator[Tuple[NcaabbGender, str]]:
+    # Logged a week at a time, as the stream gets to each week.
+    # The next week's games start as soon as there's room,
+    # rather than waiting on the slowest game of this one.
+    for week in iter_weeks(season):
+        logger.info("Getting matchups for %d %d", season.year, week.number)
+        for game in week.games:
+            yield gender, game.game_id
 
 
 # https://www.espn.com/mens-college-basketball/matchup?gameId=401263346
@@ -56,48 +66,111 @@ async def get_possessions(
 ) -> Optional[List[PossessionSide]]:
     """
     Get an estimate of the total number of possessions in a game
-    (combined between the two teams)
+    (combined between the two teams). None if there isn't one, or if
+    ESPN's been failing enough that it's being held off on, so a season
+    run skips the game (for the next run to pick up) rather than dying.
     """
     url = URL_FORMAT.format(gender=gender.name, game_id=game_id)
     try:
         content = await get(url)
+    except CircuitOpenError as error:
+        logger.warning("Skipping %s because of error %s", url, str(error))
+        return None
     except aiohttp.ClientResponseError as error:
         if error.code == 404:
             return None
         raise error
+    except KnownEmptyError:
+        return None
 
     try:
-        soup = BeautifulSoup(content.data, features="html.parser")
-        matchup_table = soup.select_one("div.PageLayout__Main table.Table")
-        if matchup_table is None:
-            # Seems like some old games don't have this
-            await content.save_if_necessary()
-            return None
-        stats = _read_stats_from_table(matchup_table)
-        if stats is None:
-            await content.save_if_necessary()
-            return None
-
-        n_possessions = _estimate_number_possessions(
-            field_goal_attempts=sum(map(_get_denominator, stats[_FIELD_GOALS])),
-            offensive_rebounds=sum(map(int, stats[_OFFENSIVE_REBOUNDS])),
-            turnovers=sum(map(int, stats[_TURNOVERS])),
-            free_throw_attempts=sum(map(_get_denominator, stats[_FREE_THROWS])),
+        possession_sides = await get_scheduler().parse(
+            _parse_possessions, content.data, game_id
         )
-
-        possession_sides = [
-            _build_possession_side(stats, n_possessions, i, game_id) for i in range(2)
-        ]
-
     except Exception as err:
         logger.warning("Struggling with %s", url)
         raise err
 
-    await content.save_if_necessary()
-
+    if isinstance(possession_sides, EmptyPage):
+        await content.mark_empty()
+        return None
+    if possession_sides is not None:
+        await content.save_if_necessary()
     return possession_sides
 
 
+def _parse_possessions(
+    data: bytes, game_id: str
+) -> Union[List[PossessionSide], EmptyPage, None]:
+    # The embedded JSON is far cheaper to read than the HTML, when it's there
+    stats = _read_stats_from_json(data) or _read_stats_from_html(data)
+    if stats is None:
+        # Seems like some old games don't have stats, but so would
+        # a page that changed, so it's not remembered as empty
+        return None
+    # There's games with '--' as the stat for all teams
+    # ex: https://www.espn.com/mens-college-basketball/matchup?gameId=283290036
+    if all(("--" in stat) for stat in stats.values()):
+        return EmptyPage.EMPTY
+    return _possession_sides(stats, game_id)
+
+
+def possessions_from_box_score(box_score: BoxScore) -> List[PossessionSide]:
+    """
+    The same estimate as `get_possessions`, from a box score's team stats
+    instead, so the matchup page doesn't need fetching.
+
+    Goes by each team's totals row if the box score has it. Otherwise the
+    players get added up, which misses any turnovers and offensive rebounds
+    only credited to the team, so the estimate can come out a little low.
+    """
+    # Away then home, like the matchup table's columns
+    totals = [_team_totals(t) for t in (box_score.away, box_score.home)]
+    stats: StatsTable = {
+        _FIELD_GOALS: _column(totals, "field_goal_makes", "field_goal_attempts"),
+        _THREES: _column(totals, "three_point_makes", "three_point_attempts"),
+        _FREE_THROWS: _column(totals, "free_throw_makes", "free_throw_attempts"),
+        _OFFENSIVE_REBOUNDS: _column(totals, "offensive_rebounds"),
+        _TURNOVERS: _column(totals, "turnovers"),
+    }
+    return _possession_sides(stats, box_score.game_id)
+
+
+def _team_totals(team: TeamBoxScore) -> Dict[str, int]:
+    rows = [team.totals] if team.totals is not None else team.players
+    return {
+        name: sum(getattr(row, name) or 0 for row in rows) for name in _BOX_SCORE_FIELDS
+    }
+
+
+def _column(totals: List[Dict[str, int]], *names: str) -> Tuple[str, str]:
+    away, home = ("-".join(str(side[n]) for n in names) for side in totals)
+    return away, home
+
+
+_BOX_SCORE_FIELDS = (
+    "field_goal_makes",
+    "field_goal_attempts",
+    "three_point_makes",
+    "three_point_attempts",
+    "free_throw_makes",
+    "free_throw_attempts",
+    "offensive_rebounds",
+    "turnovers",
+)
+
+
+def _possession_sides(stats: StatsTable, game_id: str) -> List[PossessionSide]:
+    n_possessions = _estimate_number_possessions(
+        field_goal_attempts=sum(map(_get_denominator, stats[_FIELD_GOALS])),
+        offensive_rebounds=sum(map(int, stats[_OFFENSIVE_REBOUNDS])),
+        turnovers=sum(map(int, stats[_TURNOVERS])),
+        free_throw_attempts=sum(map(_get_denominator, stats[_FREE_THROWS])),
+    )
+
+    return [_build_possession_side(stats, n_possessions, i, game_id) for i in range(2)]
+
+
 def _build_possession_side(
     stats: StatsTable,
     n_possessions: float,
@@ -141,7 +214,46 @@ _FREE_THROWS = "FT"
 _THREES = "3PT"
 
 
-def _read_stats_from_table(table: Tag) -> Optional[StatsTable]:
+_NEEDED_STATS = (_FIELD_GOALS, _OFFENSIVE_REBOUNDS, _TURNOVERS, _FREE_THROWS, _THREES)
+
+
+def _read_stats_from_json(data: bytes) -> Optional[StatsTable]:
+    """
+    The team stats the matchup table is drawn from, out of the page's
+    embedded JSON: each team's stats, by the label the table shows.
+    None if they aren't there, or are missing something we need,
+    so the HTML gets a look instead.
+    """
+    package = find_gamepackage(data)
+    if package is None:
+        return None
+    try:
+        # Away then home, like the table's columns
+        sides = [_read_json_team_stats(package["tmStats"][s]) for s in ("away", "home")]
+    except (KeyError, TypeError, AttributeError):
+        return None
+    if not all(all(name in side for name in _NEEDED_STATS) for side in sides):
+        return None
+    away, home = sides
+    return {name: (away[name], home[name]) for name in away if name in home}
+
+
+def _read_json_team_stats(team: dict) -> Dict[str, str]:
+    stats = team["s"]
+    entries = stats.values() if isinstance(stats, dict) else stats
+    return {entry["l"]: str(entry["d"]).strip() for entry in entries}
+
+
+def _read_stats_from_html(data: bytes) -> Optional[StatsTable]:
+    soup = BeautifulSoup(data, features="html.parser")
+    matchup_table = soup.select_one("div.PageLayout__Main table.Table")
+    if matchup_table is None:
+        # Seems like some old games don't have this
+        return None
+    return _read_stats_from_table(matchup_table)
+
+
+def _read_stats_from_table(table: Tag) -> StatsTable:
     """
     There's a table on the "matchup" page for NCAABB
     Each row has the label, and then two columns
@@ -154,12 +266,6 @@ def _read_stats_from_table(table: Tag) -> Optional[StatsTable]:
             continue
         stat_name, t1_stat, t2_stat = [td.text.strip() for td in tds]
         stats[stat_name] = (t1_stat, t2_stat)
-
-    # There's games with '--' as the stat for all teams
-    # ex: https://www.espn.com/mens-college-basketball/matchup?gameId=283290036
-    if all(("--" in stat) for stat in stats.values()):
-        return None
-
     return stats
 
 
@@ -0,0 +1,142 @@
+import json
+from typing import Dict, Optional, Tuple
+from unittest.mock import AsyncMock, patch
+
+from ..retry import CircuitOpenError
+from ..web import EmptyPage
+from . import matchup
+from .box_score.all import BoxScore, TeamBoxScore
+from .box_score.player import PlayerBoxScore
+from .gender import NcaabbGender
+from .matchup import (
+    _parse_possessions,
+    _read_stats_from_html,
+    _read_stats_from_json,
+    get_possessions,
+    possessions_from_box_score,
+)
+
+_STATS = {
+    "FG": ("25-60", "28-55"),
+    "3PT": ("7-20", "5-15"),
+    "FT": ("10-14", "12-20"),
+    "Offensive Rebounds": ("11", "8"),
+    "Total Turnovers": ("12", "14"),
+    "Fouls": ("18", "15"),
+}
+
+
+def _page(
+    html_stats: Optional[Dict[str, Tuple[str, str]]] = _STATS,
+    json_stats: Optional[Dict[str, Tuple[str, str]]] = _STATS,
+) -> bytes:
+    table = ""
+    if html_stats is not None:
+        rows = "".join(
+            f"<tr><td>{name}</td><td>{away}</td><td>{home}</td></tr>"
+            for name, (away, home) in html_stats.items()
+        )
+        table = (
+            '<div class="PageLayout__Main"><table class="Table">'
+            f"<thead><tr><th>Team</th></tr></thead>{rows}</table></div>"
+        )
+    script = ""
+    if json_stats is not None:
+        team_stats = {
+            side: dict(
+                s={
+                    f"stat{i}": dict(l=name, d=values[column])
+                    for i, (name, values) in enumerate(json_stats.items())
+                }
+            )
+            for column, side in enumerate(("away", "home"))
+        }
+        state = dict(page=dict(content=dict(gamepackage=dict(tmStats=team_stats))))
+        script = f"<script>window['__espnfitt__']={json.dumps(state)};</script>"
+    return f"<html><body>{table}{script}</body></html>".encode()
+
+
+def test_json_and_html_agree() -> None:
+    page = _page()
+
+    assert _read_stats_from_json(page) == _read_stats_from_html(page) == _STATS
+    sides = _parse_possessions(page, "1")
+    assert isinstance(sides, list)
+    assert [s.home_team for s in sides] == [False, True]
+    assert sides[0].three_points == 7
+
+
+def test_falls_back_to_html() -> None:
+    # Missing something possessions need
+    partial = {k: v for k, v in _STATS.items() if k != "Total Turnovers"}
+    for page in (_page(json_stats=None), _page(json_stats=partial)):
+        assert _read_stats_from_json(page) is None
+        assert _parse_possessions(page, "1") == _parse_possessions(_page(), "1")
+
+
+def test_old_games_without_a_matchup_table() -> None:
+    assert _parse_possessions(_page(html_stats=None, json_stats=None), "1") is None
+
+
+def test_games_without_stats() -> None:
+    blank = {name: ("--", "--") for name in _STATS}
+
+    assert _parse_possessions(_page(blank, blank), "1") is EmptyPage.EMPTY
+    assert _parse_possessions(_page(blank, None), "1") is EmptyPage.EMPTY
+
+
+async def test_skips_games_while_the_circuit_is_open() -> None:
+    get = AsyncMock(side_effect=CircuitOpenError("www.espn.com"))
+    with patch.object(matchup, "get", get):
+        assert await get_possessions(NcaabbGender.mens, "1") is None
+
+
+def _box_score_row(player_id: str, column: int) -> PlayerBoxScore:
+    def _fraction(name: str) -> tuple:
+        return tuple(map(int, _STATS[name][column].split("-")))
+
+    fgm, fga = _fraction("FG")
+    tpm, tpa = _fraction("3PT")
+    ftm, fta = _fraction("FT")
+    return PlayerBoxScore(
+        player_id,
+        player_id,
+        None,
+        fgm,
+        fga,
+        tpm,
+        tpa,
+        ftm,
+        fta,
+        int(_STATS["Offensive Rebounds"][column]),
+        None,
+        None,
+        None,
+        None,
+        None,
+        int(_STATS["Total Turnovers"][column]),
+        None,
+        None,
+    )
+
+
+def test_possessions_from_box_score_totals_match_the_matchup_page() -> None:
+    away, home = (
+        TeamBoxScore([], side == 1, str(side), totals=_box_score_row("TEAM", side))
+        for side in range(2)
+    )
+
+    derived = possessions_from_box_score(BoxScore("1", home=home, away=away))
+
+    assert derived == _parse_possessions(_page(), "1")
+
+
+def test_possessions_from_box_score_adds_up_players() -> None:
+    away, home = (
+        TeamBoxScore([_box_score_row(str(side), side)], side == 1, str(side))
+        for side in range(2)
+    )
+
+    derived = possessions_from_box_score(BoxScore("1", home=home, away=away))
+
+    assert derived == _parse_possessions(_page(), "1")
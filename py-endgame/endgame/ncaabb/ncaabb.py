@@ -1,18 +1,32 @@
+import asyncio
+from dataclasses import dataclass
 from datetime import date, datetime, timedelta, timezone
 from enum import Enum
 from logging import getLogger
-from typing import AsyncIterator, Iterable, List, NamedTuple
+from typing import (
+    AbstractSet,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 
 import aiohttp
+from dataclasses_json import DataClassJsonMixin
 
-from ..async_tools import apply_in_parallel
+from ..async_tools import apply_in_parallel, stream_in_parallel
+from ..cacheable import DiskCache
+from ..config import CONFIG
 from ..constants import ESPN_SPORTS_API_BASE
 from ..date import get_end_year
-from ..espn_games import get_games, save_seasons
-from ..espn_odds import Odds, get_odds
+from ..espn_games import Odds, get_scoreboard, save_seasons
 from ..season_cache import SeasonCache
 from ..types import Game, Season, Week
-from ..web import RequestParameters
+from ..web import RequestParameters, is_cached
 from .gender import NcaabbGender
 
 logger = getLogger(__name__)
@@ -25,6 +39,11 @@ REGULAR_SEASON_START = (11, 1)
 REGULAR_SEASON_END = (4, 1)
 POST_SEASON_START = (3, 1)
 SEASON_END = (4, 30)
+# Stretches of days of a season fetched at once. The scheduler caps requests
+# across everything, so this mostly bounds how many results wait to be handled.
+_MAX_PARALLEL_RANGES = 20
+# The most events the scoreboard is asked for in one response
+_SCOREBOARD_LIMIT = 300
 
 
 class NcaabbGroup(Enum):
@@ -61,6 +80,64 @@ class DayParams(NamedTuple):
     group: NcaabbGroup
 
 
+class DayRange(NamedTuple):
+    """
+    Query parameters for grabbing NCAABB games from the ESPN API
+    for every day from `start` through `end`
+    """
+
+    start: date
+    end: date
+    gender: NcaabbGender
+    group: NcaabbGroup
+
+    @property
+    def days(self) -> List[DayParams]:
+        return [
+            DayParams(day, self.gender, self.group)
+            for day in _date_range(self.start, self.end + timedelta(days=1))
+        ]
+
+    def halves(self) -> Tuple["DayRange", "DayRange"]:
+        middle = self.start + (self.end - self.start) // 2
+        return (
+            self._replace(end=middle),
+            self._replace(start=middle + timedelta(days=1)),
+        )
+
+
+@dataclass
+class SeasonPlan(DataClassJsonMixin):
+    """
+    The days in a season each group can have games on,
+    going by ESPN's calendar
+    """
+
+    gender: str
+    season: int
+    # ISO dates, by group name. A group that's missing had no calendar
+    # to go by, so any day might have games.
+    game_days: Dict[str, List[str]]
+
+    def game_days_for(self, group: "NcaabbGroup") -> Optional[Set[date]]:
+        days = self.game_days.get(group.name)
+        if days is None:
+            return None
+        return {date.fromisoformat(d) for d in days}
+
+
+PLAN_CACHE = DiskCache(SeasonPlan, ["season", "gender"])
+
+
+class PlannedRequests(NamedTuple):
+    """
+    Scoreboard requests for a season, with and without a `SeasonPlan`
+    """
+
+    planned: int
+    naive: int
+
+
 async def update(gender: NcaabbGender, location=None):
     """
     Update a NCAABB .csv
@@ -84,7 +161,13 @@ async def get_seasons(gender: NcaabbGender) -> List[Season]:
     # just the year rather than padding every tuple out with `None`s.
     args = [(y,) for y in range(2001, end_year + 1)]
     return [
-        s async for s in apply_in_parallel(lambda y: get_ncaabb_season(y, gender), args)
+        s
+        async for s in apply_in_parallel(
+            lambda y: get_ncaabb_season(y, gender),
+            args,
+            # So one big season can't crowd out the others' requests
+            group_by=lambda args: f"{gender.name} {args[0]}",
+        )
     ]
 
 
@@ -114,43 +197,148 @@ async def get_ncaabb_season(
     if season:
         return season.with_season_start(REGULAR_SEASON_START)
 
-    day_params: List[DayParams] = []
+    plan = await get_season_plan(year, gender)
+    day_ranges = _season_day_ranges(year, gender, season_so_far, plan)
+    logger.info(
+        "%d scoreboard requests planned for NCAABB %s season %d (%d without a plan)",
+        len(day_ranges),
+        gender.name,
+        year,
+        len(_season_day_ranges(year, gender, season_so_far, None)),
+    )
+    # TODO: consider having season_so_far.trouble_params re-checked
+    games: List[Game] = []
+    trouble_days: List[DayParams] = []
+    # Fetched concurrently, but handled in order,
+    # so the trouble days come out the same every time
+    fetches = stream_in_parallel(
+        _get_day_range, day_ranges, max_parallel=_MAX_PARALLEL_RANGES, ordered=True
+    )
+    async for fetch in fetches:
+        range_games, range_trouble_days = fetch.get()
+        games += range_games
+        trouble_days += range_trouble_days
+
+    season = _build_season(games, year, trouble_days)
+    if season_so_far:
+        season = merge_seasons([season_so_far, season])
+
+    if _is_finished(year):
+        cache.save_to_cache(season)
+
+    return season
+
+
+def _is_finished(year: int) -> bool:
+    return datetime.now(timezone.utc) > datetime(
+        year + 1, *SEASON_END, tzinfo=timezone.utc
+    )
+
+
+def _season_day_ranges(
+    year: int,
+    gender: NcaabbGender,
+    season_so_far: Season | None,
+    plan: SeasonPlan | None,
+) -> List[DayRange]:
+    """
+    What to ask the scoreboard for, to fill in a season. Only days
+    the plan (if there is one) says can have games get asked for.
+    """
+
+    def _game_days(group: NcaabbGroup) -> Optional[Set[date]]:
+        return None if plan is None else plan.game_days_for(group)
+
+    day_ranges: List[DayRange] = []
     start = _last_day_so_far(season_so_far) or date(year, *REGULAR_SEASON_START)
     end = date(year + 1, *REGULAR_SEASON_END)
     # Don't try to get dates in the future
     end = min(end, date.today())
-    for day in _date_range(start, end):
-        day_params.append(DayParams(day, gender, NcaabbGroup.d1))
+    day_ranges += _day_ranges(
+        start, end, gender, NcaabbGroup.d1, _game_days(NcaabbGroup.d1)
+    )
     start = _last_day_so_far(season_so_far) or date(year + 1, *POST_SEASON_START)
     end = date(year + 1, *SEASON_END)
     # Don't try to get dates in the future
     end = min(end, date.today())
-    for group in POSTSEASON_GROUPS:
-        for day in _date_range(start, end):
-            day_params.append(DayParams(day, gender, group))
-    # TODO: consider having season_so_far.trouble_params re-checked
-    games: List[Game] = []
-    trouble_days = []
-    for day_param in day_params:
-        try:
-            games += await get_ncaabb_games(*day_param)
-        except aiohttp.ClientResponseError:
-            day, gender, group = day_param
-            logger.warning(
-                "Marking %s for %s %s as trouble", day, gender.name, group.name
-            )
-            trouble_days.append(day_param)
+    for group in _sorted_postseason_groups():
+        day_ranges += _day_ranges(start, end, gender, group, _game_days(group))
+    return day_ranges
 
-    season = _build_season(games, year, trouble_days)
-    if season_so_far:
-        season = merge_seasons([season_so_far, season])
 
-    if datetime.now(timezone.utc) > datetime(
-        year + 1, *SEASON_END, tzinfo=timezone.utc
-    ):
-        cache.save_to_cache(season)
+def _sorted_postseason_groups() -> List[NcaabbGroup]:
+    # Sorted, since a frozenset's order can change from run to run
+    return sorted(POSTSEASON_GROUPS, key=lambda g: g.value)
 
-    return season
+
+async def get_season_plan(year: int, gender: NcaabbGender) -> SeasonPlan:
+    """
+    Which days each group can have games on in a season. Costs a request
+    per group the first time, and is kept once the season's over.
+    """
+    plan = await PLAN_CACHE.check_cache(season=year, gender=gender.name)
+    if plan is not None:
+        return plan
+
+    starts = {NcaabbGroup.d1: date(year, *REGULAR_SEASON_START)}
+    for group in _sorted_postseason_groups():
+        starts[group] = date(year + 1, *POST_SEASON_START)
+    # Nothing's been scheduled for a group that hasn't started yet
+    starts = {g: d for g, d in starts.items() if d <= date.today()}
+    calendars = await asyncio.gather(
+        *(_get_calendar_days(day, gender, group) for group, day in starts.items())
+    )
+    plan = SeasonPlan(
+        gender.name,
+        year,
+        {
+            group.name: sorted(d.isoformat() for d in days)
+            for group, days in zip(starts, calendars)
+            if days is not None
+        },
+    )
+    # The calendar can still change while the season's on
+    if _is_finished(year):
+        await PLAN_CACHE.save_to_cache(plan)
+    return plan
+
+
+async def _get_calendar_days(
+    day: date, gender: NcaabbGender, group: NcaabbGroup
+) -> Optional[Set[date]]:
+    try:
+        scoreboard = await get_scoreboard(
+            NCAABB_SCOREBOARD.format(gender.name),
+            _scoreboard_parameters(day, day, group),
+        )
+    except aiohttp.ClientResponseError:
+        logger.warning(
+            "No calendar for NCAABB %s %s %s, so planning every day",
+            gender.name,
+            day,
+            group.name,
+        )
+        return None
+    return scoreboard.calendar_days
+
+
+async def count_planned_requests(
+    gender: NcaabbGender,
+) -> Dict[int, PlannedRequests]:
+    """
+    How many scoreboard requests fetching each whole season takes,
+    with and without its `SeasonPlan`
+    """
+
+    async def _count(year: int) -> Tuple[int, PlannedRequests]:
+        plan = await get_season_plan(year, gender)
+        return year, PlannedRequests(
+            planned=len(_season_day_ranges(year, gender, None, plan)),
+            naive=len(_season_day_ranges(year, gender, None, None)),
+        )
+
+    years = [(y,) for y in range(2001, get_end_year(SEASON_END) + 1)]
+    return dict([counts async for counts in apply_in_parallel(_count, years)])
 
 
 def _build_season(games: Iterable[Game], year: int, trouble_params: List) -> Season:
@@ -190,38 +378,143 @@ def _date_range(start: date, end: date) -> List[date]:
     return [start + timedelta(days=offset) for offset in range(days)]
 
 
-async def get_ncaabb_games(
-    game_date: date, gender: NcaabbGender, group: NcaabbGroup
-) -> List[Game]:
-    logger.info("Getting NCAABB %s %s %s", gender.value, game_date, group.name)
-    parameters: RequestParameters = dict(
+def _day_ranges(
+    start: date,
+    end: date,
+    gender: NcaabbGender,
+    group: NcaabbGroup,
+    game_days: Optional[AbstractSet[date]] = None,
+) -> List[DayRange]:
+    """
+    Cover `start` up to (not including) `end`, `CONFIG.ncaabb_days_per_request`
+    days at a time. Given `game_days`, only those days get covered.
+    """
+    days = [d for d in _date_range(start, end) if game_days is None or d in game_days]
+    step = timedelta(days=CONFIG.ncaabb_days_per_request)
+    ranges = []
+    first = 0
+    while first < len(days):
+        last = first
+        while last + 1 < len(days) and days[last + 1] < days[first] + step:
+            last += 1
+        ranges.append(DayRange(days[first], days[last], gender, group))
+        first = last + 1
+    return ranges
+
+
+async def _get_day_range(
+    start: date, end: date, gender: NcaabbGender, group: NcaabbGroup
+) -> Tuple[List[Game], List[DayParams]]:
+    """
+    The games in a range of days, and the days that couldn't be fetched.
+    A range that fails gets split up and tried again,
+    so one bad day doesn't take the rest of its range with it.
+    """
+    day_range = DayRange(start, end, gender, group)
+    try:
+        return await get_ncaabb_games_between(*day_range), []
+    except aiohttp.ClientResponseError:
+        if start == end:
+            logger.warning(
+                "Marking %s for %s %s as trouble", start, gender.name, group.name
+            )
+            return [], day_range.days
+    first, second = await asyncio.gather(
+        *(_get_day_range(*half) for half in day_range.halves())
+    )
+    return first[0] + second[0], first[1] + second[1]
+
+
+def _scoreboard_parameters(
+    start: date, end: date, group: NcaabbGroup
+) -> RequestParameters:
+    # A single day is asked for the way it always was, so it's still cached
+    dates = f"{start:%Y%m%d}" if start == end else f"{start:%Y%m%d}-{end:%Y%m%d}"
+    return dict(
         lang="en",
         region="us",
         calendartype="blacklist",
-        limit=300,
-        dates=game_date.strftime("%Y%m%d"),
+        limit=_SCOREBOARD_LIMIT,
+        dates=dates,
         groups=group.value,
     )
-    games = await get_games(NCAABB_SCOREBOARD.format(gender.name), parameters)
+
+
+async def get_ncaabb_games(
+    game_date: date, gender: NcaabbGender, group: NcaabbGroup
+) -> List[Game]:
+    return await get_ncaabb_games_between(game_date, game_date, gender, group)
+
+
+async def get_ncaabb_games_between(
+    start: date, end: date, gender: NcaabbGender, group: NcaabbGroup
+) -> List[Game]:
+    """
+    Games from `start` through `end`, asked for in one request,
+    unless there are too many to fit in a response, or some aren't final.
+    A response is only cached once all its games are final, so a range
+    with a game still to go is asked for in halves, and the halves that
+    are final get cached. Later runs ask for those same halves again.
+    """
+    day_range = DayRange(start, end, gender, group)
+    if start < end and await _has_cached_pieces(day_range):
+        return await _get_halves(day_range)
+    logger.info("Getting NCAABB %s %s to %s %s", gender.value, start, end, group.name)
+    scoreboard = await get_scoreboard(
+        NCAABB_SCOREBOARD.format(gender.name),
+        _scoreboard_parameters(start, end, group),
+    )
+    if start < end and scoreboard.n_events >= _SCOREBOARD_LIMIT:
+        # The response may have been cut off, so ask for each half instead
+        return await _get_halves(day_range)
+    if start < end and scoreboard.games and not scoreboard.finished:
+        # Final games alongside ones still to go, so this won't be cached,
+        # but some piece of it could be
+        return await _get_halves(day_range)
+    if scoreboard.n_events >= _SCOREBOARD_LIMIT:
+        logger.warning(
+            "%s %s %s has %d+ events, so some may be missing",
+            gender.name,
+            start,
+            group.name,
+            _SCOREBOARD_LIMIT,
+        )
     # Filtering thanks to Montana State Bobcats at Northern Arizona
     # Lumberjacks on 2003-02-28 and a bunch of NCAAWBB games
-    return [g for g in games if g.home_score > 0 or g.away_score > 0]
+    return [g for g in scoreboard.games if g.home_score > 0 or g.away_score > 0]
+
+
+async def _get_halves(day_range: DayRange) -> List[Game]:
+    first, second = await asyncio.gather(
+        *(get_ncaabb_games_between(*half) for half in day_range.halves())
+    )
+    return first + second
+
+
+async def _has_cached_pieces(day_range: DayRange) -> bool:
+    """
+    Whether a range was asked for in halves before, and some piece of it
+    was cached then (see `get_ncaabb_games_between`)
+    """
+    if day_range.start == day_range.end:
+        return False
+    for half in day_range.halves():
+        url = NCAABB_SCOREBOARD.format(half.gender.name)
+        parameters = _scoreboard_parameters(half.start, half.end, half.group)
+        if await is_cached(url, parameters) or await _has_cached_pieces(half):
+            return True
+    return False
 
 
 async def _get_ncaabb_odds(
     game_date: date, gender: NcaabbGender, group: NcaabbGroup
 ) -> AsyncIterator[Odds]:
     logger.info("Getting NCAABB %s %s %s", gender.value, game_date, group.name)
-    parameters: RequestParameters = dict(
-        lang="en",
-        region="us",
-        calendartype="blacklist",
-        limit=300,
-        dates=game_date.strftime("%Y%m%d"),
-        groups=group.value,
+    scoreboard = await get_scoreboard(
+        NCAABB_SCOREBOARD.format(gender.name),
+        _scoreboard_parameters(game_date, game_date, group),
     )
-    odds = get_odds(NCAABB_SCOREBOARD.format(gender.name), parameters)
-    async for odd in odds:
+    for odd in scoreboard.odds:
         yield odd
 
 
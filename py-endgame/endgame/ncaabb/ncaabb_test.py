@@ -1,5 +1,7 @@
+import asyncio
 from datetime import date, datetime
-from typing import List, Optional
+from pathlib import Path
+from typing import List, Optional, Set
 from unittest.mock import AsyncMock, patch
 
 import aiohttp
@@ -7,6 +9,7 @@ import pytest
 from multidict import CIMultiDict, CIMultiDictProxy
 from yarl import URL
 
+from ..espn_games import Scoreboard, parse_calendar_days
 from ..season_cache import SeasonCache
 from ..types import group_games_into_weeks
 from . import ncaabb as ncaabb_module
@@ -17,13 +20,17 @@ from .ncaabb import (
     REGULAR_SEASON_START,
     SEASON_END,
     DayParams,
+    DayRange,
     Game,
     NcaabbGender,
     NcaabbGroup,
     Season,
+    SeasonPlan,
     Week,
     _date_range,
+    get_ncaabb_games_between,
     get_ncaabb_season,
+    get_season_plan,
     is_between_dates,
     merge_seasons,
 )
@@ -173,6 +180,24 @@ class _FakeSeasonCache(SeasonCache):
 _FINISHED_YEAR = 1989
 
 
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ENDGAME_CACHE_DIR", str(tmp_path))
+
+
+@pytest.fixture(autouse=True)
+def _no_calendar():
+    """
+    Plan every day by default, without asking ESPN for a calendar
+    """
+    with patch.object(
+        ncaabb_module,
+        "get_season_plan",
+        AsyncMock(side_effect=lambda year, gender: SeasonPlan(gender.name, year, {})),
+    ) as mock_get_plan:
+        yield mock_get_plan
+
+
 def _expected_day_params(
     gender: NcaabbGender,
     year: int,
@@ -195,10 +220,14 @@ def _expected_day_params(
 
 
 def _called_day_params(mock_get_games: AsyncMock) -> List[DayParams]:
-    # get_ncaabb_games is called as get_ncaabb_games(*day_param), so
+    # get_ncaabb_games_between is called with a DayRange's fields, so
     # rebuilding from .args also checks nothing was passed by keyword.
     assert all(not call.kwargs for call in mock_get_games.await_args_list)
-    return [DayParams(*call.args) for call in mock_get_games.await_args_list]
+    return [
+        day
+        for call in mock_get_games.await_args_list
+        for day in DayRange(*call.args).days
+    ]
 
 
 async def _no_games(
@@ -208,8 +237,22 @@ async def _no_games(
 
 
 def _patch_get_games(side_effect=_no_games):
+    """
+    Patch the range fetch with one that asks `side_effect` about each day
+    """
+
+    async def get_games_between(
+        start: date, end: date, gender: NcaabbGender, group: NcaabbGroup
+    ) -> List[Game]:
+        games = []
+        for day in DayRange(start, end, gender, group).days:
+            games += await side_effect(*day)
+        return games
+
     return patch.object(
-        ncaabb_module, "get_ncaabb_games", AsyncMock(side_effect=side_effect)
+        ncaabb_module,
+        "get_ncaabb_games_between",
+        AsyncMock(side_effect=get_games_between),
     )
 
 
@@ -258,6 +301,8 @@ async def test_get_ncaabb_season__fetches_whole_season_when_cache_is_empty() ->
     # Nothing asked for twice, and exactly the days we expect
     assert len(called) == len(expected)
     assert set(called) == expected
+    # A week at a time, not a day
+    assert len(mock_get_games.await_args_list) < len(expected) / 5
 
     assert season.year == _FINISHED_YEAR
     assert {g.game_id for w in season.weeks for g in w.games} == {
@@ -386,6 +431,28 @@ async def test_get_ncaabb_season__marks_failed_days_as_trouble() -> None:
     assert {g.game_id for w in season.weeks for g in w.games} == {"good"}
 
 
+async def test_get_ncaabb_season__trouble_days_stay_in_order() -> None:
+    bad_days = [date(_FINISHED_YEAR, 11, d) for d in (3, 4, 5)]
+
+    async def fake_get_games(
+        game_date: date, gender: NcaabbGender, group: NcaabbGroup
+    ) -> List[Game]:
+        if game_date in bad_days and group == NcaabbGroup.d1:
+            # Earlier days fail last
+            await asyncio.sleep(0.01 * (10 - game_date.day))
+            raise _response_error(500)
+        return []
+
+    with _patch_get_games(fake_get_games):
+        season = await get_ncaabb_season(
+            _FINISHED_YEAR, NcaabbGender.mens, season_cache=_FakeSeasonCache()
+        )
+
+    assert season.trouble_params == [
+        DayParams(day, NcaabbGender.mens, NcaabbGroup.d1) for day in bad_days
+    ]
+
+
 async def test_get_ncaabb_season__caches_a_finished_season() -> None:
     cache = _FakeSeasonCache()
 
@@ -408,3 +475,217 @@ async def test_get_ncaabb_season__doesnt_cache_an_unfinished_season() -> None:
     assert cache.saved == []
     # Days in the future never get requested
     assert _called_day_params(mock_get_games) == []
+
+
+async def test_get_ncaabb_games_between__splits_ranges_that_hit_the_limit() -> None:
+    asked_for = []
+
+    async def fake_get_scoreboard(url: str, parameters: dict) -> Scoreboard:
+        asked_for.append(parameters["dates"])
+        # Anything over two days has too many games to fit
+        full = "-" in parameters["dates"] and parameters["dates"] not in {
+            "19891101-19891102",
+            "19891103-19891104",
+            "19891105-19891106",
+        }
+        return Scoreboard(
+            [], ncaabb_module._SCOREBOARD_LIMIT if full else 0, [], None, False
+        )
+
+    with patch.object(ncaabb_module, "get_scoreboard", fake_get_scoreboard):
+        await get_ncaabb_games_between(
+            date(1989, 11, 1), date(1989, 11, 7), NcaabbGender.mens, NcaabbGroup.d1
+        )
+
+    assert sorted(asked_for) == [
+        "19891101-19891102",
+        "19891101-19891104",
+        "19891101-19891107",
+        "19891103-19891104",
+        "19891105-19891106",
+        "19891105-19891107",
+        "19891107",
+    ]
+
+
+async def test_get_ncaabb_games_between__caches_around_an_unfinished_day() -> None:
+    unfinished_day = "19891105"
+    cached: Set[str] = set()
+    fetched: List[str] = []
+
+    async def fake_is_cached(url: str, parameters: dict) -> bool:
+        return parameters["dates"] in cached
+
+    async def fake_get_scoreboard(url: str, parameters: dict) -> Scoreboard:
+        dates = parameters["dates"]
+        if dates not in cached:
+            fetched.append(dates)
+        first, _, last = dates.partition("-")
+        days = range(int(first), int(last or first) + 1)
+        # A final game a day, and one still to go on the unfinished day
+        games = [_dated_game(datetime.strptime(str(d), "%Y%m%d"), str(d)) for d in days]
+        finished = not first <= unfinished_day <= (last or first)
+        if finished:
+            cached.add(dates)
+        return Scoreboard(games, len(games) + (not finished), [], None, finished)
+
+    async def get_week() -> List[Game]:
+        return await get_ncaabb_games_between(
+            date(1989, 11, 1), date(1989, 11, 7), NcaabbGender.mens, NcaabbGroup.d1
+        )
+
+    with (
+        patch.object(ncaabb_module, "get_scoreboard", fake_get_scoreboard),
+        patch.object(ncaabb_module, "is_cached", fake_is_cached),
+    ):
+        first_run = await get_week()
+        first_fetched, fetched = fetched, []
+        second_run = await get_week()
+
+    assert [g.game_id for g in first_run] == [f"1989110{d}" for d in range(1, 8)]
+    assert second_run == first_run
+    # Split until the unfinished day was on its own
+    assert sorted(first_fetched) == [
+        "19891101-19891104",
+        "19891101-19891107",
+        "19891105",
+        "19891105-19891106",
+        "19891105-19891107",
+        "19891106",
+        "19891107",
+    ]
+    # Everything else came from the cache
+    assert fetched == [unfinished_day]
+
+
+async def test_get_ncaabb_season__a_failed_range_only_loses_the_bad_day() -> None:
+    fine = _dated_game(datetime(_FINISHED_YEAR, 11, 2, 19), "fine")
+    bad_day = date(_FINISHED_YEAR, 11, 3)
+
+    async def fake_get_games(
+        game_date: date, gender: NcaabbGender, group: NcaabbGroup
+    ) -> List[Game]:
+        if game_date == bad_day and group == NcaabbGroup.d1:
+            raise _response_error(500)
+        if (game_date, group) == (fine.date.date(), NcaabbGroup.d1):
+            return [fine]
+        return []
+
+    with _patch_get_games(fake_get_games):
+        season = await get_ncaabb_season(
+            _FINISHED_YEAR, NcaabbGender.mens, season_cache=_FakeSeasonCache()
+        )
+
+    # The bad day's range got split until the bad day was on its own
+    assert season.trouble_params == [
+        DayParams(bad_day, NcaabbGender.mens, NcaabbGroup.d1)
+    ]
+    assert {g.game_id for w in season.weeks for g in w.games} == {"fine"}
+
+
+def test_parse_calendar_days__whitelist() -> None:
+    tree = dict(
+        leagues=[
+            dict(
+                calendarType="day",
+                calendarIsWhitelist=True,
+                calendar=["2015-11-13T08:00Z", "2015-11-14T08:00Z"],
+            )
+        ]
+    )
+
+    assert parse_calendar_days(tree) == {date(2015, 11, 13), date(2015, 11, 14)}
+
+
+def test_parse_calendar_days__blacklist() -> None:
+    tree = dict(
+        leagues=[
+            dict(
+                calendarType="day",
+                calendarIsWhitelist=False,
+                calendarStartDate="2015-11-13T08:00Z",
+                calendarEndDate="2015-11-16T07:59Z",
+                calendar=["2015-11-14T08:00Z"],
+            )
+        ]
+    )
+
+    assert parse_calendar_days(tree) == {
+        date(2015, 11, 13),
+        date(2015, 11, 15),
+        date(2015, 11, 16),
+    }
+
+
+@pytest.mark.parametrize(
+    "tree",
+    [
+        pytest.param(dict(events=[]), id="no-leagues"),
+        pytest.param(dict(leagues=[dict(calendarType="day")]), id="no-calendar"),
+        pytest.param(
+            dict(leagues=[dict(calendarType="list", calendar=[dict(label="Week 1")])]),
+            id="not-days",
+        ),
+    ],
+)
+def test_parse_calendar_days__nothing_to_go_by(tree: dict) -> None:
+    assert parse_calendar_days(tree) is None
+
+
+async def test_get_ncaabb_season__only_asks_for_planned_days(_no_calendar) -> None:
+    planned = {
+        NcaabbGroup.d1: [date(_FINISHED_YEAR, 11, 3), date(_FINISHED_YEAR, 11, 20)],
+        NcaabbGroup.ncaa: [date(_FINISHED_YEAR + 1, 3, 20)],
+        # Didn't happen that year
+        NcaabbGroup.cbi: [],
+    }
+    _no_calendar.side_effect = lambda year, gender: SeasonPlan(
+        gender.name,
+        year,
+        {g.name: [d.isoformat() for d in days] for g, days in planned.items()},
+    )
+
+    with _patch_get_games() as mock_get_games:
+        await get_ncaabb_season(
+            _FINISHED_YEAR, NcaabbGender.mens, season_cache=_FakeSeasonCache()
+        )
+
+    called = _called_day_params(mock_get_games)
+    expected = {
+        DayParams(day, NcaabbGender.mens, group)
+        for group, days in planned.items()
+        for day in days
+    }
+    # Groups without a calendar still get every day
+    for group in (NcaabbGroup.nit, NcaabbGroup.cit):
+        expected |= {
+            DayParams(day, NcaabbGender.mens, group)
+            for day in _date_range(
+                date(_FINISHED_YEAR + 1, *POST_SEASON_START),
+                date(_FINISHED_YEAR + 1, *SEASON_END),
+            )
+        }
+    assert set(called) == expected
+
+
+async def test_get_season_plan__kept_for_reruns(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("ENDGAME_CACHE_DIR", str(tmp_path))
+    november = {date(_FINISHED_YEAR, 11, 3)}
+
+    async def fake_calendar(
+        day: date, gender: NcaabbGender, group: NcaabbGroup
+    ) -> Optional[set]:
+        return november if group == NcaabbGroup.d1 else None
+
+    mock_calendar = AsyncMock(side_effect=fake_calendar)
+    with patch.object(ncaabb_module, "_get_calendar_days", mock_calendar):
+        plan = await get_season_plan(_FINISHED_YEAR, NcaabbGender.mens)
+        rerun = await get_season_plan(_FINISHED_YEAR, NcaabbGender.mens)
+
+    assert plan.game_days_for(NcaabbGroup.d1) == november
+    assert plan.game_days_for(NcaabbGroup.ncaa) is None
+    assert rerun == plan
+    # Once per group, the first time only
+    assert mock_calendar.await_count == 1 + len(POSTSEASON_GROUPS)
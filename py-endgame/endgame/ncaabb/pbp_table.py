@@ -0,0 +1,285 @@
+"""
+Play by play as a columnar table of events, a directory per season,
+so a season-long analysis loads a few typed arrays instead of
+replaying every game's JSON.
+
+Team, player and game IDs are dictionary encoded (each column holds
+an index into the season's list of them), and clocks are integers.
+Days get appended as they arrive, each as a new part of the season.
+"""
+
+import json
+import math
+import sys
+from array import array
+from dataclasses import dataclass, field, fields
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set
+
+from dataclasses_json import DataClassJsonMixin
+
+from ..config import CONFIG
+from .gender import NcaabbGender
+
+# For codes and numbers a play doesn't have
+MISSING = -1
+# ESPN puts far-off numbers in for coordinates it doesn't have
+_MAX_COORDINATE = 1000
+_FORMAT_VERSION = 1
+
+
+@dataclass
+class EventTable:
+    """
+    One row per play, in the order they happened within each game.
+    Index `teams`, `players` and `game_ids` with the code columns.
+    """
+
+    game_ids: List[str]
+    teams: List[str]
+    players: List[str]
+    game: array = field(default_factory=lambda: array("i"))
+    period: array = field(default_factory=lambda: array("b"))
+    # Tenths of a second left in the period
+    clock_tenths: array = field(default_factory=lambda: array("i"))
+    team: array = field(default_factory=lambda: array("i"))
+    # The first player involved (ex: the shooter)
+    player: array = field(default_factory=lambda: array("i"))
+    # ESPN's ID for the kind of play (ex: jump shot, turnover)
+    play_type: array = field(default_factory=lambda: array("i"))
+    home_score: array = field(default_factory=lambda: array("h"))
+    away_score: array = field(default_factory=lambda: array("h"))
+    score_value: array = field(default_factory=lambda: array("b"))
+    scoring: array = field(default_factory=lambda: array("b"))
+    shooting: array = field(default_factory=lambda: array("b"))
+    # Shot location, NaN for plays without one
+    x: array = field(default_factory=lambda: array("f"))
+    y: array = field(default_factory=lambda: array("f"))
+
+    def __len__(self) -> int:
+        return len(self.game)
+
+    def columns(self) -> Dict[str, array]:
+        return {f.name: getattr(self, f.name) for f in _COLUMN_FIELDS}
+
+
+_COLUMN_FIELDS = [f for f in fields(EventTable) if f.type is array]
+
+
+@dataclass
+class _SeasonIndex(DataClassJsonMixin):
+    """
+    What's in a season's directory. Codes only ever get added, so
+    every part's codes mean the same thing. Parts not listed here
+    (ex: an append that didn't finish) are ignored.
+    """
+
+    game_ids: List[str] = field(default_factory=list)
+    teams: List[str] = field(default_factory=list)
+    players: List[str] = field(default_factory=list)
+    days: List[str] = field(default_factory=list)
+    parts: List[str] = field(default_factory=list)
+
+
+class _Encoder:
+    """
+    Hands out codes for a season's IDs, new ones going on the end
+    """
+
+    def __init__(self, values: List[str]):
+        self.values = values
+        self._codes = {value: code for code, value in enumerate(values)}
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return MISSING
+        if value not in self._codes:
+            self._codes[value] = len(self.values)
+            self.values.append(value)
+        return self._codes[value]
+
+    def __contains__(self, value: str) -> bool:
+        return value in self._codes
+
+
+def season_for_day(day: date) -> int:
+    """
+    The season a day's games are in. Seasons are named
+    for the year they start in, and none runs through summer.
+    """
+    return day.year if day.month >= 7 else day.year - 1
+
+
+def parse_clock_tenths(display: Optional[str]) -> int:
+    """
+    "12:34" or, late in a period, "45.6", in tenths of a second
+    """
+    if not display:
+        return MISSING
+    try:
+        minutes, _, seconds = display.rpartition(":")
+        return round((int(minutes or 0) * 60 + float(seconds)) * 10)
+    except ValueError:
+        return MISSING
+
+
+def _dig(play: Mapping[str, Any], *path: Any) -> Any:
+    value: Any = play
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return value
+
+
+def _int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def _coordinate(value: Any) -> float:
+    if not isinstance(value, (int, float)) or abs(value) > _MAX_COORDINATE:
+        return math.nan
+    return float(value)
+
+
+def _id(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _append_play(
+    table: EventTable,
+    game: int,
+    play: Mapping[str, Any],
+    teams: _Encoder,
+    players: _Encoder,
+) -> None:
+    table.game.append(game)
+    table.period.append(_int(_dig(play, "period", "number")))
+    table.clock_tenths.append(parse_clock_tenths(_dig(play, "clock", "displayValue")))
+    table.team.append(teams.code(_id(_dig(play, "team", "id"))))
+    player = _dig(play, "participants", 0, "athlete", "id")
+    table.player.append(players.code(_id(player)))
+    table.play_type.append(_int(_dig(play, "type", "id")))
+    table.home_score.append(_int(play.get("homeScore")))
+    table.away_score.append(_int(play.get("awayScore")))
+    table.score_value.append(_int(play.get("scoreValue", 0)))
+    table.scoring.append(bool(play.get("scoringPlay")))
+    table.shooting.append(bool(play.get("shootingPlay")))
+    table.x.append(_coordinate(_dig(play, "coordinate", "x")))
+    table.y.append(_coordinate(_dig(play, "coordinate", "y")))
+
+
+def _encode_part(table: EventTable) -> bytes:
+    columns = table.columns()
+    header = dict(
+        version=_FORMAT_VERSION,
+        byteorder=sys.byteorder,
+        rows=len(table),
+        columns=[[name, column.typecode] for name, column in columns.items()],
+    )
+    body = b"".join(column.tobytes() for column in columns.values())
+    return json.dumps(header).encode() + b"\n" + body
+
+
+def _decode_part(data: bytes, into: EventTable) -> None:
+    header_end = data.index(b"\n")
+    header = json.loads(data[:header_end])
+    if header["version"] != _FORMAT_VERSION:
+        raise ValueError(f"Can't read version {header['version']} event tables")
+    swap = header["byteorder"] != sys.byteorder
+    at = header_end + 1
+    for name, typecode in header["columns"]:
+        column = array(typecode)
+        size = column.itemsize * header["rows"]
+        column.frombytes(data[at : at + size])
+        if swap:
+            column.byteswap()
+        getattr(into, name).extend(column)
+        at += size
+
+
+class EventTableStore:
+    """
+    Season event tables under a directory, one directory per season:
+    an index (`index.json`) and the parts it lists
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        self._root = root or Path(CONFIG.cache_dir, "pbp_table")
+
+    def season_dir(self, gender: NcaabbGender, season: int) -> Path:
+        return self._root / gender.name / str(season)
+
+    def days(self, gender: NcaabbGender, season: int) -> Set[date]:
+        """
+        The days already in the season's table
+        """
+        index = self._read_index(gender, season)
+        return {date.fromisoformat(d) for d in index.days}
+
+    def append(
+        self, gender: NcaabbGender, day: date, pbps: Iterable[Mapping[str, Any]]
+    ) -> Optional[Path]:
+        """
+        Add a day's games (with "game_id" and "plays", like
+        `get_plays_for_day` gives) to its season's table, as a new part.
+        Games already in the table are skipped. Only the index is read,
+        so the season's other parts don't have to be here. Returns the
+        new part, if there was anything to add.
+        """
+        season = season_for_day(day)
+        index = self._read_index(gender, season)
+        games = _Encoder(index.game_ids)
+        teams = _Encoder(index.teams)
+        players = _Encoder(index.players)
+        part = EventTable(games.values, teams.values, players.values)
+        for pbp in pbps:
+            if pbp["game_id"] in games:
+                continue
+            game = games.code(pbp["game_id"])
+            for play in pbp["plays"]:
+                _append_play(part, game, play, teams, players)
+        if day.isoformat() not in index.days:
+            index.days = sorted([*index.days, day.isoformat()])
+
+        path = None
+        if len(part):
+            directory = self.season_dir(gender, season)
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"part-{len(index.parts):05d}.bin"
+            path.write_bytes(_encode_part(part))
+            index.parts.append(path.name)
+        # Written last, so a part only counts once it's all there
+        self._write_index(gender, season, index)
+        return path
+
+    def load(self, gender: NcaabbGender, season: int) -> EventTable:
+        """
+        Everything in a season's table
+        """
+        index = self._read_index(gender, season)
+        table = EventTable(index.game_ids, index.teams, index.players)
+        directory = self.season_dir(gender, season)
+        for part in index.parts:
+            _decode_part((directory / part).read_bytes(), table)
+        return table
+
+    def _read_index(self, gender: NcaabbGender, season: int) -> _SeasonIndex:
+        path = self.season_dir(gender, season) / "index.json"
+        if not path.is_file():
+            return _SeasonIndex()
+        return _SeasonIndex.from_json(path.read_text())
+
+    def _write_index(
+        self, gender: NcaabbGender, season: int, index: _SeasonIndex
+    ) -> None:
+        directory = self.season_dir(gender, season)
+        directory.mkdir(parents=True, exist_ok=True)
+        temporary = directory / "index.json.tmp"
+        temporary.write_text(index.to_json())
+        temporary.replace(directory / "index.json")
@@ -0,0 +1,116 @@
+import math
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from .gender import NcaabbGender
+from .pbp_table import (
+    MISSING,
+    EventTableStore,
+    parse_clock_tenths,
+    season_for_day,
+)
+
+
+def _play(
+    clock: str,
+    team: Optional[str],
+    player: Optional[str] = None,
+    home: int = 0,
+    away: int = 0,
+    x: float = -214748340,
+) -> Dict[str, Any]:
+    play: Dict[str, Any] = dict(
+        period=dict(number=1),
+        clock=dict(displayValue=clock),
+        type=dict(id="558"),
+        homeScore=home,
+        awayScore=away,
+        scoringPlay=home + away > 0,
+        coordinate=dict(x=x, y=3),
+    )
+    if team is not None:
+        play["team"] = dict(id=team)
+    if player is not None:
+        play["participants"] = [dict(athlete=dict(id=player))]
+    return play
+
+
+def _pbp(game_id: str, plays: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return dict(game_id=game_id, plays=plays)
+
+
+@pytest.mark.parametrize(
+    "display, tenths",
+    [("19:40", 11800), ("0:05", 50), ("45.6", 456), ("", MISSING), ("x", MISSING)],
+)
+def test_parse_clock_tenths(display: str, tenths: int) -> None:
+    assert parse_clock_tenths(display) == tenths
+
+
+def test_season_for_day() -> None:
+    assert season_for_day(date(2025, 11, 4)) == 2025
+    assert season_for_day(date(2026, 3, 20)) == 2025
+
+
+def test_append_and_load(tmp_path: Path) -> None:
+    store = EventTableStore(tmp_path)
+    first_day = [
+        _pbp("1", [_play("20:00", None), _play("19:40", "12", "7", home=2, x=10)]),
+        _pbp("2", [_play("1:02", "30", "8")]),
+    ]
+    second_day = [
+        # Already in from the first day
+        _pbp("2", [_play("9:99", "99")]),
+        _pbp("3", [_play("45.6", "12", "9", away=3)]),
+    ]
+
+    store.append(NcaabbGender.mens, date(2025, 11, 4), first_day)
+    # A new store, like a later run would have
+    store = EventTableStore(tmp_path)
+    store.append(NcaabbGender.mens, date(2025, 11, 5), second_day)
+    table = store.load(NcaabbGender.mens, 2025)
+
+    assert len(table) == 4
+    assert [table.game_ids[g] for g in table.game] == ["1", "1", "2", "3"]
+    assert list(table.clock_tenths) == [12000, 11800, 620, 456]
+    # Codes mean the same thing from one part to the next
+    assert list(table.team) == [MISSING, 0, 1, 0]
+    assert table.teams == ["12", "30"]
+    assert [table.players[p] for p in table.player[1:]] == ["7", "8", "9"]
+    assert list(table.home_score) == [0, 2, 0, 0]
+    assert list(table.scoring) == [0, 1, 0, 1]
+    assert table.x[1] == 10 and math.isnan(table.x[0])
+    assert store.days(NcaabbGender.mens, 2025) == {date(2025, 11, 4), date(2025, 11, 5)}
+
+
+def test_unfinished_parts_are_ignored(tmp_path: Path) -> None:
+    store = EventTableStore(tmp_path)
+    store.append(
+        NcaabbGender.womens, date(2026, 1, 2), [_pbp("1", [_play("1:00", "5")])]
+    )
+    season_dir = store.season_dir(NcaabbGender.womens, 2025)
+    # Like an append that stopped before its index got written
+    (season_dir / "part-00001.bin").write_bytes(b"garbage")
+
+    assert len(store.load(NcaabbGender.womens, 2025)) == 1
+    assert len(store.load(NcaabbGender.womens, 2024)) == 0
+
+
+def test_appending_only_needs_the_index(tmp_path: Path) -> None:
+    store = EventTableStore(tmp_path)
+    store.append(
+        NcaabbGender.mens, date(2025, 11, 4), [_pbp("1", [_play("1:00", "5")])]
+    )
+    season_dir = store.season_dir(NcaabbGender.mens, 2025)
+    # Like a job that only downloaded the index
+    (season_dir / "part-00000.bin").unlink()
+
+    part = store.append(
+        NcaabbGender.mens, date(2025, 11, 5), [_pbp("2", [_play("2:00", "6")])]
+    )
+
+    assert part == season_dir / "part-00001.bin"
+    assert store.days(NcaabbGender.mens, 2025) == {date(2025, 11, 4), date(2025, 11, 5)}
@@ -1,14 +1,24 @@
+import asyncio
 import datetime
-import json
-from typing import AsyncIterator, TypedDict
+from itertools import chain
+from logging import getLogger
+from typing import AsyncIterator, Collection, Dict, Optional, TypedDict, Union
 
-import aiohttp
-from bs4 import BeautifulSoup
-
-from endgame.async_tools import apply_in_parallel
+from endgame.async_tools import stream_in_parallel
+from endgame.scheduler import get_scheduler
+from endgame.types import Game
+from endgame.web import EmptyPage, KnownEmptyError, get
 
+from .espnfitt import find_gamepackage_part
 from .ncaabb import NcaabbGender, NcaabbGroup, get_ncaabb_games
 
+logger = getLogger(__name__)
+
+
+_URL_FORMAT = (
+    "https://www.espn.com/{league}-college-basketball/playbyplay/_/gameId/{game_id}"
+)
+
 
 class _PlayByPlay(TypedDict):
     game_id: str
@@ -16,27 +26,71 @@ class _PlayByPlay(TypedDict):
 
 
 async def get_plays_for_day(
-    date: datetime.date, league: NcaabbGender
+    date: datetime.date,
+    league: NcaabbGender,
+    skip_game_ids: Collection[str] = (),
 ) -> AsyncIterator[_PlayByPlay]:
-    for group in NcaabbGroup:
-        games = await get_ncaabb_games(date, league, group)
-        args = [(game.game_id, league) for game in games]
-        plays_list = [p async for p in apply_in_parallel(get_plays, args)]
-        for game, plays in zip(games, plays_list, strict=True):
-            yield _PlayByPlay(game_id=game.game_id, plays=plays)
-
-
-async def get_plays(game_id: str, league: NcaabbGender) -> list[dict]:
-    async with aiohttp.ClientSession() as session:
-        url = f"https://www.espn.com/{league.value}-college-basketball/playbyplay/_/gameId/{game_id}"
-        async with session.get(url) as response:
-            response.raise_for_status()
-            raw = await response.text()
-    soup = BeautifulSoup(raw, "html.parser")
-    scripts = soup.select("script")
-    fit_script = next(script for script in scripts if "espnfitt" in script.text)
-    prefix = "window['__espnfitt__']="
-    interesting_json = fit_script.text.split(prefix)[-1][:-1]
-    data = json.loads(interesting_json)
-    # There's other data in here, like page.content.gamepackage.pbp.hasFullPbp
-    return data["page"]["content"]["gamepackage"]["pbp"]["plays"]
+    """
+    Every finished game's plays on `date`, other than `skip_game_ids`'
+    (ex: ones a retried job already has).
+
+    A game that fails doesn't stop the rest: they're all yielded first,
+    then the first failure is raised.
+    """
+    # Every group's scoreboard at once, since each is only a request.
+    # A game can be under more than one group, but only needs fetching once.
+    scoreboards = await asyncio.gather(
+        *(get_ncaabb_games(date, league, group) for group in NcaabbGroup)
+    )
+    games: Dict[str, Game] = {}
+    for game in chain.from_iterable(scoreboards):
+        if game.game_id not in skip_game_ids:
+            games.setdefault(game.game_id, game)
+
+    error: Optional[Exception] = None
+    args = [(game.game_id, league, game.completed) for game in games.values()]
+    async for completed in stream_in_parallel(get_plays, args):
+        game_id, _, _ = completed.args
+        if completed.error is not None:
+            logger.warning("Couldn't get plays for %s: %s", game_id, completed.error)
+            error = error or completed.error
+            continue
+        yield _PlayByPlay(game_id=game_id, plays=completed.get())
+    if error is not None:
+        raise error
+
+
+async def get_plays(
+    game_id: str, league: NcaabbGender, finished: bool = False
+) -> list[dict]:
+    """
+    A game's plays. Only `finished` games' pages get cached,
+    since an unfinished game's plays are still changing.
+    """
+    url = _URL_FORMAT.format(league=league.value, game_id=game_id)
+    try:
+        content = await get(url)
+    except KnownEmptyError:
+        return []
+    plays = await get_scheduler().parse(_parse_plays, content.data)
+    if isinstance(plays, EmptyPage):
+        if finished:
+            # It's over, so there won't ever be any
+            await content.mark_empty()
+        return []
+    if finished and plays:
+        await content.save_if_necessary()
+    return plays
+
+
+def _parse_plays(raw: bytes) -> Union[list[dict], EmptyPage]:
+    """
+    `EmptyPage` only when the page says it doesn't have play by play,
+    rather than just not having any plays in it (yet)
+    """
+    pbp = find_gamepackage_part(raw, "pbp")
+    if not isinstance(pbp, dict) or "plays" not in pbp:
+        raise ValueError("No play by play in the page")
+    if not pbp["plays"] and pbp.get("hasFullPbp") is False:
+        return EmptyPage.EMPTY
+    return pbp["plays"]
@@ -1,8 +1,87 @@
-from datetime import date
+import json
+from datetime import date, datetime
+from pathlib import Path
+from typing import List
 
-from .ncaabb import NcaabbGender
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from ..conftest import Serve
+from ..types import Game
+from . import plays as plays_module
+from .ncaabb import NcaabbGender, NcaabbGroup
 from .plays import get_plays, get_plays_for_day
 
+# Every game ID the test server has been asked for
+_REQUESTS = web.AppKey("requests", list)
+
+
+@pytest.fixture
+async def server(
+    serve: Serve, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> TestServer:
+    monkeypatch.setenv("ENDGAME_CACHE_DIR", str(tmp_path))
+
+    async def handler(request: web.Request) -> web.Response:
+        game_id = request.match_info["game_id"]
+        request.app[_REQUESTS].append(game_id)
+        if game_id == "broken":
+            return web.Response(body=b"<html>No state</html>")
+        plays = [dict(id=f"{game_id}-{i}") for i in range(int(game_id) % 3)]
+        # "3" says it won't ever have any, and "6" just doesn't yet
+        pbp = dict(plays=plays, hasFullPbp=game_id != "3")
+        state = dict(page=dict(content=dict(gamepackage=dict(pbp=pbp))))
+        script = f"<script>window['__espnfitt__']={json.dumps(state)};</script>"
+        return web.Response(body=f"<html>{script}</html>".encode())
+
+    app = web.Application()
+    app[_REQUESTS] = []
+    app.router.add_get("/{league}/{game_id}", handler)
+    test_server = await serve(app)
+    url = str(test_server.make_url("/")) + "{league}/{game_id}"
+    monkeypatch.setattr(plays_module, "_URL_FORMAT", url)
+    return test_server
+
+
+async def test_only_finished_games_are_cached(server: TestServer) -> None:
+    for _ in range(2):
+        assert len(await get_plays("4", NcaabbGender.mens, finished=True)) == 1
+        assert len(await get_plays("7", NcaabbGender.mens)) == 1
+        # Over without any plays, so there's no point asking again
+        assert await get_plays("3", NcaabbGender.mens, finished=True) == []
+        # Nothing there, without the page saying there won't be
+        assert await get_plays("6", NcaabbGender.mens, finished=True) == []
+
+    assert sorted(server.app[_REQUESTS]) == ["3", "4", "6", "6", "7", "7"]
+
+
+def _game(game_id: str) -> Game:
+    return Game("h", 1, "a", 0, False, True, datetime(2026, 3, 1), game_id)
+
+
+async def test_day_skips_games_and_finishes_before_failing(
+    server: TestServer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def _get_games(_day, _gender, group: NcaabbGroup) -> List[Game]:
+        if group == NcaabbGroup.d1:
+            return [_game("1"), _game("broken"), _game("2"), _game("5")]
+        if group == NcaabbGroup.nit:
+            # Also on d1's scoreboard
+            return [_game("2"), _game("8")]
+        return []
+
+    monkeypatch.setattr(plays_module, "get_ncaabb_games", _get_games)
+
+    pbps = get_plays_for_day(date(2026, 3, 1), NcaabbGender.mens, {"5"})
+    seen = []
+    with pytest.raises(ValueError):
+        async for pbp in pbps:
+            seen.append(pbp["game_id"])
+
+    assert sorted(seen) == ["1", "2", "8"]
+    assert sorted(server.app[_REQUESTS]) == ["1", "2", "8", "broken"]
+
 
 async def test_plays() -> None:
     plays = await get_plays("401825568", NcaabbGender.mens)
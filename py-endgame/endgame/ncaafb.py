@@ -5,7 +5,7 @@ from typing import AsyncIterator, Iterator, List
 
 import aiohttp
 
-from .async_tools import apply_in_parallel
+from .async_tools import apply_in_parallel, stream_in_parallel
 from .date import get_end_year
 from .espn_games import get_games, save_seasons
 from .espn_odds import Odds, get_odds
@@ -23,6 +23,8 @@ BASE_URL = (
 # postseason week numbers from colliding with regular season ones.
 N_REGULAR_WEEKS = 16
 SEASON_END = (2, 1)
+# Week requests for one season in flight at once
+_MAX_PARALLEL_WEEKS = 10
 # Week 1 is the Monday-Sunday week containing this day. The earliest game in
 # any season we have is 2002-08-22, so every game lands in week 1 or later.
 #
@@ -41,7 +43,12 @@ async def update(location="ncaaf.csv"):
     """
     end_year = get_end_year(SEASON_END)
     args = [(y,) for y in range(1999, end_year + 1)]
-    seasons = [s async for s in apply_in_parallel(get_season, args)]
+    seasons = [
+        s
+        async for s in apply_in_parallel(
+            get_season, args, group_by=lambda args: f"ncaafb {args[0]}"
+        )
+    ]
     save_seasons(seasons, location)
 
 
@@ -64,19 +71,23 @@ async def get_season(year: int) -> Season:
 
     weeks = []
     trouble_weeks: List[WeekParams] = []
-    for week_param in week_params:
-        try:
-            week = await _get_week(*week_param)
-            weeks.append(week)
+    # Fetched concurrently, but handled in order, so the weeks
+    # (and which duplicates get dropped) come out the same every time
+    fetches = stream_in_parallel(
+        _get_week, week_params, max_parallel=_MAX_PARALLEL_WEEKS, ordered=True
+    )
+    async for fetch in fetches:
         # Should I raise custom exception instead?
-        except aiohttp.ClientResponseError:
-            year, week_num, season_type, group = week_param
+        if isinstance(fetch.error, aiohttp.ClientResponseError):
+            year, week_num, season_type, group = fetch.args
             msg = (
                 f"Marking week as trouble: "
                 f"{year=} {week_num=} type={season_type.name} group={group.name}"
             )
             logger.warning(msg)
-            trouble_weeks.append(week_param)
+            trouble_weeks.append(WeekParams(*fetch.args))
+            continue
+        weeks.append(fetch.get())
 
     weeks = list(_remove_cross_division_duplicates(weeks))
     season = Season(weeks, year, trouble_weeks, SEASON_START)
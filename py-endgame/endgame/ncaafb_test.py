@@ -1,7 +1,25 @@
+import asyncio
 from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
 
+import aiohttp
+import pytest
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from . import ncaafb
 from .ncaafb import SEASON_START
-from .types import Game, Season, Week, group_games_into_weeks, iter_weeks
+from .types import (
+    Game,
+    NcaaFbGroup,
+    Season,
+    SeasonType,
+    Week,
+    WeekParams,
+    group_games_into_weeks,
+    iter_weeks,
+)
 
 
 def _game(month: int, day: int, game_id: str, year: int = 2021) -> Game:
@@ -48,3 +66,34 @@ def test_season_walks_chronologically() -> None:
         ["fcs_semifinal"],
         ["title"],
     ]
+
+
+async def test_get_season__trouble_weeks_stay_in_order(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("ENDGAME_CACHE_DIR", str(tmp_path))
+    bad_weeks = {3, 4, 5}
+
+    async def fake_get_week(
+        year: int, week: int, season_type: SeasonType, group: NcaaFbGroup
+    ) -> Week:
+        if week in bad_weeks and group == NcaaFbGroup.fbs:
+            # Earlier weeks fail last
+            await asyncio.sleep(0.01 * (10 - week))
+            raise aiohttp.ClientResponseError(
+                aiohttp.RequestInfo(
+                    URL("https://example.com"), "GET", CIMultiDictProxy(CIMultiDict())
+                ),
+                (),
+                status=500,
+            )
+        return Week([_game(9, week, f"{group.name} {season_type.name} {week}")], week)
+
+    with patch.object(ncaafb, "_get_week", fake_get_week):
+        season = await ncaafb.get_season(2021)
+
+    assert season.trouble_params == [
+        WeekParams(2021, week, SeasonType.regular, NcaaFbGroup.fbs)
+        for week in sorted(bad_weeks)
+    ]
+    assert [w.number for w in season.weeks] == sorted(w.number for w in season.weeks)
@@ -2,7 +2,7 @@ from datetime import datetime, timezone
 from logging import getLogger
 from typing import AsyncIterator
 
-from endgame.async_tools import apply_in_parallel
+from endgame.async_tools import apply_in_parallel, stream_in_parallel
 from endgame.date import get_end_year
 from endgame.espn_games import get_games, save_seasons
 from endgame.espn_odds import Odds, get_odds
@@ -55,6 +55,8 @@ REAL_TEAMS = frozenset(
     ]
 )
 N_REGULAR_WEEKS = 17
+# Week requests for one season in flight at once
+_MAX_PARALLEL_WEEKS = 10
 
 
 async def update(location: str = "nfl.csv"):
@@ -63,7 +65,12 @@ async def update(location: str = "nfl.csv"):
     """
     end_year = get_end_year(SEASON_END)
     args = [(y,) for y in range(1999, end_year + 1)]
-    seasons = [s async for s in apply_in_parallel(get_season, args)]
+    seasons = [
+        s
+        async for s in apply_in_parallel(
+            get_season, args, group_by=lambda args: f"nfl {args[0]}"
+        )
+    ]
     save_seasons(seasons, location)
 
 
@@ -78,11 +85,15 @@ async def get_season(year: int) -> Season:
         return season
 
     # This "season" is 2019 for the season whose Super Bowl is in 2020
-    weeks = []
-    for week in range(1, N_REGULAR_WEEKS + 1):
-        weeks.append(await _get_week(year, week, SeasonType.regular))
-    for week in range(1, 6):
-        weeks.append(await _get_week(year, week, SeasonType.post))
+    week_args = [
+        (year, week, SeasonType.regular) for week in range(1, N_REGULAR_WEEKS + 1)
+    ]
+    week_args += [(year, week, SeasonType.post) for week in range(1, 6)]
+    # Fetched concurrently, but kept in week order
+    fetches = stream_in_parallel(
+        _get_week, week_args, max_parallel=_MAX_PARALLEL_WEEKS, ordered=True
+    )
+    weeks = [fetch.get() async for fetch in fetches]
     season = Season(weeks, year)
 
     # Cache if the season is over
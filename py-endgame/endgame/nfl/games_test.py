@@ -1,8 +1,12 @@
+import asyncio
 from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
-from ..types import Game
+from ..types import Game, SeasonType, Week
+from . import games
 from .games import move_teams
 
 
@@ -94,3 +98,28 @@ def test_move_teams_moved_franchises(old_name: str, expected: str) -> None:
 )
 def test_move_teams_handles_every_team_that_stayed_put(name: str) -> None:
     assert move_teams(_game(home=name, away=name)).home == name.split(" ")[-1].lower()
+
+
+async def test_get_season__weeks_are_fetched_concurrently_in_order(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("ENDGAME_CACHE_DIR", str(tmp_path))
+    in_flight = 0
+    most_in_flight = 0
+
+    async def fake_get_week(season: int, week: int, season_type: SeasonType) -> Week:
+        nonlocal in_flight, most_in_flight
+        in_flight += 1
+        most_in_flight = max(most_in_flight, in_flight)
+        # Later weeks finish first
+        await asyncio.sleep(0.001 * (30 - week))
+        in_flight -= 1
+        if season_type == SeasonType.post:
+            week += games.N_REGULAR_WEEKS
+        return Week([_game("Chicago Bears", "Green Bay Packers")], week)
+
+    with patch.object(games, "_get_week", fake_get_week):
+        season = await games.get_season(2005)
+
+    assert [w.number for w in season.weeks] == list(range(1, 23))
+    assert most_in_flight == games._MAX_PARALLEL_WEEKS
@@ -1,10 +1,11 @@
 import re
 from csv import DictWriter
 from dataclasses import dataclass
-from typing import AsyncIterable, Dict, Iterable, Optional, Tuple
+from typing import AsyncIterable, Dict, Iterable, List, Optional, Tuple
 
 from bs4 import BeautifulSoup, Tag
 
+from ..scheduler import get_scheduler
 from ..web import get
 from .cities import CITIES
 from .teams import NflTeam
@@ -69,9 +70,17 @@ async def get_spreads(week: str) -> AsyncIterable[Game]:
     during every season since 2006
     """
     content = await get(URL_FORMAT.format(week=week))
-    soup = BeautifulSoup(content.data, features="html.parser")
+    for game in await get_scheduler().parse(_parse_spreads, content.data):
+        yield game
+
+    await content.save_if_necessary()
+
+
+def _parse_spreads(data: bytes) -> List[Game]:
+    soup = BeautifulSoup(data, features="html.parser")
     tables = soup.find_all("table")
 
+    games: List[Game] = []
     for table in tables:
         # `findChild` has been a deprecated alias for `find` since bs4 3.0, and
         # its shim doesn't take `recursive`. Each `find` can also come back as a
@@ -86,10 +95,8 @@ async def get_spreads(week: str) -> AsyncIterable[Game]:
         center = td_tag.find("center", recursive=False)
         if not isinstance(center, Tag):
             continue
-        for game in _to_games(td_tag, center.text):
-            yield game
-
-    await content.save_if_necessary()
+        games.extend(_to_games(td_tag, center.text))
+    return games
 
 
 def _to_games(td_tag: Tag, header_text: str) -> Iterable[Game]:
@@ -0,0 +1,358 @@
+"""
+When (and how long to wait before) retrying a failed request
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from logging import getLogger
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, TypeVar
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from .config import CONFIG
+
+logger = getLogger(__name__)
+
+
+# What a failed attempt can raise, that might go better next time
+RETRYABLE_ERRORS = (
+    aiohttp.ClientResponseError,
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError,
+)
+
+
+class CircuitOpenError(aiohttp.ClientResponseError):
+    """
+    A host has been failing, so requests to it fail right away
+    instead of waiting on it. A 503 `ClientResponseError`, so callers that
+    skip a failed page, or mark its days as trouble, do the same here.
+    """
+
+    def __init__(self, host: str):
+        url = URL.build(scheme="https", host=host)
+        request_info = aiohttp.RequestInfo(
+            url, "GET", CIMultiDictProxy(CIMultiDict()), url
+        )
+        super().__init__(request_info, (), status=503, message=f"Holding off on {host}")
+        self.host = host
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How to retry one request
+    """
+
+    max_attempts: int = 5
+    connect_timeout_s: float = field(default_factory=lambda: CONFIG.connect_timeout_s)
+    # The longest to wait between chunks of a response, not for the whole thing
+    read_timeout_s: float = field(default_factory=lambda: CONFIG.read_timeout_s)
+    # Waits are backoff_s * attempt ** 2, +/- 10%, up to max_backoff_s
+    backoff_s: float = 1.0
+    max_backoff_s: float = 30.0
+    # The longest `Retry-After` to respect. Anything longer gets this.
+    max_retry_after_s: float = 120.0
+
+    @property
+    def timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=self.connect_timeout_s,
+            sock_read=self.read_timeout_s,
+        )
+
+    def is_retryable(self, error: Exception) -> bool:
+        """
+        Whether the next attempt could go any differently
+        """
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status in (408, 429) or error.status >= 500
+        return isinstance(error, RETRYABLE_ERRORS)
+
+    def wait_s(self, attempt: int, error: Exception) -> float:
+        """
+        How long to wait after the `attempt`th attempt (counting from 1) failed
+        """
+        retry_after_s = _retry_after_s(error)
+        if retry_after_s is not None:
+            return min(retry_after_s, self.max_retry_after_s)
+        jitter = 0.95 + 0.1 * random.random()
+        return min(jitter * self.backoff_s * attempt**2, self.max_backoff_s)
+
+
+def _retry_after_s(error: Exception) -> Optional[float]:
+    """
+    The `Retry-After` on an error response, which is either
+    a number of seconds or an HTTP date
+    """
+    if not isinstance(error, aiohttp.ClientResponseError) or not error.headers:
+        return None
+    value = error.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a host after `failure_threshold` failures
+    in a row, for `cooldown_s`. After that, one request gets to try:
+    if it works, everything goes back to normal, and if not,
+    it's another cooldown.
+    """
+
+    def __init__(self, failure_threshold: int = 10, cooldown_s: float = 30.0):
+        self._failure_threshold = failure_threshold
+        self._cooldown_s = cooldown_s
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def check(self, host: str) -> None:
+        """
+        Raise `CircuitOpenError` if a request shouldn't be sent right now
+        """
+        if self._opened_at is None:
+            return
+        if (
+            time.monotonic() - self._opened_at < self._cooldown_s
+            or self._trial_in_flight
+        ):
+            raise CircuitOpenError(host)
+        self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def abandon_trial(self) -> None:
+        """
+        A request that was let through never finished, so let another try
+        """
+        self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """
+        Returns whether this failure opened the circuit
+        """
+        self._consecutive_failures += 1
+        if self._trial_in_flight:
+            self._trial_in_flight = False
+            self._opened_at = time.monotonic()
+            return True
+        if self._opened_at is None and (
+            self._consecutive_failures >= self._failure_threshold
+        ):
+            self._opened_at = time.monotonic()
+            return True
+        return False
+
+
+class RetryBudget:
+    """
+    Caps retries for a whole run at `min_retries`, plus `ratio` of the
+    requests made so far, so an outage can't turn every request into
+    a full set of retries.
+    """
+
+    def __init__(self, ratio: float, min_retries: int):
+        self._ratio = ratio
+        self._min_retries = min_retries
+        self._requests = 0
+        self._retries = 0
+
+    @property
+    def remaining(self) -> int:
+        return int(self._min_retries + self._ratio * self._requests) - self._retries
+
+    def record_request(self) -> None:
+        self._requests += 1
+
+    def spend(self) -> bool:
+        """
+        Take one retry out of the budget, if there's one left
+        """
+        if self.remaining <= 0:
+            return False
+        self._retries += 1
+        return True
+
+
+class RetryStats(NamedTuple):
+    """
+    How requests to one host have gone this run, for logging
+    """
+
+    host: str
+    requests: int
+    retries: int
+    failures: int
+    timeouts: int
+    # Requests that failed without being sent, because the circuit was open
+    short_circuited: int
+    circuit_opens: int
+    circuit_open: bool
+
+
+@dataclass
+class _HostState:
+    breaker: CircuitBreaker
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    short_circuited: int = 0
+    circuit_opens: int = 0
+
+
+_Result = TypeVar("_Result")
+
+
+class Retrier:
+    """
+    Runs requests under a `RetryPolicy`, with a circuit breaker per host
+    and one retry budget shared by every host.
+
+    "Per run" means per event loop, since the CLI does one `asyncio.run`
+    per thing it does.
+    """
+
+    def __init__(self, policy: Optional[RetryPolicy] = None):
+        self._policy = policy
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reset()
+
+    @property
+    def policy(self) -> RetryPolicy:
+        # Made on first use, so it picks up `CONFIG` as it is then
+        if self._policy is None:
+            self._policy = RetryPolicy()
+        return self._policy
+
+    async def call(
+        self,
+        host: str,
+        attempt: Callable[[], Awaitable[_Result]],
+        description: str,
+    ) -> _Result:
+        """
+        Call `attempt` until it works, the policy gives up,
+        the budget runs out, or the host's circuit opens
+        """
+        self._start_run_if_new()
+        state = self._state(host)
+        state.requests += 1
+        self._budget.record_request()
+        for i in range(1, self.policy.max_attempts + 1):
+            try:
+                state.breaker.check(host)
+            except CircuitOpenError:
+                state.short_circuited += 1
+                raise
+            try:
+                result = await attempt()
+            except RETRYABLE_ERRORS as error:
+                if not self.policy.is_retryable(error):
+                    # The host answered, so it's up
+                    state.breaker.record_success()
+                    raise
+                self._record_failure(host, state, error)
+                if i == self.policy.max_attempts or not self._spend_retry():
+                    raise
+                state.retries += 1
+                wait_s = self.policy.wait_s(i, error)
+                logger.warning(
+                    "Struggling to get %s. Error: %s. Attempt %d. Sleeping for %.02f",
+                    description,
+                    _error_message(error),
+                    i,
+                    wait_s,
+                )
+                await asyncio.sleep(wait_s)
+            except BaseException:
+                # Not the host's doing (ex: cancelled), so it doesn't count
+                state.breaker.abandon_trial()
+                raise
+            else:
+                state.breaker.record_success()
+                return result
+        raise Exception("Should never reach here, this is just for mypy")
+
+    @property
+    def stats(self) -> list[RetryStats]:
+        return [
+            RetryStats(
+                host=host,
+                requests=state.requests,
+                retries=state.retries,
+                failures=state.failures,
+                timeouts=state.timeouts,
+                short_circuited=state.short_circuited,
+                circuit_opens=state.circuit_opens,
+                circuit_open=state.breaker.is_open,
+            )
+            for host, state in self._hosts.items()
+        ]
+
+    def _record_failure(self, host: str, state: _HostState, error: Exception) -> None:
+        state.failures += 1
+        if isinstance(error, asyncio.TimeoutError):
+            state.timeouts += 1
+        if state.breaker.record_failure():
+            state.circuit_opens += 1
+            logger.warning("Too many failures from %s, holding off on it", host)
+
+    def _spend_retry(self) -> bool:
+        if self._budget.spend():
+            return True
+        if not self._budget_exhausted_logged:
+            logger.warning("Out of retries for this run, failing from now on")
+            self._budget_exhausted_logged = True
+        return False
+
+    def _state(self, host: str) -> _HostState:
+        if host not in self._hosts:
+            self._hosts[host] = _HostState(CircuitBreaker())
+        return self._hosts[host]
+
+    def _start_run_if_new(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._reset()
+
+    def _reset(self) -> None:
+        self._hosts: Dict[str, _HostState] = {}
+        self._budget = RetryBudget(
+            CONFIG.retry_budget_ratio, CONFIG.retry_budget_min_retries
+        )
+        self._budget_exhausted_logged = False
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, aiohttp.ClientResponseError):
+        return f"Status code: {error.status}"
+    return str(error) or type(error).__name__
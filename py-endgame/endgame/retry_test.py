@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Dict, Optional
+
+import aiohttp
+import pytest
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from .retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Retrier,
+    RetryBudget,
+    RetryPolicy,
+)
+
+
+def _response_error(
+    status: int, headers: Optional[Dict[str, str]] = None
+) -> aiohttp.ClientResponseError:
+    request_info = aiohttp.RequestInfo(
+        URL("https://example.com"), "GET", CIMultiDictProxy(CIMultiDict())
+    )
+    return aiohttp.ClientResponseError(
+        request_info, (), status=status, headers=CIMultiDict(headers or {})
+    )
+
+
+# No waiting between attempts, so tests are quick
+_POLICY = RetryPolicy(backoff_s=0, max_retry_after_s=0)
+
+
+def test_retryable() -> None:
+    policy = RetryPolicy()
+
+    assert policy.is_retryable(_response_error(503))
+    assert policy.is_retryable(_response_error(429))
+    assert policy.is_retryable(aiohttp.ServerDisconnectedError())
+    assert policy.is_retryable(aiohttp.ServerTimeoutError())
+    assert not policy.is_retryable(_response_error(404))
+    assert not policy.is_retryable(ValueError())
+
+
+def test_wait_respects_retry_after_seconds() -> None:
+    policy = RetryPolicy(max_retry_after_s=60)
+
+    assert policy.wait_s(1, _response_error(429, {"Retry-After": "7"})) == 7
+    assert policy.wait_s(1, _response_error(429, {"Retry-After": "600"})) == 60
+
+
+def test_wait_respects_retry_after_date() -> None:
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    error = _response_error(503, {"Retry-After": format_datetime(retry_at, True)})
+
+    assert 25 < RetryPolicy().wait_s(1, error) <= 30
+
+
+def test_wait_backs_off_without_retry_after() -> None:
+    policy = RetryPolicy(backoff_s=1, max_backoff_s=10)
+
+    assert 0.9 < policy.wait_s(1, _response_error(503)) < 1.1
+    assert 8.5 < policy.wait_s(3, _response_error(503)) < 9.5
+    assert policy.wait_s(5, _response_error(503)) == 10
+
+
+def test_circuit_breaker_opens_then_lets_one_through() -> None:
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_s=0)
+    for _ in range(3):
+        breaker.check("example.com")
+        breaker.record_failure()
+
+    assert breaker.is_open
+    # Cooled down, so one trial gets through, but only one
+    breaker.check("example.com")
+    with pytest.raises(CircuitOpenError):
+        breaker.check("example.com")
+
+    breaker.record_success()
+    assert not breaker.is_open
+
+
+def test_circuit_breaker_waits_out_its_cooldown() -> None:
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_s=60)
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.check("example.com")
+    # Handled like any other failed request
+    assert isinstance(error.value, aiohttp.ClientResponseError)
+    assert error.value.status == 503
+
+
+def test_retry_budget() -> None:
+    budget = RetryBudget(ratio=0.5, min_retries=1)
+    for _ in range(4):
+        budget.record_request()
+
+    # 1 + 0.5 * 4
+    assert [budget.spend() for _ in range(4)] == [True, True, True, False]
+
+
+async def test_retrier_retries_until_it_works() -> None:
+    retrier = Retrier(_POLICY)
+    attempts = 0
+
+    async def _flaky() -> str:
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise _response_error(503)
+        return "done"
+
+    assert await retrier.call("example.com", _flaky, "flaky") == "done"
+    (stats,) = retrier.stats
+    assert (stats.requests, stats.retries, stats.failures) == (1, 2, 2)
+
+
+async def test_retrier_doesnt_retry_a_404() -> None:
+    retrier = Retrier(_POLICY)
+    attempts = 0
+
+    async def _missing() -> str:
+        nonlocal attempts
+        attempts += 1
+        raise _response_error(404)
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        await retrier.call("example.com", _missing, "missing")
+    assert attempts == 1
+
+
+async def test_retrier_fails_fast_once_the_circuit_opens(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Plenty of budget, so only the breaker stops things
+    monkeypatch.setenv("ENDGAME_RETRY_BUDGET_MIN", "1000")
+    retrier = Retrier(_POLICY)
+    attempts = 0
+
+    async def _down() -> str:
+        nonlocal attempts
+        attempts += 1
+        raise aiohttp.ServerDisconnectedError()
+
+    # 5 attempts each, and the circuit opens on the 10th failure
+    for _ in range(2):
+        with pytest.raises(aiohttp.ServerDisconnectedError):
+            await retrier.call("example.com", _down, "down")
+    with pytest.raises(CircuitOpenError):
+        await retrier.call("example.com", _down, "down")
+
+    assert attempts == 10
+    (stats,) = retrier.stats
+    assert (stats.circuit_opens, stats.short_circuited) == (1, 1)
+    assert stats.circuit_open
+
+
+async def test_retrier_stops_when_the_budget_runs_out(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("ENDGAME_RETRY_BUDGET_MIN", "2")
+    monkeypatch.setenv("ENDGAME_RETRY_BUDGET_RATIO", "0")
+    retrier = Retrier(_POLICY)
+    attempts = 0
+
+    async def _down() -> str:
+        nonlocal attempts
+        attempts += 1
+        raise _response_error(503)
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        await retrier.call("example.com", _down, "down")
+
+    assert attempts == 3
@@ -0,0 +1,294 @@
+"""
+Process-wide limits on how much runs at once, shared by every fan-out,
+however deeply nested
+"""
+
+import asyncio
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    ParamSpec,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+from .config import CONFIG
+
+# Who work is being done for, so limits can be shared fairly between them.
+# Set with `fair_share_group`, and inherited by every task started under it.
+_GROUP: ContextVar[str] = ContextVar("fair_share_group", default="")
+
+
+@contextmanager
+def fair_share_group(name: str) -> Iterator[None]:
+    """
+    Count everything started in this block (including in tasks it starts)
+    as `name`'s work, when sharing out the `Scheduler`'s limits
+    """
+    token = _GROUP.set(name)
+    try:
+        yield
+    finally:
+        _GROUP.reset(token)
+
+
+class LimiterStats(NamedTuple):
+    capacity: int
+    in_use: int
+    # How many are waiting, by group
+    waiting: Dict[str, int]
+
+
+class FairLimiter:
+    """
+    A semaphore that, when a slot frees up, hands it to the groups
+    that are waiting in turn (round robin), rather than to whoever
+    asked first. A group that queues up thousands of things
+    only gets its turn like everyone else.
+    """
+
+    def __init__(self, capacity: int):
+        assert capacity >= 1, "Need at least one slot"
+        self._capacity = capacity
+        self._in_use = 0
+        self._waiters: Dict[str, Deque[asyncio.Future[None]]] = {}
+        # Groups with someone waiting, in the order they get their next turn
+        self._turns: Deque[str] = deque()
+
+    @property
+    def stats(self) -> LimiterStats:
+        return LimiterStats(
+            capacity=self._capacity,
+            in_use=self._in_use,
+            waiting={group: len(queue) for group, queue in self._waiters.items()},
+        )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold a slot for the length of the block,
+        on behalf of the current `fair_share_group`
+        """
+        await self._acquire(_GROUP.get())
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, group: str) -> None:
+        if self._in_use < self._capacity and not self._turns:
+            self._in_use += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        if group not in self._waiters:
+            self._waiters[group] = deque()
+            self._turns.append(group)
+        self._waiters[group].append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as it got cancelled, so pass it on
+                self._release()
+            else:
+                self._forget(group, waiter)
+            raise
+
+    def _release(self) -> None:
+        # The slot goes straight to the next waiter, so `_in_use` stays put
+        while self._turns:
+            group = self._turns.popleft()
+            queue = self._waiters[group]
+            waiter = queue.popleft()
+            if queue:
+                self._turns.append(group)
+            else:
+                del self._waiters[group]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_use -= 1
+
+    def _forget(self, group: str, waiter: asyncio.Future[None]) -> None:
+        queue = self._waiters.get(group)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self._waiters[group]
+            self._turns.remove(group)
+
+
+_Params = ParamSpec("_Params")
+_Result = TypeVar("_Result")
+
+# How long a partly full batch waits for more parses before it's sent anyway
+_BATCH_WAIT_S = 0.002
+
+
+def _parse_batch(jobs: List[Callable[[], Any]]) -> List[Tuple[bool, Any]]:
+    """
+    Run a batch of parses in a worker process. Each one's exception comes
+    back alongside the others' results, rather than sinking the batch.
+    """
+    results: List[Tuple[bool, Any]] = []
+    for job in jobs:
+        try:
+            results.append((True, job()))
+        except Exception as error:
+            results.append((False, error))
+    return results
+
+
+_EXECUTORS: Dict[int, ProcessPoolExecutor] = {}
+
+
+def _get_executor(processes: int) -> ProcessPoolExecutor:
+    # Shared by every loop (the workers take a moment to start), and
+    # "spawn"ed, since forking a process with threads running isn't safe
+    if processes not in _EXECUTORS:
+        _EXECUTORS[processes] = ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _EXECUTORS[processes]
+
+
+class ProcessParser:
+    """
+    Runs parsers in a pool of worker processes, so parsing uses every core.
+    Parses get sent `chunk_size` at a time, to spread the cost of shipping
+    them over, so parsers and what they're given and return all have to
+    pickle: module-level functions, bytes in, and plain data out.
+    """
+
+    def __init__(self, processes: int, chunk_size: int):
+        self._executor = _get_executor(processes)
+        self._chunk_size = chunk_size
+        self._batch: List[Tuple[Callable[[], Any], asyncio.Future[Any]]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Held onto, so they aren't garbage collected mid-batch
+        self._running: Set[asyncio.Task[None]] = set()
+
+    async def parse(self, job: Callable[[], _Result]) -> _Result:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[_Result] = loop.create_future()
+        self._batch.append((job, future))
+        if len(self._batch) >= self._chunk_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(_BATCH_WAIT_S, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._batch = self._batch, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(
+        self, batch: List[Tuple[Callable[[], Any], asyncio.Future[Any]]]
+    ) -> None:
+        jobs = [job for job, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor, _parse_batch, jobs
+            )
+        except Exception as error:
+            # Couldn't ship it, or a worker died
+            results = [(False, error)] * len(batch)
+        for (_, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+class Scheduler:
+    """
+    One limit on requests in flight, and another on parsing,
+    each shared fairly between `fair_share_group`s
+    """
+
+    def __init__(
+        self,
+        max_requests: int,
+        max_parses: int,
+        parse_processes: int = 0,
+        parse_chunk_size: int = 1,
+    ):
+        self.requests = FairLimiter(max_requests)
+        self._processes: Optional[ProcessParser] = None
+        if parse_processes > 0:
+            self._processes = ProcessParser(parse_processes, parse_chunk_size)
+            # Enough in flight to keep every worker's batches full
+            max_parses = max(max_parses, parse_processes * parse_chunk_size)
+        self.parsing = FairLimiter(max_parses)
+
+    async def parse(
+        self,
+        parser: Callable[_Params, _Result],
+        *args: _Params.args,
+        **kwargs: _Params.kwargs,
+    ) -> _Result:
+        """
+        Run a CPU-bound parser in a thread (or a worker process, with
+        `parse_processes`), so the event loop keeps up with the network
+        while it runs
+        """
+        async with self.parsing.slot():
+            if self._processes is not None:
+                return await self._processes.parse(partial(parser, *args, **kwargs))
+            return await asyncio.to_thread(parser, *args, **kwargs)
+
+
+class _SchedulerManager:
+    """
+    The scheduler waits on futures, which belong to the event loop
+    they were made in, so it starts over on each new loop
+    """
+
+    def __init__(self) -> None:
+        self._scheduler: Optional[Scheduler] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self) -> Scheduler:
+        loop = asyncio.get_running_loop()
+        if self._scheduler is None or self._loop is not loop:
+            self._scheduler = Scheduler(
+                CONFIG.max_concurrent_requests,
+                CONFIG.max_concurrent_parses,
+                CONFIG.parse_processes,
+                CONFIG.parse_chunk_size,
+            )
+            self._loop = loop
+        return self._scheduler
+
+
+_SCHEDULERS = _SchedulerManager()
+
+
+def get_scheduler() -> Scheduler:
+    """
+    The scheduler shared by everything in this process
+    """
+    return _SCHEDULERS.get()
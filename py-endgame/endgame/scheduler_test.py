@@ -0,0 +1,112 @@
+import asyncio
+import os
+import threading
+
+from .async_tools import apply_in_parallel
+from .scheduler import FairLimiter, Scheduler, fair_share_group
+
+
+async def test_limiter_caps_whats_in_flight() -> None:
+    limiter = FairLimiter(2)
+    in_flight = 0
+    most_in_flight = 0
+
+    async def _work() -> None:
+        nonlocal in_flight, most_in_flight
+        async with limiter.slot():
+            in_flight += 1
+            most_in_flight = max(most_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    await asyncio.gather(*(_work() for _ in range(10)))
+
+    assert most_in_flight == 2
+    assert limiter.stats.in_use == 0
+
+
+async def test_limiter_takes_turns_between_groups() -> None:
+    limiter = FairLimiter(1)
+    order = []
+
+    async def _work(group: str) -> None:
+        with fair_share_group(group):
+            async with limiter.slot():
+                order.append(group)
+                await asyncio.sleep(0.001)
+
+    # The big group shows up first, with far more work
+    big = [asyncio.create_task(_work("big")) for _ in range(6)]
+    await asyncio.sleep(0)
+    small = [asyncio.create_task(_work("small")) for _ in range(2)]
+    await asyncio.gather(*big, *small)
+
+    # The first "big" got the free slot, and after that they alternate
+    assert order[:5] == ["big", "big", "small", "big", "small"]
+
+
+async def test_cancelled_waiter_gives_up_its_place() -> None:
+    limiter = FairLimiter(1)
+
+    async def _hold() -> None:
+        async with limiter.slot():
+            await asyncio.sleep(0.01)
+
+    holder = asyncio.create_task(_hold())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(_hold())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await holder
+
+    assert limiter.stats == (1, 0, {})
+
+
+async def test_groups_carry_into_nested_fan_outs() -> None:
+    limiter = FairLimiter(1)
+    seen = []
+
+    async def _inner(season: int) -> None:
+        async with limiter.slot():
+            await asyncio.sleep(0.001)
+            seen.append(limiter.stats.waiting)
+
+    async def _season(season: int) -> None:
+        async for _ in apply_in_parallel(_inner, [(season,)] * 3):
+            pass
+
+    async for _ in apply_in_parallel(
+        _season, [(1,), (2,)], group_by=lambda args: str(args[0])
+    ):
+        pass
+
+    # Both seasons' inner work queued up under their own group
+    assert any(set(waiting) == {"1", "2"} for waiting in seen)
+
+
+async def test_parse_runs_off_the_event_loop() -> None:
+    scheduler = Scheduler(max_requests=1, max_parses=1)
+
+    assert await scheduler.parse(threading.get_ident) != threading.get_ident()
+
+
+def _fail(message: str) -> None:
+    raise ValueError(message)
+
+
+async def test_parse_in_worker_processes() -> None:
+    scheduler = Scheduler(
+        max_requests=1, max_parses=1, parse_processes=2, parse_chunk_size=3
+    )
+
+    pids = await asyncio.gather(*(scheduler.parse(os.getpid) for _ in range(7)))
+
+    assert os.getpid() not in pids
+    # A failure comes back to whoever asked, without sinking its batch
+    results = await asyncio.gather(
+        scheduler.parse(_fail, "bad"),
+        scheduler.parse(len, b"ok"),
+        return_exceptions=True,
+    )
+    assert isinstance(results[0], ValueError)
+    assert results[1] == 2
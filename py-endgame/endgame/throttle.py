@@ -0,0 +1,205 @@
+"""
+Per-host throttling for outbound requests
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from logging import getLogger
+from typing import AsyncIterator, Deque, Dict, NamedTuple, Optional
+
+from .config import CONFIG
+
+logger = getLogger(__name__)
+
+
+# How far back `observed_rate` looks, and how often each host's
+# limit and rate get logged (at debug level)
+_RATE_WINDOW_S = 10.0
+
+
+class ThrottleStats(NamedTuple):
+    """
+    A snapshot of how hard we're hitting one host, for logging
+    """
+
+    host: str
+    limit: int
+    in_flight: int
+    observed_rate: float
+
+
+class HostThrottle:
+    """
+    Throttles the requests to one host two ways:
+
+    - A token bucket caps how many requests can start per second.
+    - An additive-increase/multiplicative-decrease (AIMD) limit caps how
+      many can be in flight at once. It creeps up by about one for every
+      `limit` fast responses, and halves when the host pushes back
+      (429s, 5xx's, dropped connections).
+
+    The caller reports how each request went with `record_response`
+    and `record_backoff`, since what counts as "pushing back" depends
+    on the HTTP client.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        max_rate: float,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 30,
+        slow_response_s: float = 2.0,
+        backoff_cooldown_s: float = 1.0,
+    ):
+        assert 1 <= min_limit <= initial_limit <= max_limit, "Invalid limits"
+        self._host = host
+        self._max_rate = max_rate
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._slow_response_s = slow_response_s
+        self._backoff_cooldown_s = backoff_cooldown_s
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._slot_freed = asyncio.Condition()
+
+        # Start with a full bucket, so a cold start isn't artificially slow
+        self._tokens = max_rate
+        self._last_refill = time.monotonic()
+        self._bucket_lock = asyncio.Lock()
+
+        self._last_backoff = float("-inf")
+        self._completed: Deque[float] = deque()
+        self._last_logged = float("-inf")
+
+    @property
+    def limit(self) -> int:
+        """
+        How many requests can be in flight to this host right now
+        """
+        return int(self._limit)
+
+    @property
+    def observed_rate(self) -> float:
+        """
+        Requests completed per second, over the last few seconds
+        """
+        self._drop_old_completions(time.monotonic())
+        return len(self._completed) / _RATE_WINDOW_S
+
+    @property
+    def stats(self) -> ThrottleStats:
+        return ThrottleStats(
+            host=self._host,
+            limit=self.limit,
+            in_flight=self._in_flight,
+            observed_rate=self.observed_rate,
+        )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one of this host's request slots for the length of the block
+        """
+        async with self._slot_freed:
+            await self._slot_freed.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        try:
+            await self._take_token()
+            yield
+        finally:
+            async with self._slot_freed:
+                self._in_flight -= 1
+                self._slot_freed.notify_all()
+
+    def record_response(self, elapsed_s: float) -> None:
+        """
+        The host answered (even if it was with a 404) after `elapsed_s`
+        seconds. Only fast responses earn more concurrency.
+        """
+        now = time.monotonic()
+        self._completed.append(now)
+        self._drop_old_completions(now)
+        if elapsed_s < self._slow_response_s:
+            self._set_limit(self._limit + 1 / self._limit)
+        if now - self._last_logged >= _RATE_WINDOW_S:
+            self._last_logged = now
+            logger.debug(
+                "Throttling %s: limit %d, %d in flight, observed %.1f requests/s",
+                self._host,
+                self.limit,
+                self._in_flight,
+                self.observed_rate,
+            )
+
+    def record_backoff(self) -> None:
+        """
+        The host pushed back, so halve the concurrency.
+
+        Everything already in flight was sent at the old limit, and it tends
+        to fail together, so only back off once per cooldown rather than
+        once per failure.
+        """
+        now = time.monotonic()
+        if now - self._last_backoff < self._backoff_cooldown_s:
+            return
+        self._last_backoff = now
+        self._set_limit(self._limit / 2)
+        logger.warning(
+            "Backing off %s: limit now %d, observed %.1f requests/s",
+            self._host,
+            self.limit,
+            self.observed_rate,
+        )
+
+    def _set_limit(self, limit: float) -> None:
+        self._limit = min(max(limit, self._min_limit), self._max_limit)
+
+    async def _take_token(self) -> None:
+        # The lock makes waiters take tokens in the order they showed up
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._max_rate,
+                    self._tokens + (now - self._last_refill) * self._max_rate,
+                )
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._max_rate)
+
+    def _drop_old_completions(self, now: float) -> None:
+        while self._completed and now - self._completed[0] > _RATE_WINDOW_S:
+            self._completed.popleft()
+
+
+class HostThrottles:
+    """
+    One `HostThrottle` per host, made the first time a host is asked for.
+
+    Throttles wait on asyncio primitives, which belong to the event loop
+    they're first used in, so they start over on each new loop.
+    """
+
+    def __init__(self) -> None:
+        self._throttles: Dict[str, HostThrottle] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def for_host(self, host: str) -> HostThrottle:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._throttles = {}
+            self._loop = loop
+        if host not in self._throttles:
+            self._throttles[host] = HostThrottle(host, CONFIG.max_requests_per_s)
+        return self._throttles[host]
+
+    @property
+    def stats(self) -> list[ThrottleStats]:
+        return [throttle.stats for throttle in self._throttles.values()]
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from .throttle import HostThrottle
+
+
+def _throttle(**kwargs) -> HostThrottle:
+    # Plenty of tokens, so only the concurrency limit matters
+    return HostThrottle("example.com", max_rate=1000, **kwargs)
+
+
+def test_fast_responses_ramp_the_limit_up() -> None:
+    throttle = _throttle(initial_limit=4)
+
+    # About one more slot per `limit` fast responses
+    for _ in range(5):
+        throttle.record_response(0.1)
+
+    assert throttle.limit == 5
+
+
+def test_slow_responses_dont_ramp_the_limit_up() -> None:
+    throttle = _throttle(initial_limit=4, slow_response_s=1)
+
+    for _ in range(20):
+        throttle.record_response(5)
+
+    assert throttle.limit == 4
+
+
+def test_limit_is_capped() -> None:
+    throttle = _throttle(initial_limit=4, max_limit=6)
+
+    for _ in range(100):
+        throttle.record_response(0.1)
+
+    assert throttle.limit == 6
+
+
+def test_backoff_halves_the_limit() -> None:
+    throttle = _throttle(initial_limit=10, backoff_cooldown_s=0)
+
+    throttle.record_backoff()
+    assert throttle.limit == 5
+    throttle.record_backoff()
+    throttle.record_backoff()
+    throttle.record_backoff()
+    assert throttle.limit == 1
+
+
+def test_backoff_only_once_per_cooldown() -> None:
+    """A burst of failures from requests sent at the old limit only counts once"""
+    throttle = _throttle(initial_limit=10, backoff_cooldown_s=60)
+
+    for _ in range(5):
+        throttle.record_backoff()
+
+    assert throttle.limit == 5
+
+
+async def test_slot_respects_the_limit() -> None:
+    throttle = _throttle(initial_limit=2)
+    in_flight = 0
+    most_in_flight = 0
+
+    async def _request() -> None:
+        nonlocal in_flight, most_in_flight
+        async with throttle.slot():
+            in_flight += 1
+            most_in_flight = max(most_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    await asyncio.gather(*(_request() for _ in range(10)))
+
+    assert most_in_flight == 2
+    assert throttle.stats.in_flight == 0
+
+
+async def test_token_bucket_caps_the_rate() -> None:
+    throttle = HostThrottle("example.com", max_rate=50, initial_limit=30)
+
+    async def _request() -> None:
+        async with throttle.slot():
+            pass
+
+    start = time.monotonic()
+    # The first 50 come out of the full bucket, the next 25 take half a second
+    await asyncio.gather(*(_request() for _ in range(75)))
+
+    assert time.monotonic() - start >= 0.45
+
+
+def test_observed_rate() -> None:
+    throttle = _throttle()
+
+    for _ in range(30):
+        throttle.record_response(0.1)
+
+    assert throttle.observed_rate == 3.0
+
+
+def test_stats_are_logged_once_per_window(caplog: pytest.LogCaptureFixture) -> None:
+    throttle = _throttle(initial_limit=4)
+
+    with caplog.at_level(logging.DEBUG, logger="endgame.throttle"):
+        for _ in range(5):
+            throttle.record_response(0.1)
+
+    (record,) = caplog.records
+    assert record.getMessage() == (
+        "Throttling example.com: limit 4, 0 in flight, observed 0.1 requests/s"
+    )
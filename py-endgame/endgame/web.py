@@ -1,19 +1,54 @@
 import asyncio
-import random
-import re
+import time
+from collections.abc import Coroutine
+from enum import Enum
+from functools import wraps
 from logging import getLogger
-from pathlib import Path
-from typing import Dict, Optional, Union
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    NamedTuple,
+    Optional,
+    TypeVar,
+)
+from urllib.parse import urlsplit
 
-import aiofiles
 import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
 
+from .cassette import (
+    Cassette,
+    HttpMode,
+    Recording,
+    close_replay_server,
+    replay_url,
+)
 from .config import CONFIG
+from .retry import Retrier, RetryStats
+from .scheduler import get_scheduler
+from .throttle import HostThrottles, ThrottleStats
+from .web_cache import (
+    MissingReason,
+    RequestParameters,
+    WebCache,
+    cache_key,
+    flush_caches,
+    normalize_request,
+)
 
 logger = getLogger(__name__)
 
 
-RequestParameters = Optional[Dict[str, Union[str, int]]]
+# Connection pool for the shared session. A backfill makes tens of thousands
+# of requests to a handful of hosts, so keep connections (and DNS answers)
+# around between them rather than paying for a new handshake every time.
+_MAX_CONNECTIONS = 100
+_MAX_CONNECTIONS_PER_HOST = 30
+_DNS_CACHE_TTL_S = 300
+_KEEPALIVE_TIMEOUT_S = 30
 
 
 class CacheableContent:
@@ -23,9 +58,11 @@ class CacheableContent:
     business logic happens on the result.
     """
 
-    def __init__(self, data: bytes, save_location: str):
+    def __init__(self, data: bytes, cache: WebCache, key: str, request: str):
         self._data = data
-        self._save_location = save_location
+        self._cache = cache
+        self._key = key
+        self._request = request
 
     @property
     def data(self) -> bytes:
@@ -39,80 +76,328 @@ class CacheableContent:
         Save this cacheable content,
         if it's not already on disk
         """
-        # Don't save if it's already there
-        save_path = Path(self._save_location)
-        if save_path.is_file():
-            return
+        await self._cache.write(self._key, self._data, self._request)
 
-        save_path.parent.mkdir(parents=True, exist_ok=True)
-        async with aiofiles.open(self._save_location, "wb") as file:
-            await file.write(self._data)
+    async def mark_empty(self):
+        """
+        Remember that there's nothing in this content, and never will be,
+        so later `get`s for it raise `KnownEmptyError` without fetching it
+        """
+        self._cache.record_missing(self._key, self._request, MissingReason.empty)
+
+
+class KnownNotFoundError(aiohttp.ClientResponseError):
+    """
+    A 404 that was remembered from an earlier fetch, rather than fetched again.
+    A `ClientResponseError`, so it's handled like the real thing.
+    """
+
+
+class KnownEmptyError(Exception):
+    """
+    Content that a parser already said has nothing in it.
+    See `CacheableContent.mark_empty`
+    """
+
+
+class EmptyPage(Enum):
+    """
+    What a parser returns for a page that's declared empty for good
+    (ex: a forfeit's box score). Only those get `mark_empty`ed: a page
+    that just didn't parse might be a layout change, or not be ready
+    yet, and should be fetched again next time.
+    """
+
+    EMPTY = "empty"
+
+
+class FetchStats(NamedTuple):
+    """
+    How many `get`s did their own fetch, and how many
+    shared one that was already in flight for the same request
+    """
+
+    started: int
+    coalesced: int
+
+
+class _InFlight:
+    """
+    Fetches that are currently running, so that everyone asking for
+    the same request at the same time waits on one fetch.
+    """
+
+    def __init__(self) -> None:
+        self._fetches: Dict[str, asyncio.Future[CacheableContent]] = {}
+        self._started = 0
+        self._coalesced = 0
+
+    @property
+    def stats(self) -> FetchStats:
+        return FetchStats(started=self._started, coalesced=self._coalesced)
+
+    async def get(
+        self, key: str, fetch: Callable[[], Awaitable[CacheableContent]]
+    ) -> CacheableContent:
+        if key in self._fetches:
+            self._coalesced += 1
+        else:
+            self._started += 1
+            fetch_task = asyncio.ensure_future(fetch())
+            self._fetches[key] = fetch_task
+            fetch_task.add_done_callback(lambda _: self._fetches.pop(key, None))
+        # Shielded, so one caller getting cancelled doesn't cancel
+        # the fetch out from under everyone else waiting on it.
+        return await asyncio.shield(self._fetches[key])
+
+
+_IN_FLIGHT = _InFlight()
+
+
+def fetch_stats() -> FetchStats:
+    """
+    How many requests `get` has made, and how many it saved by coalescing
+    """
+    return _IN_FLIGHT.stats
 
 
 async def get(url: str, parameters: RequestParameters = None) -> CacheableContent:
     """
     HTTP GET something, checking a cache of local files first.
+    Where "something" comes from depends on `CONFIG.http_mode`
+    (see `cassette.HttpMode`).
+
+    Concurrent calls for the same request share one fetch,
+    and get back the same `CacheableContent`.
+
+    Requests that recently 404'd raise `KnownNotFoundError`, and ones whose
+    content was marked empty raise `KnownEmptyError`, both without a fetch.
     """
-    param_string = _build_param_string(parameters)
-    cache_path = re.sub("[:/\\.]", "", url + param_string)
-    cache_file = Path(CONFIG.cache_dir, "web", cache_path)
-    if cache_file.is_file():
-        # read it
-        async with aiofiles.open(str(cache_file), "rb") as file:
-            content = await file.read()
-    else:
-        content = await _get_with_retries(url, parameters)
-    return CacheableContent(content, str(cache_file))
+    key = cache_key(url, parameters)
+    return await _IN_FLIGHT.get(key, lambda: _get(url, parameters, key))
+
+
+async def is_cached(url: str, parameters: RequestParameters = None) -> bool:
+    """
+    Whether a request's response is in the cache
+    """
+    return await WebCache.default().is_cached(cache_key(url, parameters))
+
+
+async def _get(url: str, parameters: RequestParameters, key: str) -> CacheableContent:
+    cache = WebCache.default()
+    request = normalize_request(url, parameters)
+    recording = HttpMode(CONFIG.http_mode) == HttpMode.record
+    # Recording always fetches, so everything asked for ends up on the cassette
+    content = None if recording else await _read_cache(cache, key, url, request)
+    if content is None:
+        try:
+            content = await _get_with_retries(url, parameters)
+        except aiohttp.ClientResponseError as error:
+            if error.status == 404:
+                cache.record_missing(key, request, MissingReason.not_found)
+                if recording:
+                    await _record(key, Recording(request, 404, b""))
+            raise
+        if recording:
+            await _record(key, Recording(request, 200, content))
+        cache.record_fetch(key, content, request)
+    return CacheableContent(content, cache, key, request)
+
+
+async def _read_cache(
+    cache: WebCache, key: str, url: str, request: str
+) -> Optional[bytes]:
+    lookup = await cache.lookup(key, request)
+    if lookup.missing == MissingReason.not_found:
+        raise _known_not_found(url, request)
+    if lookup.missing == MissingReason.empty:
+        raise KnownEmptyError(request)
+    return lookup.data
+
+
+async def _record(key: str, recording: Recording) -> None:
+    await asyncio.to_thread(Cassette.default().record, key, recording)
+
+
+def _known_not_found(url: str, request: str) -> KnownNotFoundError:
+    request_info = aiohttp.RequestInfo(
+        URL(request), "GET", CIMultiDictProxy(CIMultiDict()), URL(url)
+    )
+    return KnownNotFoundError(
+        request_info, (), status=404, message="Not Found (remembered)"
+    )
 
 
 async def _get_with_retries(url: str, parameters: RequestParameters) -> bytes:
-    max_retries = 5
-    for i in range(max_retries):
+    param_string = _build_param_string(parameters)
+    full_url = f"{url}?{param_string}" if param_string else url
+    return await _RETRIER.call(
+        urlsplit(url).netloc, lambda: _get_web(url, parameters), full_url
+    )
+
+
+_RETRIER = Retrier()
+
+
+def retry_stats() -> list[RetryStats]:
+    """
+    How many retries, failures and timeouts each host has had this run,
+    for logging
+    """
+    return _RETRIER.stats
+
+
+async def _get_web(url: str, parameters: RequestParameters) -> bytes:
+    if HttpMode(CONFIG.http_mode) == HttpMode.replay:
+        # Served from a cassette, so there's no host to throttle for
+        url, parameters = await replay_url(cache_key(url, parameters)), None
+        async with get_scheduler().requests.slot():
+            return await _fetch(url, parameters)
+    throttle = _THROTTLES.for_host(urlsplit(url).netloc)
+    # This host's slot first, then the process-wide one, so a request
+    # waiting on its host's rate limit doesn't hold up other hosts'
+    async with throttle.slot(), get_scheduler().requests.slot():
+        start = time.monotonic()
         try:
-            return await _get_web(url, parameters)
+            content = await _fetch(url, parameters)
+        except aiohttp.ClientResponseError as error:
+            if _is_pushback(error):
+                throttle.record_backoff()
+            else:
+                throttle.record_response(time.monotonic() - start)
+            raise
         except (
-            aiohttp.ClientResponseError,
-            aiohttp.ClientConnectorError,
-            aiohttp.ClientPayloadError,
             aiohttp.ServerDisconnectedError,
-        ) as error:
-            if i + 1 == max_retries:
-                raise error
-            # Exponential backoff w/ +/- 10% jitter
-            sleep_duration_s = (0.95 + 0.1 * random.random()) * ((i + 1) ** 2)
-            param_string = _build_param_string(parameters)
-            full_url = f"{url}?{param_string}" if param_string else url
-            logger.warning(
-                "Struggling to get %s. Error: %s. Attempt %d. Sleeping for %.02f",
-                full_url,
-                _get_error_message(error),
-                i + 1,
-                sleep_duration_s,
-            )
-            await asyncio.sleep(sleep_duration_s)
-    raise Exception("Should never reach here, this is just for mypy")
+            aiohttp.ClientOSError,
+            aiohttp.ServerTimeoutError,
+        ):
+            throttle.record_backoff()
+            raise
+        throttle.record_response(time.monotonic() - start)
+        return content
 
 
-def _get_error_message(
-    error: Union[
-        aiohttp.ClientResponseError,
-        aiohttp.ClientConnectorError,
-        aiohttp.ClientPayloadError,
-        aiohttp.ServerDisconnectedError,
-    ],
-) -> str:
-    if isinstance(error, aiohttp.ClientResponseError):
-        return f"Status code: {error.status}"
-    return str(error)
+async def _fetch(url: str, parameters: RequestParameters) -> bytes:
+    async with get_session().get(
+        url, params=parameters, raise_for_status=True
+    ) as response:
+        return await response.read()
 
 
-async def _get_web(url: str, parameters: RequestParameters) -> bytes:
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-            url, params=parameters, raise_for_status=True
-        ) as response:
-            return await response.read()
+def _is_pushback(error: aiohttp.ClientResponseError) -> bool:
+    """
+    Whether an error status means the host wants us to slow down
+    """
+    return error.status == 429 or error.status >= 500
+
+
+_THROTTLES = HostThrottles()
+
+
+def throttle_stats() -> list[ThrottleStats]:
+    """
+    How hard we're currently hitting each host, for logging
+    """
+    return _THROTTLES.stats
 
 
 def _build_param_string(parameters: RequestParameters) -> str:
     return "&".join([f"{k}={v}" for k, v in parameters.items()]) if parameters else ""
+
+
+class _SessionManager:
+    """
+    Holds the one aiohttp session the process shares.
+
+    A session belongs to the event loop it was made in, and the CLI runs
+    a few `asyncio.run`s back to back, so a new one gets made whenever the
+    running loop isn't the one the current session was made in.
+    """
+
+    def __init__(self) -> None:
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=_MAX_CONNECTIONS,
+                limit_per_host=_MAX_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=_DNS_CACHE_TTL_S,
+                keepalive_timeout=_KEEPALIVE_TIMEOUT_S,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=_RETRIER.policy.timeout
+            )
+            self._loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+_SESSIONS = _SessionManager()
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    The HTTP session shared by everything in this process.
+    Made the first time it's asked for on each event loop.
+    """
+    return _SESSIONS.get()
+
+
+async def close_session() -> None:
+    """
+    Close the shared HTTP session, if there is one.
+    Call this before the event loop it was made in goes away.
+    """
+    await _SESSIONS.close()
+
+
+async def _shut_down() -> None:
+    await close_session()
+    await close_replay_server()
+    flush_caches()
+
+
+_ReturnType = TypeVar("_ReturnType")
+
+
+def closes_session(
+    function: Callable[..., Coroutine[Any, Any, _ReturnType]],
+) -> Callable[..., Coroutine[Any, Any, _ReturnType]]:
+    """
+    Decorate an async entrypoint so the shared HTTP session
+    gets closed (and the web cache's index written) when it finishes,
+    however it finishes.
+    """
+
+    @wraps(function)
+    async def _wrapped(*args, **kwargs) -> _ReturnType:
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            await _shut_down()
+
+    return _wrapped
+
+
+def run(main: Coroutine[Any, Any, _ReturnType]) -> _ReturnType:
+    """
+    `asyncio.run`, but closes the shared HTTP session (and writes the web
+    cache's index) before the loop closes.
+    """
+
+    async def _main() -> _ReturnType:
+        try:
+            return await main
+        finally:
+            await _shut_down()
+
+    return asyncio.run(_main())
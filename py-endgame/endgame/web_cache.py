@@ -0,0 +1,434 @@
+"""
+The on-disk cache of raw HTTP responses
+"""
+
+import asyncio
+import atexit
+import gzip
+import hashlib
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from enum import Enum
+from functools import partial
+from logging import getLogger
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiofiles
+
+from .config import CONFIG
+from .web_cache_index import IndexEntry, IndexStats, MissingEntry, WebCacheIndex
+
+logger = getLogger(__name__)
+
+
+RequestParameters = Optional[Dict[str, Union[str, int]]]
+
+
+class _Codec(NamedTuple):
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+# Keyed by the file extension, which is how each entry records its codec.
+# Only gzip for now, since it's in the standard library. Level 6 (zlib's
+# default) rather than gzip's 9, which is several times slower for pages
+# a few percent smaller.
+_CODECS: Dict[str, _Codec] = {
+    "gz": _Codec(partial(gzip.compress, compresslevel=6), gzip.decompress),
+}
+_WRITE_CODEC = "gz"
+
+
+class MissingReason(Enum):
+    """
+    Why a request is remembered as having nothing worth fetching
+    """
+
+    # The server said so
+    not_found = "not_found"
+    # A parser looked at what came back and said there's nothing in it
+    # that's ever going to show up (ex: a forfeit's box score)
+    empty = "empty"
+
+    @property
+    def ttl_s(self) -> float:
+        days = {
+            MissingReason.not_found: CONFIG.not_found_ttl_days,
+            MissingReason.empty: CONFIG.empty_page_ttl_days,
+        }[self]
+        return days * 24 * 60 * 60
+
+
+def normalize_request(url: str, parameters: RequestParameters) -> str:
+    """
+    A string that's the same for any two spellings of the same request:
+    scheme and host lowercased, and the query (from the URL and
+    `parameters` combined) sorted.
+    """
+    scheme, netloc, path, query, _ = urlsplit(url)
+    query_items = parse_qsl(query, keep_blank_values=True)
+    query_items += [(k, str(v)) for k, v in (parameters or {}).items()]
+    return urlunsplit(
+        (scheme.lower(), netloc.lower(), path, urlencode(sorted(query_items)), "")
+    )
+
+
+def cache_key(url: str, parameters: RequestParameters) -> str:
+    """
+    The key a request's response is cached under
+    """
+    return hashlib.sha256(normalize_request(url, parameters).encode()).hexdigest()
+
+
+class CacheLookup(NamedTuple):
+    """
+    What the cache has for a request
+    """
+
+    # See `WebCache.known_missing`
+    missing: Optional[MissingReason]
+    # See `WebCache.read`
+    data: Optional[bytes]
+
+
+class _Found(NamedTuple):
+    entry: Optional[IndexEntry]
+    missing: Optional[MissingEntry]
+    data: Optional[bytes]
+    # An entry for a response that was on disk but not in the index
+    recovered: Optional[IndexEntry]
+
+
+class WebCache:
+    """
+    Responses stored by the hash of their request, fanned out two
+    directories deep (`ab/cd/abcd...`) so no one directory gets huge,
+    and compressed.
+
+    What's in the cache is tracked in a SQLite index next to it,
+    so checking for an entry is a query rather than a stat.
+    """
+
+    def __init__(self, root: Path):
+        self._root = root
+        self._index = WebCacheIndex(root / "index.sqlite3")
+
+    @classmethod
+    def default(cls) -> "WebCache":
+        """
+        The cache under `CONFIG.cache_dir`.
+        There's one of these per directory, so they share an index.
+        """
+        root = Path(CONFIG.cache_dir, "web_v2")
+        if root not in _CACHES:
+            _CACHES[root] = cls(root)
+        return _CACHES[root]
+
+    async def read(self, key: str, request: Optional[str] = None) -> Optional[bytes]:
+        """
+        Get a cached response, or None if it's not cached.
+        Given the `request`, a response that's on disk but not in the
+        index (ex: the process was killed before the index was written)
+        is found and put back in the index.
+        """
+        return (await self.lookup(key, request)).data
+
+    async def lookup(self, key: str, request: Optional[str] = None) -> CacheLookup:
+        """
+        `known_missing` and `read` together: one query, and one file read,
+        in one trip to a thread rather than querying on the event loop
+        """
+        now = time.time()
+        found = await asyncio.to_thread(self._lookup, key, request)
+        missing = found.missing
+        if missing is not None and missing.expires_at < now:
+            self._index.remove_missing([key])
+            missing = None
+        if found.recovered is not None:
+            self._index.record(found.recovered)
+        elif found.data is None and found.entry is not None and found.entry.final:
+            # Deleted out from under the index
+            self._index.remove([key])
+        return CacheLookup(
+            None if missing is None else MissingReason(missing.reason), found.data
+        )
+
+    def _lookup(self, key: str, request: Optional[str]) -> _Found:
+        entry, missing = self._index.lookup(key)
+        if entry is None:
+            recovered = None if request is None else self._recover(key, request)
+            if recovered is None:
+                return _Found(None, missing, None, None)
+            return _Found(None, missing, recovered[1], recovered[0])
+        if not entry.final or entry.codec is None:
+            return _Found(entry, missing, None, None)
+        return _Found(entry, missing, self._read(key, entry.codec), None)
+
+    def _read(self, key: str, codec: str) -> Optional[bytes]:
+        try:
+            compressed = self._path(key, codec).read_bytes()
+        except FileNotFoundError:
+            return None
+        return _CODECS[codec].decompress(compressed)
+
+    def _recover(self, key: str, request: str) -> Optional[Tuple[IndexEntry, bytes]]:
+        path = self._path(key, _WRITE_CODEC)
+        try:
+            fetched_at = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        data = self._read(key, _WRITE_CODEC)
+        if data is None:
+            return None
+        return _index_entry(key, data, request, _WRITE_CODEC, fetched_at), data
+
+    def contains(self, key: str) -> bool:
+        entry = self._index.get(key)
+        return entry is not None and entry.final
+
+    async def is_cached(self, key: str) -> bool:
+        """
+        `contains`, queried in a thread rather than on the event loop
+        """
+        entry, _ = await asyncio.to_thread(self._index.lookup, key)
+        return entry is not None and entry.final
+
+    def known_missing(self, key: str) -> Optional[MissingReason]:
+        """
+        Why a request is known to have nothing worth fetching,
+        or None if it's not (or it was, but that's expired)
+        """
+        entry = self._index.get_missing(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.time():
+            self._index.remove_missing([key])
+            return None
+        return MissingReason(entry.reason)
+
+    def record_missing(self, key: str, request: str, reason: MissingReason) -> None:
+        """
+        Remember that a request has nothing worth fetching,
+        for as long as `CONFIG` says to remember that kind of thing
+        """
+        now = time.time()
+        self._index.record_missing(
+            MissingEntry(key, request, reason.value, now, now + reason.ttl_s)
+        )
+
+    def missing_entries(self) -> List[MissingEntry]:
+        """
+        Everything known to be missing, most recently recorded first
+        """
+        return self._index.missing_entries()
+
+    async def write(
+        self, key: str, data: bytes, request: str, fetched_at: Optional[float] = None
+    ) -> None:
+        """
+        Cache a response, unless it's already cached.
+        `fetched_at` (seconds since the epoch) defaults to now.
+        """
+        if self.contains(key):
+            return
+        # One trip to a thread for the compress, hash and write,
+        # since they're slow enough to hold up the event loop
+        entry = await asyncio.to_thread(self._write, key, data, request, fetched_at)
+        if self._index.get_missing(key) is not None:
+            # It's shown up since
+            self._index.remove_missing([key])
+        self._index.record(entry)
+
+    def _write(
+        self, key: str, data: bytes, request: str, fetched_at: Optional[float]
+    ) -> IndexEntry:
+        path = self._path(key, _WRITE_CODEC)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write somewhere else and move it into place, so a reader
+        # never sees a half-written entry. Somewhere of its own, since
+        # everyone sharing a coalesced fetch might save it at once.
+        partial_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.partial")
+        partial_path.write_bytes(_CODECS[_WRITE_CODEC].compress(data))
+        os.replace(partial_path, path)
+        return _index_entry(key, data, request, _WRITE_CODEC, fetched_at)
+
+    def record_fetch(self, key: str, data: bytes, request: str) -> None:
+        """
+        Note that a response was fetched, without caching it (yet)
+        """
+        if not self.contains(key):
+            self._index.record(_index_entry(key, data, request, None, None))
+
+    def stats(self) -> IndexStats:
+        return self._index.stats()
+
+    def entries(self, fetched_before: Optional[datetime] = None) -> List[IndexEntry]:
+        """
+        Everything in the index (cached or not), oldest first
+        """
+        return self._index.entries(
+            None if fetched_before is None else fetched_before.timestamp()
+        )
+
+    def evict(self, fetched_before: datetime) -> int:
+        """
+        Drop everything fetched before some time.
+        Returns how many cached responses were deleted.
+        """
+        entries = self.entries(fetched_before)
+        n_deleted = 0
+        for entry in entries:
+            if entry.codec is not None:
+                self._path(entry.key, entry.codec).unlink(missing_ok=True)
+                n_deleted += 1
+        self._index.remove([entry.key for entry in entries])
+        return n_deleted
+
+    def flush(self) -> None:
+        """
+        Write any index updates that are still batched up
+        """
+        self._index.flush()
+
+    def _path(self, key: str, extension: str) -> Path:
+        return self._root / key[:2] / key[2:4] / f"{key}.{extension}"
+
+
+_CACHES: Dict[Path, WebCache] = {}
+
+
+def flush_caches() -> None:
+    """
+    Write every cache's batched-up index updates
+    """
+    for cache in _CACHES.values():
+        cache.flush()
+
+
+# For anything that exits without going through `web.run`. A hard kill
+# still loses the last batch, which `WebCache.read` finds again on disk.
+atexit.register(flush_caches)
+
+
+def _index_entry(
+    key: str,
+    data: bytes,
+    request: str,
+    codec: Optional[str],
+    fetched_at: Optional[float],
+) -> IndexEntry:
+    return IndexEntry(
+        key=key,
+        request=request,
+        fetched_at=time.time() if fetched_at is None else fetched_at,
+        size=len(data),
+        content_hash=hashlib.sha256(data).hexdigest(),
+        final=codec is not None,
+        codec=codec,
+    )
+
+
+# What the old flat cache's filenames look like, for every URL we've ever
+# cached. The old names are the URL and parameters with `:`, `/` and `.`
+# stripped out, so the URL can't be recovered in general -- just for the
+# shapes we know about. Each pattern maps a name back to (url, parameters).
+_LegacyPattern = Tuple[re.Pattern, Callable[[re.Match], Tuple[str, str]]]
+_LEGACY_PATTERNS: list[_LegacyPattern] = [
+    (
+        re.compile(
+            r"^httpssiteapiespncomapissitev2sports"
+            r"(basketball|football)(.+?)scoreboard(.*)$"
+        ),
+        lambda m: (
+            f"https://site.api.espn.com/apis/site/v2/sports/{m[1]}/{m[2]}/scoreboard",
+            m[3],
+        ),
+    ),
+    (
+        re.compile(
+            r"^httpswwwespncom((?:mens|womens)-college-basketball)"
+            r"(boxscore|matchup)\?gameId=(\d+)$"
+        ),
+        lambda m: (f"https://www.espn.com/{m[1]}/{m[2]}?gameId={m[3]}", ""),
+    ),
+    (
+        re.compile(r"^httpwwwfootballlockscomnfl_point_spreads_(\w+)shtml$"),
+        lambda m: (f"http://www.footballlocks.com/nfl_point_spreads_{m[1]}.shtml", ""),
+    ),
+    (
+        re.compile(r"^httpswwwpro-football-referencecomyears(\d+)coacheshtm$"),
+        lambda m: (
+            f"https://www.pro-football-reference.com/years/{m[1]}/coaches.htm",
+            "",
+        ),
+    ),
+]
+
+
+def _parse_legacy_name(name: str) -> Optional[Tuple[str, RequestParameters]]:
+    for pattern, to_request in _LEGACY_PATTERNS:
+        if match := pattern.match(name):
+            url, param_string = to_request(match)
+            parameters: RequestParameters = dict(
+                parse_qsl(param_string, keep_blank_values=True)
+            )
+            return url, parameters
+    return None
+
+
+class MigrationResult(NamedTuple):
+    """
+    What happened to each entry of the old flat cache
+    """
+
+    migrated: int
+    already_there: int
+    unrecognized: list[str]
+
+
+async def migrate_legacy_cache(
+    legacy_root: Path, cache: WebCache, dry_run: bool = True
+) -> MigrationResult:
+    """
+    Move the old flat cache (one uncompressed file per response, all in
+    `legacy_root`) into `cache`.
+
+    Entries are deleted from the old cache once they're in the new one.
+    Anything whose name doesn't look like a URL we know how to rebuild
+    is left where it is, and listed in the result.
+    """
+    migrated, already_there, unrecognized = 0, 0, []
+    for legacy_file in legacy_root.iterdir():
+        if not legacy_file.is_file():
+            continue
+        request = _parse_legacy_name(legacy_file.name)
+        if request is None:
+            unrecognized.append(legacy_file.name)
+            continue
+        url, parameters = request
+        key = cache_key(url, parameters)
+        if cache.contains(key):
+            already_there += 1
+        else:
+            migrated += 1
+            if not dry_run:
+                async with aiofiles.open(legacy_file, "rb") as file:
+                    data = await file.read()
+                await cache.write(
+                    key,
+                    data,
+                    normalize_request(url, parameters),
+                    # The closest thing the old cache has to a fetch time
+                    fetched_at=legacy_file.stat().st_mtime,
+                )
+        if not dry_run:
+            legacy_file.unlink()
+        if (migrated + already_there) % 10_000 == 0:
+            logger.info("Migrated %d entries so far", migrated + already_there)
+    cache.flush()
+    return MigrationResult(migrated, already_there, unrecognized)
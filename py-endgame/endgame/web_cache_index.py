@@ -0,0 +1,271 @@
+"""
+A SQLite index of what's in the web cache
+"""
+
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Rows are written in batches, so a few hundred concurrent fetches
+# don't each wait on their own commit.
+_FLUSH_EVERY = 200
+_FLUSH_AFTER_S = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    request TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    final INTEGER NOT NULL,
+    codec TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_fetched_at ON entries (fetched_at);
+CREATE TABLE IF NOT EXISTS missing (
+    key TEXT PRIMARY KEY,
+    request TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class IndexEntry(NamedTuple):
+    """
+    What the index knows about one cached (or just fetched) response
+    """
+
+    key: str
+    # The normalized request, see `web_cache.normalize_request`
+    request: str
+    # Seconds since the epoch
+    fetched_at: float
+    # Uncompressed
+    size: int
+    content_hash: str
+    # Final responses are saved in the cache. Provisional ones were
+    # fetched, but the caller decided they might still change
+    # (ex: a day whose games weren't all done), so only the metadata is kept.
+    final: bool
+    # How the saved response is compressed, if it's saved
+    codec: Optional[str]
+
+
+class MissingEntry(NamedTuple):
+    """
+    A request that's known not to have anything worth fetching
+    """
+
+    key: str
+    request: str
+    # See `web_cache.MissingReason`
+    reason: str
+    # Both in seconds since the epoch
+    recorded_at: float
+    expires_at: float
+
+
+class IndexStats(NamedTuple):
+    """
+    Totals over everything in the index
+    """
+
+    final_entries: int
+    final_bytes: int
+    provisional_entries: int
+    missing_entries: int
+    oldest: Optional[datetime]
+    newest: Optional[datetime]
+
+
+class WebCacheIndex:
+    """
+    Metadata for every entry in a `WebCache`, in a SQLite database
+    next to it.
+
+    Lookups read what hasn't been written yet too, so batching
+    never makes a fresh entry look missing.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        # Lets other processes read the index while this one writes it
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+        # For `lookup`, which runs off the event loop. WAL lets it read
+        # without waiting on a batch that's being written.
+        self._lookup_connection = sqlite3.connect(path, check_same_thread=False)
+        self._lookup_lock = threading.Lock()
+        self._pending: Dict[str, IndexEntry] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def lookup(self, key: str) -> Tuple[Optional[IndexEntry], Optional[MissingEntry]]:
+        """
+        `get` and `get_missing` in one query. Safe to call from any thread
+        (ex: `asyncio.to_thread`), since it has a connection of its own.
+        """
+        with self._lookup_lock:
+            rows = self._lookup_connection.execute(
+                """
+                SELECT 'entry', * FROM entries WHERE key = ?
+                UNION ALL
+                SELECT 'missing', *, NULL, NULL FROM missing WHERE key = ?
+                """,
+                (key, key),
+            ).fetchall()
+        entry = self._pending.get(key)
+        missing = None
+        for table, *row in rows:
+            if table == "missing":
+                missing = MissingEntry(*row[:5])
+            elif entry is None:
+                entry = _to_entry(tuple(row))
+        return entry, missing
+
+    def get(self, key: str) -> Optional[IndexEntry]:
+        if key in self._pending:
+            return self._pending[key]
+        row = self._connection.execute(
+            "SELECT * FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        return None if row is None else _to_entry(row)
+
+    def record(self, entry: IndexEntry) -> None:
+        """
+        Add or replace an entry. It's written with the next batch.
+        """
+        self._pending[entry.key] = entry
+        if len(self._pending) >= _FLUSH_EVERY:
+            self.flush()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Nothing to schedule a flush on, so don't wait for one
+            self.flush()
+            return
+        # A flush scheduled on a loop that's since gone away will never run
+        if self._flush_handle is None or self._flush_loop is not loop:
+            self._flush_handle = loop.call_later(_FLUSH_AFTER_S, self.flush)
+            self._flush_loop = loop
+
+    def remove(self, keys: List[str]) -> None:
+        self.flush()
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM entries WHERE key = ?", [(k,) for k in keys]
+            )
+
+    def get_missing(self, key: str) -> Optional[MissingEntry]:
+        row = self._connection.execute(
+            "SELECT * FROM missing WHERE key = ?", (key,)
+        ).fetchone()
+        return None if row is None else MissingEntry(*row)
+
+    def record_missing(self, entry: MissingEntry) -> None:
+        """
+        Add or replace a missing entry. These are rare enough
+        to write right away, rather than batching.
+        """
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO missing VALUES (?, ?, ?, ?, ?)", entry
+            )
+
+    def remove_missing(self, keys: List[str]) -> None:
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM missing WHERE key = ?", [(k,) for k in keys]
+            )
+
+    def missing_entries(self) -> List[MissingEntry]:
+        """
+        Every missing entry (expired or not), most recently recorded first
+        """
+        cursor = self._connection.execute(
+            "SELECT * FROM missing ORDER BY recorded_at DESC"
+        )
+        return [MissingEntry(*row) for row in cursor]
+
+    def flush(self) -> None:
+        """
+        Write everything that's waiting to be written
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                list(self._pending.values()),
+            )
+        self._pending = {}
+
+    def entries(self, fetched_before: Optional[float] = None) -> List[IndexEntry]:
+        """
+        Every entry, oldest first.
+        Pass `fetched_before` (seconds since the epoch) to only get older ones.
+        """
+        self.flush()
+        if fetched_before is None:
+            cursor = self._connection.execute(
+                "SELECT * FROM entries ORDER BY fetched_at"
+            )
+        else:
+            cursor = self._connection.execute(
+                "SELECT * FROM entries WHERE fetched_at < ? ORDER BY fetched_at",
+                (fetched_before,),
+            )
+        return [_to_entry(row) for row in cursor]
+
+    def stats(self) -> IndexStats:
+        self.flush()
+        (final_entries, final_bytes, provisional_entries, oldest, newest) = (
+            self._connection.execute(
+                """
+                SELECT
+                    SUM(final),
+                    SUM(CASE WHEN final THEN size ELSE 0 END),
+                    SUM(1 - final),
+                    MIN(fetched_at),
+                    MAX(fetched_at)
+                FROM entries
+                """
+            ).fetchone()
+        )
+        (missing_entries,) = self._connection.execute(
+            "SELECT COUNT(*) FROM missing"
+        ).fetchone()
+        return IndexStats(
+            final_entries=final_entries or 0,
+            final_bytes=final_bytes or 0,
+            provisional_entries=provisional_entries or 0,
+            missing_entries=missing_entries,
+            oldest=_to_datetime(oldest),
+            newest=_to_datetime(newest),
+        )
+
+    def close(self) -> None:
+        self.flush()
+        self._connection.close()
+        self._lookup_connection.close()
+
+
+def _to_entry(row: tuple) -> IndexEntry:
+    key, request, fetched_at, size, content_hash, final, codec = row
+    return IndexEntry(key, request, fetched_at, size, content_hash, bool(final), codec)
+
+
+def _to_datetime(timestamp: Optional[float]) -> Optional[datetime]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
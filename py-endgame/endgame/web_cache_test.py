@@ -0,0 +1,277 @@
+import asyncio
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from .web_cache import (
+    CacheLookup,
+    MissingReason,
+    WebCache,
+    cache_key,
+    migrate_legacy_cache,
+    normalize_request,
+)
+
+
+def test_normalize_request() -> None:
+    assert normalize_request(
+        "HTTPS://Example.com/path?b=2", dict(a=1)
+    ) == normalize_request("https://example.com/path", dict(b="2", a="1"))
+    assert normalize_request("https://example.com/path", dict(a=1)) != (
+        normalize_request("https://example.com/path", dict(a=2))
+    )
+
+
+def test_cache_key_doesnt_collide_on_stripped_characters() -> None:
+    """The old flat cache stripped `:/.`, so these two shared a file"""
+    assert cache_key("https://example.com/a.b", None) != cache_key(
+        "https://example.com/ab", None
+    )
+
+
+async def test_write_then_read(tmp_path: Path) -> None:
+    cache = WebCache(tmp_path)
+    key = cache_key("https://example.com", dict(a=1))
+
+    assert await cache.read(key) is None
+    await cache.write(key, b"hello" * 1000, "https://example.com?a=1")
+
+    assert await cache.read(key) == b"hello" * 1000
+    assert cache.contains(key)
+    (path,) = tmp_path.rglob("*.gz")
+    # Fanned out two levels, and the codec is in the name
+    assert path.relative_to(tmp_path).parts == (key[:2], key[2:4], f"{key}.gz")
+    assert path.stat().st_size < 1000
+
+
+async def test_write_doesnt_overwrite(tmp_path: Path) -> None:
+    cache = WebCache(tmp_path)
+
+    await cache.write("abcdef", b"first", "request")
+    await cache.write("abcdef", b"second", "request")
+
+    assert await cache.read("abcdef") == b"first"
+
+
+async def test_concurrent_writes_of_one_key(tmp_path: Path) -> None:
+    cache = WebCache(tmp_path)
+
+    await asyncio.gather(*(cache.write("abcdef", b"same", "request") for _ in range(3)))
+
+    assert await cache.read("abcdef") == b"same"
+    assert [p.suffix for p in tmp_path.rglob("abcdef*")] == [".gz"]
+
+
+async def test_fetched_but_not_written_isnt_a_hit(tmp_path: Path) -> None:
+    cache = WebCache(tmp_path)
+
+    cache.record_fetch("abcdef", b"not done yet", "request")
+
+    assert await cache.read("abcdef") is None
+    assert not cache.contains("abcdef")
+    assert cache.stats().provisional_entries == 1
+
+    await cache.write("abcdef", b"done", "request")
+
+    assert await cache.read("abcdef") == b"done"
+    assert cache.stats().provisional_entries == 0
+
+
+async def test_index_survives_a_new_cache_object(tmp_path: Path) -> None:
+    cache = WebCache(tmp_path)
+    await cache.write("abcdef", b"content", "request")
+    cache.flush()
+
+    (entry,) = WebCache(tmp_path).entries()
+
+    assert entry.key == "abcdef"
+    assert entry.request == "request"
+    assert entry.size == len(b"content")
+    assert entry.final
+    assert entry.codec == "gz"
+
+
+async def test_entry_missing_from_the_index_is_recovered(tmp_path: Path) -> None:
+    cache = WebCache(tmp_path)
+    await cache.write("abcdef", b"content", "request", fetched_at=100)
+    # Killed before the batch was written
+    cache._index._pending.clear()
+    cache = WebCache(tmp_path)
+
+    assert not cache.contains("abcdef")
+    assert await cache.read("abcdef") is None
+    assert await cache.read("abcdef", "request") == b"content"
+    assert cache.contains("abcdef")
+    (entry,) = cache.entries()
+    assert (entry.request, entry.size, entry.codec) == ("request", 7, "gz")
+
+
+async def test_entry_deleted_out_from_under_the_index(tmp_path: Path) -> None:
+    cache = WebCache(tmp_path)
+    await cache.write("abcdef", b"content", "request")
+
+    for path in tmp_path.rglob("*.gz"):
+        path.unlink()
+
+    assert await cache.read("abcdef") is None
+    assert not cache.contains("abcdef")
+
+
+async def test_stats(tmp_path: Path) -> None:
+    cache = WebCache(tmp_path)
+    await cache.write("aaaa", b"12345", "request-a", fetched_at=100)
+    await cache.write("bbbb", b"123", "request-b", fetched_at=200)
+    cache.record_fetch("cccc", b"1", "request-c")
+
+    stats = cache.stats()
+
+    assert (stats.final_entries, stats.final_bytes) == (2, 8)
+    assert stats.provisional_entries == 1
+    assert stats.oldest == datetime.fromtimestamp(100, tz=timezone.utc)
+
+
+async def test_evict(tmp_path: Path) -> None:
+    cache = WebCache(tmp_path)
+    await cache.write("aaaa", b"old", "request-a", fetched_at=100)
+    await cache.write("bbbb", b"new", "request-b", fetched_at=300)
+
+    n_evicted = cache.evict(datetime.fromtimestamp(200, tz=timezone.utc))
+
+    assert n_evicted == 1
+    assert await cache.read("aaaa") is None
+    assert await cache.read("bbbb") == b"new"
+    assert len(list(tmp_path.rglob("*.gz"))) == 1
+
+
+async def test_missing_entries(tmp_path: Path) -> None:
+    cache = WebCache(tmp_path)
+
+    cache.record_missing("aaaa", "request-a", MissingReason.not_found)
+    cache.record_missing("bbbb", "request-b", MissingReason.empty)
+
+    assert cache.known_missing("aaaa") == MissingReason.not_found
+    assert cache.known_missing("bbbb") == MissingReason.empty
+    assert cache.known_missing("cccc") is None
+    assert cache.stats().missing_entries == 2
+    assert {e.request for e in WebCache(tmp_path).missing_entries()} == {
+        "request-a",
+        "request-b",
+    }
+
+
+async def test_lookup_has_missing_and_data_in_one(tmp_path: Path) -> None:
+    cache = WebCache(tmp_path)
+    await cache.write("aaaa", b"cached", "request-a")
+    cache.record_missing("bbbb", "request-b", MissingReason.empty)
+    cache.record_fetch("bbbb", b"fetched", "request-b")
+
+    assert await cache.lookup("aaaa") == CacheLookup(None, b"cached")
+    # Still pending, and not final anyway
+    assert await cache.lookup("bbbb") == CacheLookup(MissingReason.empty, None)
+    assert await cache.lookup("cccc") == CacheLookup(None, None)
+    cache.flush()
+    assert await WebCache(tmp_path).lookup("aaaa") == CacheLookup(None, b"cached")
+
+
+async def test_writing_an_entry_clears_missing(tmp_path: Path) -> None:
+    cache = WebCache(tmp_path)
+    cache.record_missing("aaaa", "request-a", MissingReason.not_found)
+
+    await cache.write("aaaa", b"it showed up", "request-a")
+
+    assert cache.known_missing("aaaa") is None
+
+
+_SCOREBOARD = "https://site.api.espn.com/apis/site/v2/sports/basketball/mens-college-basketball/scoreboard"
+_SCOREBOARD_PARAMETERS = dict(
+    lang="en",
+    region="us",
+    calendartype="blacklist",
+    limit=300,
+    dates="20200101",
+    groups=50,
+)
+
+
+def _legacy_name(url: str, parameters: dict | None = None) -> str:
+    """How the old flat cache named a file"""
+    param_string = "&".join(f"{k}={v}" for k, v in (parameters or {}).items())
+    return re.sub("[:/\\.]", "", url + param_string)
+
+
+@pytest.mark.parametrize(
+    "url, parameters",
+    [
+        (_SCOREBOARD, _SCOREBOARD_PARAMETERS),
+        (
+            "https://site.api.espn.com/apis/site/v2/sports/football/nfl/scoreboard",
+            dict(lang="en", region="us", week=3),
+        ),
+        ("https://www.espn.com/womens-college-basketball/boxscore?gameId=1234", None),
+        ("https://www.espn.com/mens-college-basketball/matchup?gameId=1234", None),
+        ("http://www.footballlocks.com/nfl_point_spreads_week_1.shtml", None),
+        ("https://www.pro-football-reference.com/years/1990/coaches.htm", None),
+    ],
+)
+async def test_migrate_legacy_cache(
+    tmp_path: Path, url: str, parameters: dict | None
+) -> None:
+    legacy_root = tmp_path / "web"
+    legacy_root.mkdir()
+    (legacy_root / _legacy_name(url, parameters)).write_bytes(b"content")
+    cache = WebCache(tmp_path / "web_v2")
+
+    result = await migrate_legacy_cache(legacy_root, cache, dry_run=False)
+
+    assert result.migrated == 1
+    assert result.unrecognized == []
+    # Findable the same way `web.get` looks things up
+    assert await cache.read(cache_key(url, parameters)) == b"content"
+    assert list(legacy_root.iterdir()) == []
+
+
+async def test_migrate_legacy_cache__dry_run_changes_nothing(tmp_path: Path) -> None:
+    legacy_root = tmp_path / "web"
+    legacy_root.mkdir()
+    legacy_file = legacy_root / _legacy_name(_SCOREBOARD, _SCOREBOARD_PARAMETERS)
+    legacy_file.write_bytes(b"content")
+    cache = WebCache(tmp_path / "web_v2")
+
+    result = await migrate_legacy_cache(legacy_root, cache)
+
+    assert result.migrated == 1
+    assert legacy_file.is_file()
+    assert not cache.contains(cache_key(_SCOREBOARD, _SCOREBOARD_PARAMETERS))
+
+
+async def test_migrate_legacy_cache__leaves_unrecognized_files(tmp_path: Path) -> None:
+    legacy_root = tmp_path / "web"
+    legacy_root.mkdir()
+    (legacy_root / "httpssomewhereelsecom").write_bytes(b"content")
+
+    result = await migrate_legacy_cache(
+        legacy_root, WebCache(tmp_path / "web_v2"), dry_run=False
+    )
+
+    assert result.unrecognized == ["httpssomewhereelsecom"]
+    assert (legacy_root / "httpssomewhereelsecom").is_file()
+
+
+async def test_migrate_legacy_cache__counts_entries_already_migrated(
+    tmp_path: Path,
+) -> None:
+    legacy_root = tmp_path / "web"
+    legacy_root.mkdir()
+    (legacy_root / _legacy_name(_SCOREBOARD, _SCOREBOARD_PARAMETERS)).write_bytes(
+        b"old"
+    )
+    cache = WebCache(tmp_path / "web_v2")
+    key = cache_key(_SCOREBOARD, _SCOREBOARD_PARAMETERS)
+    await cache.write(key, b"new", "request")
+
+    result = await migrate_legacy_cache(legacy_root, cache, dry_run=False)
+
+    assert (result.migrated, result.already_there) == (0, 1)
+    assert await cache.read(key) == b"new"
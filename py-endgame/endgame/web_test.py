@@ -0,0 +1,166 @@
+import asyncio
+from pathlib import Path
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from . import web as web_module
+from .conftest import Serve
+from .web import (
+    KnownEmptyError,
+    KnownNotFoundError,
+    close_session,
+    fetch_stats,
+    get,
+    get_session,
+)
+
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ENDGAME_CACHE_DIR", str(tmp_path))
+
+
+# The client ends of every connection the test server has seen
+_PEERS = web.AppKey("peers", set)
+# Every request the test server has answered
+_REQUESTS = web.AppKey("requests", list)
+
+
+@pytest.fixture
+async def server(serve: Serve) -> TestServer:
+    async def handler(request: web.Request) -> web.Response:
+        assert request.transport is not None
+        request.app[_PEERS].add(request.transport.get_extra_info("peername"))
+        request.app[_REQUESTS].append(request.query_string)
+        # Slow enough that concurrent requests overlap
+        await asyncio.sleep(0.05)
+        if "missing" in request.query:
+            raise web.HTTPNotFound()
+        return web.Response(body=request.query.get("echo", "").encode())
+
+    app = web.Application()
+    app[_PEERS] = set()
+    app[_REQUESTS] = []
+    app.router.add_get("/echo", handler)
+    return await serve(app)
+
+
+async def test_get_reuses_the_shared_session(server: TestServer) -> None:
+    url = str(server.make_url("/echo"))
+
+    first = await get(url, dict(echo="one"))
+    session = get_session()
+    second = await get(url, dict(echo="two"))
+
+    assert (first.data, second.data) == (b"one", b"two")
+    assert get_session() is session
+    # Kept alive, so both requests went over the same connection
+    assert len(server.app[_PEERS]) == 1
+
+
+async def test_close_session_makes_a_fresh_one_next_time(server: TestServer) -> None:
+    session = get_session()
+
+    await close_session()
+
+    assert session.closed
+    assert get_session() is not session
+
+
+def test_run_closes_the_session() -> None:
+    async def _grab_session():
+        return get_session()
+
+    session = web_module.run(_grab_session())
+
+    assert session.closed
+
+
+async def test_concurrent_gets_share_one_fetch(server: TestServer) -> None:
+    url = str(server.make_url("/echo"))
+    before = fetch_stats()
+
+    contents = await asyncio.gather(
+        get(url, dict(echo="same", other=1)),
+        get(url, dict(other=1, echo="same")),
+        get(f"{url}?echo=same", dict(other=1)),
+    )
+
+    assert len(server.app[_REQUESTS]) == 1
+    assert all(c is contents[0] for c in contents)
+    after = fetch_stats()
+    assert after.started - before.started == 1
+    assert after.coalesced - before.coalesced == 2
+
+
+async def test_sequential_gets_dont_share(server: TestServer) -> None:
+    url = str(server.make_url("/echo"))
+
+    await get(url, dict(echo="one"))
+    await get(url, dict(echo="one"))
+
+    # Nothing's cached (that's up to the caller), and the first fetch
+    # was done by the time the second started
+    assert len(server.app[_REQUESTS]) == 2
+
+
+async def test_404s_are_remembered(server: TestServer) -> None:
+    url = str(server.make_url("/echo"))
+
+    with pytest.raises(aiohttp.ClientResponseError) as first:
+        await get(url, dict(missing=1))
+    with pytest.raises(KnownNotFoundError) as second:
+        await get(url, dict(missing=1))
+
+    assert first.value.status == second.value.status == 404
+    # Not retried, and not asked for again
+    assert len(server.app[_REQUESTS]) == 1
+
+
+async def test_404s_are_forgotten_after_their_ttl(
+    server: TestServer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("ENDGAME_NOT_FOUND_TTL_DAYS", "0")
+    url = str(server.make_url("/echo"))
+
+    for _ in range(2):
+        with pytest.raises(aiohttp.ClientResponseError):
+            await get(url, dict(missing=1))
+
+    assert len(server.app[_REQUESTS]) == 2
+
+
+async def test_empty_content_is_remembered(server: TestServer) -> None:
+    url = str(server.make_url("/echo"))
+
+    content = await get(url, dict(echo="nothing here"))
+    await content.mark_empty()
+
+    with pytest.raises(KnownEmptyError):
+        await get(url, dict(echo="nothing here"))
+    assert len(server.app[_REQUESTS]) == 1
+
+
+async def test_a_throttled_host_doesnt_hold_up_others(
+    server: TestServer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("ENDGAME_MAX_CONCURRENT_REQUESTS", "1")
+    monkeypatch.setenv("ENDGAME_MAX_REQUESTS_PER_S", "1")
+    # Two names for the test server, so two hosts to throttle
+    slow = str(server.make_url("/echo"))
+    other = slow.replace("127.0.0.1", "localhost")
+    finished = []
+
+    async def _get(url: str, echo: str) -> None:
+        await get(url, dict(echo=echo))
+        finished.append(echo)
+
+    first = asyncio.ensure_future(_get(slow, "first"))
+    await asyncio.sleep(0.01)
+    # Waits about a second for the slow host's next token
+    await asyncio.gather(_get(slow, "throttled"), _get(other, "other"), first)
+
+    assert finished == ["first", "other", "throttled"]
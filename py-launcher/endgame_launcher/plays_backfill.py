@@ -22,7 +22,8 @@ async def _find_covered_parameters(bucket: str) -> AsyncIterator[_Params]:
         async for page in paginator.paginate(Bucket=bucket, Prefix=prefix): # type: ignore
             for obj in page.get('Contents', []):
                 league, filename = obj['Key'].removeprefix(prefix).split("/")
-                day = filename.removesuffix(".json")
+                # Days are ".ndjson.gz", or ".json" from before that
+                day = filename.removesuffix(".ndjson.gz").removesuffix(".json")
                 yield _Params(league=league, day=day)
 
 